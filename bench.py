@@ -0,0 +1,265 @@
+"""
+Measures the speed of parts of the bot without Discord.
+
+Usage: python bench.py [--repeat N] BENCHMARK...
+e.g.   python bench.py render rules table
+"""
+
+import argparse
+import asyncio
+import messages
+import random
+import time
+import render
+import strategy
+import tournament
+import uno
+
+def measure(function, repeat):
+    """
+    Calls a function repeatedly and returns the time of a call.
+
+    Arguments:
+    function(function): Function taking no arguments
+    repeat  (int)     : Number of calls
+
+    Return:
+    tuple: Median and fastest seconds per call
+    """
+    times = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    times.sort()
+    return times[len(times) // 2], times[0]
+
+
+def report(name, seconds):
+    """
+    Prints the result of a measure.
+
+    Arguments:
+    name   (str)  : What was measured
+    seconds(tuple): Median and fastest seconds per call
+    """
+    print("{0:<40} {1:>10.3f} ms {2:>10.3f} ms".format(
+            name, seconds[0] * 1000, seconds[1] * 1000))
+
+
+def concatenated_hand(player):
+    """
+    Builds the hand of a player by chaining +, as the game did before joining
+    its parts.
+
+    Argument:
+    player(Player)
+
+    Return:
+    str
+    """
+    index = 1
+    str_repr = "```\n"
+    for card in player.get_cards():
+        str_repr += str(index) + "." + str(card) + "  "
+        index += 1
+    str_repr += "```"
+    return str_repr
+
+
+def bench_messages(repeat):
+    """
+    Compares hands built by joining their parts with hands built by chaining
+    +, then splits hands too long for a single message.
+
+    Argument:
+    repeat(int)
+    """
+    import loadtest
+    deck = uno.full_deck() * 2
+    player = uno.Player(loadtest.FakeUser("0", "player0"))
+    for size in [30, 200]:
+        player.reset_cards()
+        player.take_cards(random.sample(deck, size))
+        report("messages: hand of {0}, joined".format(size),
+                measure(player.get_hand, repeat))
+        report("messages: hand of {0}, concatenated".format(size),
+                measure(lambda: concatenated_hand(player), repeat))
+        hand = "Your cards are:" + player.get_hand()
+        report("messages: hand of {0}, split in {1}".format(
+                size, len(messages.split(hand))),
+                measure(lambda: messages.split(hand), repeat))
+
+
+def bench_render(repeat):
+    """
+    Renders images of hands of 7 and 30 cards, with and without the cache.
+
+    Argument:
+    repeat(int)
+    """
+    if not render.is_available():
+        print("render: Pillow is not installed")
+        return
+    deck = uno.full_deck()
+    top = deck[0]
+    started = time.perf_counter()
+    render.get_atlas()
+    report("render: atlas", (time.perf_counter() - started,) * 2)
+    loop = asyncio.new_event_loop()
+    for size in [7, 30]:
+        hands = [random.sample(deck, size) for i in range(repeat)]
+        report("render: {0} cards".format(size), measure(
+                lambda: render.render_hand(hands[0], top, top.color),
+                repeat))
+        # Every call renders a new hand, then finds it in the cache
+        for cached in [False, True]:
+            queue = list(hands)
+            def render_next():
+                loop.run_until_complete(render.render_hand_async(
+                        queue.pop(), top, top.color))
+            if cached:
+                name = "render: {0} cards, cached"
+            else:
+                name = "render: {0} cards, in a worker"
+            report(name.format(size), measure(render_next, repeat))
+    loop.close()
+
+
+def if_chain_can_be_played(card, top, wild_color):
+    """
+    Determines if a card can be played by checking the rules one by one, as
+    the game did before compiling them into tables.
+
+    Arguments:
+    card      (Card)
+    top       (Card)
+    wild_color(CardColor)
+
+    Return:
+    bool
+    """
+    if (wild_color != uno.CardColor["BLACK"]
+            and card.get_color() == wild_color):
+        return True
+    if card.equals_color(top):
+        return True
+    if card.equals_type(top):
+        return True
+    if card.get_color() == uno.CardColor["BLACK"]:
+        return True
+    return False
+
+
+def bench_rules(repeat):
+    """
+    Compares turns under the default rules and under every house rule.
+
+    Argument:
+    repeat(int)
+    """
+    everything = sorted(uno.HOUSE_RULES)
+    for size in [7, 30]:
+        cards = random.sample(uno.full_deck(), size)
+        for house_rules in [[], everything]:
+            players = []
+            for i in range(4):
+                bot_strategy = strategy.RandomStrategy()
+                players.append(uno.Player(uno.BotUser(bot_strategy),
+                        bot_strategy))
+            game = uno.Game(players, None, 0, house_rules)
+            def check_hand():
+                for i in range(100):
+                    for card in cards:
+                        game.__can_be_played__(card)
+            report("rules: {0} cards x 100, {1}".format(
+                    size, "house rules" if house_rules else "default"),
+                    measure(check_hand, repeat))
+        top = game.discard[-1]
+        def check_hand_if_chain():
+            for i in range(100):
+                for card in cards:
+                    if_chain_can_be_played(card, top, game.wild_color)
+        report("rules: {0} cards x 100, if-chain".format(size),
+                measure(check_hand_if_chain, repeat))
+    loop = asyncio.new_event_loop()
+    for house_rules in [[], everything]:
+        seeds = iter(range(repeat))
+        moves = []
+        def play_game():
+            moves.append(loop.run_until_complete(tournament.play_headless(
+                    ["random", "random", "random", "random"],
+                    next(seeds),
+                    house_rules))[1])
+        seconds = measure(play_game, repeat)
+        name = "house rules" if house_rules else "default"
+        report("rules: game of 4, " + name, seconds)
+        # Games under house rules are longer, so compare single moves too
+        report("rules: move, " + name, (
+                seconds[0] / sorted(moves)[len(moves) // 2],
+                seconds[1] / sorted(moves)[len(moves) // 2]))
+    loop.close()
+
+
+def bench_table(repeat):
+    """
+    Measures the costs of a turn that depend on the number of players, at 10,
+    25 and 50 players.
+
+    Argument:
+    repeat(int)
+    """
+    import loadtest
+    loop = asyncio.new_event_loop()
+    for size in [10, 25, 50]:
+        seeds = iter(range(repeat))
+        moves = []
+        def play_game():
+            moves.append(loop.run_until_complete(tournament.play_headless(
+                    ["random"] * size, next(seeds)))[1])
+        seconds = measure(play_game, repeat)
+        median_moves = sorted(moves)[len(moves) // 2]
+        report("table: move, {0} players".format(size),
+                (seconds[0] / median_moves, seconds[1] / median_moves))
+        # Every API call takes 5 ms, so sending one at a time would take
+        # 5 ms per player
+        uno.client = loadtest.FakeClient(latency=0.005)
+        players = [uno.Player(loadtest.FakeUser(str(i), "player" + str(i)))
+                for i in range(size)]
+        game = uno.Game(players, None)
+        report("table: announce, {0} players".format(size), measure(
+                lambda: loop.run_until_complete(game.announce([], "Hi")),
+                repeat))
+        def render_turn():
+            game.version += 1
+            game.__render_turn__()
+        report("table: turn view, {0} players".format(size),
+                measure(render_turn, repeat))
+    uno.client = None
+    loop.close()
+
+
+BENCHMARKS = {
+        "messages": bench_messages,
+        "render": bench_render,
+        "rules": bench_rules,
+        "table": bench_table}
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Measures the speed of parts of the bot.")
+    parser.add_argument("benchmarks", nargs="*", metavar="BENCHMARK",
+            help="one of " + ", ".join(sorted(BENCHMARKS)) + ", or all")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark " + name)
+    random.seed(0)
+    print("{0:<40} {1:>13} {2:>13}".format("", "median", "fastest"))
+    for name in args.benchmarks or sorted(BENCHMARKS):
+        BENCHMARKS[name](args.repeat)
+
+
+if __name__ == "__main__":
+    main()
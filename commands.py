@@ -0,0 +1,149 @@
+"""
+Resolves the words typed by players during a game, through tries built once
+at import: the commands with their long forms, e.g. `.red` for `.r`, and the
+names of cards, e.g. `red 7`, `r7` or `[R](7)` as shown in hands.
+
+Looking up a word walks the trie one character at a time, so it takes time
+linear in the length of the input whatever the number of names.
+"""
+
+# Canonical commands and the words resolved to them. `.y` is both the color
+# yellow and the answer yes, as told apart by the state of the game.
+COMMANDS = {
+        ".p": [".p", ".play"],
+        ".d": [".d", ".draw"],
+        ".k": [".k", ".keep"],
+        ".r": [".r", ".red"],
+        ".y": [".y", ".yellow", ".yes"],
+        ".g": [".g", ".green"],
+        ".b": [".b", ".blue"],
+        ".n": [".n", ".no"],
+        ".s": [".s", ".send"],
+        ".uno!": [".uno!", ".uno"],
+        ".catch": [".catch"],
+        ".swap": [".swap"],
+        ".hand": [".hand"],
+        ".turn": [".turn"],
+        ".last": [".last"],
+        ".unohelp": [".unohelp"],
+        ".announce": [".announce"],
+        ".images": [".images"],
+        ".ustop": [".ustop"]}
+COLOR_NAMES = {
+        "RED": ["r", "red"],
+        "YELLOW": ["y", "yellow"],
+        "GREEN": ["g", "green"],
+        "BLUE": ["b", "blue"]}
+TYPE_NAMES = {
+        "ZERO": ["0", "zero"],
+        "ONE": ["1", "one"],
+        "TWO": ["2", "two"],
+        "THREE": ["3", "three"],
+        "FOUR": ["4", "four"],
+        "FIVE": ["5", "five"],
+        "SIX": ["6", "six"],
+        "SEVEN": ["7", "seven"],
+        "EIGHT": ["8", "eight"],
+        "NINE": ["9", "nine"],
+        "SKIP": ["s", "skip"],
+        "REVERSE": ["r", "rev", "reverse"],
+        "DRAW_TWO": ["d2", "+2", "draw2", "drawtwo"]}
+WILD_NAMES = {
+        "WILD": ["w", "wild"],
+        "WILD_DRAW_FOUR": ["wd4", "w4", "+4", "wilddraw4",
+                "wilddrawfour"]}
+# Characters left out of card names, so that spacing and the brackets of
+# cards shown in hands do not matter
+IGNORED = str.maketrans("", "", " []()-_")
+
+class Trie:
+    """
+    Prefix tree mapping words to values.
+
+    Attributes:
+    root(dict): Children of the root keyed by character. The value of the
+                word ending at a node is kept under the key None.
+    """
+    def __init__(self, words):
+        """
+        Constructor of the trie.
+
+        Argument:
+        words(dict of str: object): Value of each word
+        """
+        self.root = {}
+        for word, value in words.items():
+            node = self.root
+            for character in word:
+                node = node.setdefault(character, {})
+            node[None] = value
+
+    def get(self, word, default=None):
+        """
+        Returns the value of a word.
+
+        Arguments:
+        word   (str)
+        default(object): Value returned if the word is not in the trie
+
+        Return:
+        object
+        """
+        node = self.root
+        for character in word:
+            node = node.get(character)
+            if node is None:
+                return default
+        return node.get(None, default)
+
+
+def __card_names__():
+    """
+    Returns every name of every card.
+
+    Return:
+    dict of str: tuple: Names of the CardColor and CardType of the card of
+                        each name
+    """
+    names = {}
+    for color, color_names in COLOR_NAMES.items():
+        for type, type_names in TYPE_NAMES.items():
+            for color_name in color_names:
+                for type_name in type_names:
+                    names[color_name + type_name] = (color, type)
+    for type, type_names in WILD_NAMES.items():
+        for type_name in type_names:
+            names[type_name] = ("BLACK", type)
+    return names
+
+
+command_trie = Trie(dict((word, command)
+        for command, words in COMMANDS.items() for word in words))
+card_trie = Trie(__card_names__())
+
+def resolve_command(word):
+    """
+    Returns the canonical form of a command, e.g. ".r" for ".red".
+
+    Argument:
+    word(str): First word of a message
+
+    Return:
+    str: The canonical command, or the word in lowercase if it is unknown
+    """
+    word = word.lower()
+    return command_trie.get(word, word)
+
+
+def resolve_card(name):
+    """
+    Returns the color and type of the card of a name, e.g. "red 7".
+
+    Argument:
+    name(str)
+
+    Return:
+    tuple: Names of the CardColor and CardType, e.g. ("RED", "SEVEN"), or
+           None if no card has this name
+    """
+    return card_trie.get(name.lower().translate(IGNORED))
@@ -0,0 +1,414 @@
+"""
+Drives main.on_message with synthetic Discord events and reports latency.
+
+A fake client stands in for discord.Client: it records every API call, and
+adds latency and rate limits to it. Games are hosted, joined and played
+through the same commands people send.
+
+Usage: python loadtest.py [--games N] [--players N] [--moves N]
+                          [--latency SECONDS] [--rate-limit PER_SECOND]
+                          [--on-limit sleep|fail] [--chatter PER_SECOND]
+"""
+
+import argparse
+import asyncio
+import collections
+import datetime
+import itertools
+import os
+import random
+import tempfile
+import time
+
+class FakeUser:
+    """
+    Stands in for discord.User.
+
+    Attributes:
+    id  (str)
+    name(str)
+    """
+    def __init__(self, id, name):
+        """
+        Constructor of the user.
+
+        Arguments:
+        id  (str)
+        name(str)
+        """
+        self.id = id
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+
+class FakeChannel:
+    """
+    Stands in for discord.Channel and discord.PrivateChannel.
+
+    Attributes:
+    id        (str)
+    name      (str)
+    is_private(bool)
+    """
+    def __init__(self, id, name, is_private):
+        """
+        Constructor of the channel.
+
+        Arguments:
+        id        (str)
+        name      (str)
+        is_private(bool)
+        """
+        self.id = id
+        self.name = name
+        self.is_private = is_private
+
+    def __str__(self):
+        return self.name
+
+
+class FakeServer:
+    """
+    Stands in for discord.Server.
+
+    Attributes:
+    id  (str)
+    name(str)
+    """
+    def __init__(self, id, name):
+        """
+        Constructor of the server.
+
+        Arguments:
+        id  (str)
+        name(str)
+        """
+        self.id = id
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+
+SERVER = FakeServer("1", "Load Test")
+
+class FakeMessage:
+    """
+    Stands in for discord.Message.
+
+    Attributes:
+    id       (str)
+    author   (FakeUser)
+    channel  (FakeChannel or FakeUser)
+    server   (FakeServer)
+    content  (str)
+    timestamp(datetime.datetime)
+    """
+    ids = itertools.count()
+
+    def __init__(self, author, channel, content):
+        """
+        Constructor of the message.
+
+        Arguments:
+        author (FakeUser)
+        channel(FakeChannel or FakeUser)
+        content(str)
+        """
+        self.id = str(next(FakeMessage.ids))
+        self.author = author
+        self.channel = channel
+        # Messages sent to a user go to their private channel
+        is_private = getattr(channel, "is_private", True)
+        self.server = None if is_private else SERVER
+        self.content = content
+        self.timestamp = datetime.datetime.utcnow()
+
+
+class RateLimited(Exception):
+    """Raised by the fake client in place of an HTTP 429 response."""
+
+
+class FakeClient:
+    """
+    Stands in for discord.Client, recording the API calls.
+
+    Attributes:
+    user        (FakeUser)           : The bot user
+    latency     (float)              : Mean seconds an API call takes
+    rate_limit  (float)              : API calls allowed per second, or 0 for
+                                       no limit
+    on_limit    (str)                : "sleep" to wait like the library does,
+                                       "fail" to raise RateLimited
+    calls       (collections.Counter): Number of calls by method
+    limited     (int)                : Number of calls that hit the rate limit
+    tokens      (float)              : Calls left in the rate limit bucket
+    refilled_at (float)              : Time the bucket was last refilled
+    """
+    def __init__(self, latency=0.0, rate_limit=0, on_limit="sleep"):
+        """
+        Constructor of the client.
+
+        Arguments:
+        latency   (float)
+        rate_limit(float)
+        on_limit  (str)
+        """
+        self.user = FakeUser("0", "UnlikeBot")
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.on_limit = on_limit
+        self.calls = collections.Counter()
+        self.limited = 0
+        self.tokens = rate_limit
+        self.refilled_at = time.monotonic()
+
+    async def __call__(self, method):
+        """
+        Accounts for an API call and waits for its latency.
+
+        Argument:
+        method(str): Name of the API method
+        """
+        self.calls[method] += 1
+        if self.rate_limit:
+            now = time.monotonic()
+            self.tokens = min(
+                    self.rate_limit,
+                    self.tokens + (now - self.refilled_at) * self.rate_limit)
+            self.refilled_at = now
+            if self.tokens < 1:
+                self.limited += 1
+                retry_after = (1 - self.tokens) / self.rate_limit
+                if self.on_limit == "fail":
+                    raise RateLimited(method)
+                self.tokens -= 1
+                await asyncio.sleep(retry_after)
+            else:
+                self.tokens -= 1
+        if self.latency:
+            await asyncio.sleep(random.expovariate(1 / self.latency))
+
+    async def send_message(self, destination, content=None, **kwargs):
+        await self("send_message")
+        return FakeMessage(self.user, destination, content)
+
+    async def edit_message(self, message, new_content=None, **kwargs):
+        await self("edit_message")
+        message.content = new_content
+        return message
+
+    async def send_file(self, destination, fp, **kwargs):
+        await self("send_file")
+        return FakeMessage(self.user, destination, kwargs.get("content"))
+
+    async def start_private_message(self, user):
+        await self("start_private_message")
+        return FakeChannel("dm" + user.id, user.name, True)
+
+    async def pin_message(self, message):
+        await self("pin_message")
+
+    def get_channel(self, id):
+        # The fake client does not track channels, so it makes one up
+        return FakeChannel(id, id, False)
+
+
+class Scenario:
+    """
+    A load test run against main.on_message.
+
+    Attributes:
+    main      (module)             : The bot's main module
+    client    (FakeClient)
+    games     (int)                : Number of games played at once
+    players   (int)                : Number of players per game
+    moves     (int)                : Maximum moves played per game
+    chatter   (float)              : Channel messages and typing events sent
+                                     per second besides the games
+    latencies (dict of str: list)  : Seconds each message took, by command
+    """
+    def __init__(self, main, client, games, players, moves, chatter):
+        """
+        Constructor of the scenario.
+
+        Arguments:
+        main   (module)
+        client (FakeClient)
+        games  (int)
+        players(int)
+        moves  (int)
+        chatter(float)
+        """
+        self.main = main
+        self.client = client
+        self.games = games
+        self.players = players
+        self.moves = moves
+        self.chatter = chatter
+        self.latencies = collections.defaultdict(list)
+
+    async def send(self, author, channel, content):
+        """
+        Delivers a message to the bot, and measures until the bot and the game
+        of the author have finished with it.
+
+        Arguments:
+        author (FakeUser)
+        channel(FakeChannel)
+        content(str)
+        """
+        started = time.monotonic()
+        await self.main.on_message(FakeMessage(author, channel, content))
+        game = self.main.uno.find_game(author)
+        if game is not None and not game.is_over:
+            await game.queue.join()
+        self.latencies[content.split()[0]].append(time.monotonic() - started)
+
+    async def play_game(self, number):
+        """
+        Hosts a game in its own channel, and plays it until it ends or runs
+        out of moves.
+
+        Argument:
+        number(int): Number of the game, used for unique IDs
+        """
+        import strategy
+        channel = FakeChannel("c" + str(number), "game-" + str(number), False)
+        users = [FakeUser("u" + str(number) + "-" + str(i),
+                "player" + str(number) + "-" + str(i))
+                for i in range(self.players)]
+        dms = dict((user.id, FakeChannel("dm" + user.id, user.name, True))
+                for user in users)
+        await self.send(users[0], channel, ".uno")
+        for user in users[1:]:
+            await self.send(user, channel, ".ujoin")
+        await self.send(users[0], channel, ".ustart")
+        game = self.main.uno.find_game(users[0])
+        decider = strategy.RandomStrategy()
+        for move in range(self.moves):
+            if game is None or game.is_over:
+                return
+            await game.queue.join()
+            user = game.players[game.turn].get_user()
+            # Players check the state now and then, as people do
+            if random.random() < 0.1:
+                await self.send(user, dms[user.id],
+                        random.choice([".hand", ".turn", ".last"]))
+            await self.send(user, dms[user.id],
+                    decider.decide(game.get_view()))
+        if not game.is_over:
+            await self.send(users[0], dms[users[0].id], ".ustop")
+
+    async def chat(self, duration):
+        """
+        Sends channel chatter and typing events for the given time.
+
+        Argument:
+        duration(float): Seconds to chat for
+        """
+        channel = FakeChannel("chatter", "general", False)
+        users = [FakeUser("chat" + str(i), "chatter" + str(i))
+                for i in range(20)]
+        ends_at = time.monotonic() + duration
+        while time.monotonic() < ends_at:
+            user = random.choice(users)
+            if random.random() < 0.5:
+                await self.main.on_typing(channel, user, None)
+            else:
+                await self.send(user, channel,
+                        random.choice(["ayy", "hello", "unlike it", ".ping"]))
+            await asyncio.sleep(random.expovariate(self.chatter))
+
+    async def run(self):
+        """
+        Runs the scenario.
+
+        Return:
+        float: Seconds the scenario took
+        """
+        started = time.monotonic()
+        games = asyncio.gather(
+                *[self.play_game(i) for i in range(self.games)])
+        if self.chatter:
+            chatter = asyncio.ensure_future(self.chat(float("inf")))
+        await games
+        if self.chatter:
+            chatter.cancel()
+        return time.monotonic() - started
+
+    def report(self, elapsed):
+        """
+        Prints the latency percentiles and the API calls.
+
+        Argument:
+        elapsed(float): Seconds the scenario took
+        """
+        total = sum(len(values) for values in self.latencies.values())
+        print("{0} messages in {1:.1f} s ({2:.0f} messages/s)".format(
+                total, elapsed, total / elapsed))
+        print("{0:<14}{1:>8}{2:>10}{3:>10}{4:>10}{5:>10}".format(
+                "command", "count", "p50 ms", "p90 ms", "p99 ms", "max ms"))
+        for command in sorted(self.latencies):
+            values = sorted(self.latencies[command])
+            print("{0:<14}{1:>8}{2:>10.1f}{3:>10.1f}{4:>10.1f}{5:>10.1f}"
+                    .format(command, len(values),
+                            percentile(values, 50) * 1000,
+                            percentile(values, 90) * 1000,
+                            percentile(values, 99) * 1000,
+                            values[-1] * 1000))
+        print("API calls:")
+        for method, count in sorted(self.client.calls.items()):
+            print("  {0:<24}{1:>8}".format(method, count))
+        print("  {0:<24}{1:>8}".format("rate limited", self.client.limited))
+
+
+def percentile(values, percent):
+    """
+    Returns the percentile of sorted values.
+
+    Arguments:
+    values (list of float): Values in ascending order
+    percent(float)
+
+    Return:
+    float
+    """
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Load tests the bot with a fake Discord client.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--moves", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05,
+            help="mean seconds per API call")
+    parser.add_argument("--rate-limit", type=float, default=0,
+            help="API calls per second, 0 for none")
+    parser.add_argument("--on-limit", choices=["sleep", "fail"],
+            default="sleep")
+    parser.add_argument("--chatter", type=float, default=0,
+            help="channel messages and typing events per second")
+    args = parser.parse_args()
+    # The bot writes its log to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="unlikebot-loadtest-"))
+    import main as bot
+    bot.open_preferences(":memory:")
+    client = FakeClient(args.latency, args.rate_limit, args.on_limit)
+    bot.client = client
+    scenario = Scenario(bot, client, args.games, args.players, args.moves,
+            args.chatter)
+    loop = asyncio.get_event_loop()
+    elapsed = loop.run_until_complete(scenario.run())
+    scenario.report(elapsed)
+
+
+if __name__ == "__main__":
+    main()
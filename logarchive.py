@@ -0,0 +1,481 @@
+"""
+Log of the messages seen by the bot, rotated into gzip segments.
+
+Every segment has a JSON index next to it, holding its time range and the IDs
+of the authors and channels of its messages. The index is built in memory
+while the segment is written, so searches skip the segments that cannot match
+without opening them, and decompress the others as a stream.
+
+A search reads the finished segments of every shard, and the records the
+searching shard has written so far to its current segment. The current
+segments of other shards are left out, as they keep no index on disk.
+
+Records keep the layout of the old log.txt:
+
+    ----- on_message -----
+    timestamp: 2017-05-01 12:00:00.000000
+    author name: UnlikeSuika
+    ...
+"""
+
+import concurrent.futures
+import gzip
+import json
+import os
+import re
+import shutil
+
+DIRECTORY = "logs"          # Directory of the segments
+SEGMENT_SIZE = 1024 * 1024  # Bytes written to a segment before it is rotated
+RECORD_START = "----- on_message -----\n"
+# Fields of a record, in the order they are written
+FIELDS = ["timestamp", "author name", "author ID", "content", "server",
+        "channel", "channel ID"]
+
+# Backslashes and line breaks escaped in the values of records, as a line
+# break would start a new field
+ESCAPED = re.compile(r"\\[\\n]")
+
+# A single thread compresses segments and searches them, so that a search
+# never sees a segment of this process halfway compressed
+executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+class SegmentIndex:
+    """
+    What a segment holds, to tell if a search may match it.
+
+    Attributes:
+    first   (str)        : Timestamp of the first record, or None if empty
+    last    (str)        : Timestamp of the last record, or None if empty
+    authors (set of str) : IDs of the authors of the records
+    channels(set of str) : IDs of the channels of the records
+    records (int)        : Number of records
+    """
+    def __init__(self, data=None):
+        """
+        Constructor of the index.
+
+        Argument:
+        data(dict): Index read from a sidecar file, or None for an empty one
+        """
+        data = data or {}
+        self.first = data.get("first")
+        self.last = data.get("last")
+        self.authors = set(data.get("authors", []))
+        self.channels = set(data.get("channels", []))
+        self.records = data.get("records", 0)
+
+    def add(self, record):
+        """
+        Adds a record to the index.
+
+        Argument:
+        record(dict of str: str): Fields of the record
+        """
+        if self.first is None:
+            self.first = record["timestamp"]
+        self.last = record["timestamp"]
+        self.authors.add(record["author ID"])
+        self.channels.add(record["channel ID"])
+        self.records += 1
+
+    def may_match(self, query):
+        """
+        Determines if a segment with this index may hold records matching a
+        query.
+
+        Argument:
+        query(Query)
+
+        Return:
+        bool
+        """
+        if self.records == 0:
+            return False
+        if query.author is not None and query.author not in self.authors:
+            return False
+        if query.channel is not None and query.channel not in self.channels:
+            return False
+        if query.since is not None and self.last < query.since:
+            return False
+        if query.until is not None and self.first > query.until:
+            return False
+        return True
+
+    def copy(self):
+        """
+        Returns a copy of the index, which later records do not change.
+
+        Return:
+        SegmentIndex
+        """
+        return SegmentIndex({
+                "first": self.first,
+                "last": self.last,
+                "authors": self.authors,
+                "channels": self.channels,
+                "records": self.records})
+
+    def to_json(self):
+        """
+        Returns the index as it is stored in the sidecar file.
+
+        Return:
+        str
+        """
+        return json.dumps({
+                "first": self.first,
+                "last": self.last,
+                "authors": sorted(self.authors),
+                "channels": sorted(self.channels),
+                "records": self.records})
+
+
+class Query:
+    """
+    Search of the log.
+
+    Attributes:
+    text   (str): Text the content must contain, in lowercase
+    author (str): ID the author must have, or None
+    channel(str): ID the channel must have, or None
+    since  (str): Earliest timestamp, e.g. "2017-05-01", or None
+    until  (str): Latest timestamp, or None. A date includes its whole day.
+    """
+    def __init__(self, text="", author=None, channel=None, since=None,
+            until=None):
+        """
+        Constructor of the query.
+
+        Arguments:
+        text   (str)
+        author (str)
+        channel(str)
+        since  (str)
+        until  (str)
+        """
+        self.text = text.lower()
+        self.author = author
+        self.channel = channel
+        self.since = since
+        # Timestamps on the last day sort after the bare date
+        self.until = None if until is None else until + "\uffff"
+
+    def matches(self, record):
+        """
+        Determines if a record matches the query.
+
+        Argument:
+        record(dict of str: str)
+
+        Return:
+        bool
+        """
+        return ((self.author is None or record["author ID"] == self.author)
+                and (self.channel is None
+                        or record["channel ID"] == self.channel)
+                and (self.since is None or record["timestamp"] >= self.since)
+                and (self.until is None or record["timestamp"] <= self.until)
+                and self.text in record["content"].lower())
+
+
+class Snapshot:
+    """
+    What a search reads, taken on the thread writing the log so that records
+    written during the search are left out.
+
+    Attributes:
+    segments(list of str): Paths of the finished segments without extension
+    current (file)        : Segment being written, opened for reading in
+                            binary, or None if nothing has been written yet
+    size    (int)         : Bytes of the segment being written to read
+    index   (SegmentIndex): Index of the records in those bytes
+    """
+    def __init__(self, segments, current, size, index):
+        """
+        Constructor of the snapshot.
+
+        Arguments:
+        segments(list of str)
+        current (file)
+        size    (int)
+        index   (SegmentIndex)
+        """
+        self.segments = segments
+        self.current = current
+        self.size = size
+        self.index = index
+
+
+class LogArchive:
+    """
+    The segments of the log written by one process.
+
+    Attributes:
+    directory(str)         : Directory of the segments
+    prefix   (str)         : Start of the names of the files of this process,
+                             so that shards write their own segments
+    current  (file)        : Segment being written, or None before the first
+                             write
+    index    (SegmentIndex): Index of the segment being written
+    """
+    def __init__(self, directory=DIRECTORY, prefix="log"):
+        """
+        Constructor of the archive.
+
+        Arguments:
+        directory(str)
+        prefix   (str)
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.current = None
+        self.index = SegmentIndex()
+
+    def __current_path__(self):
+        """
+        Returns the path of the segment being written.
+
+        Return:
+        str
+        """
+        return os.path.join(self.directory, self.prefix + "-current.log")
+
+    def __open__(self):
+        """
+        Opens the segment being written. A segment left by a previous run is
+        rotated first, as its index was lost with the process.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.__current_path__()
+        if os.path.exists(path):
+            index = SegmentIndex()
+            with open(path, encoding="utf-8") as log:
+                for record in read_records(log):
+                    index.add(record)
+            self.__rotate__(index)
+        self.current = open(path, "a", encoding="utf-8")
+        self.index = SegmentIndex()
+
+    def write(self, text):
+        """
+        Writes lines outside of records, such as the boot of the bot.
+
+        Argument:
+        text(str)
+        """
+        if self.current is None:
+            self.__open__()
+        self.current.write(text)
+        self.current.flush()
+
+    def write_record(self, record):
+        """
+        Writes the record of a message, and rotates the segment once it is
+        full.
+
+        Argument:
+        record(dict of str: str): Value of every field in FIELDS
+        """
+        if self.current is None:
+            self.__open__()
+        lines = [RECORD_START]
+        for field in FIELDS:
+            lines.append(field + ": " + escape(str(record[field])) + "\n")
+        self.current.write("".join(lines))
+        self.current.flush()
+        self.index.add(record)
+        if self.current.tell() >= SEGMENT_SIZE:
+            self.current.close()
+            self.__rotate__(self.index)
+            self.current = open(self.__current_path__(), "a",
+                    encoding="utf-8")
+            self.index = SegmentIndex()
+
+    def __rotate__(self, index):
+        """
+        Moves the segment being written aside with its index, and compresses
+        it in the worker thread.
+
+        Argument:
+        index(SegmentIndex): Index of the segment
+        """
+        number = 0
+        for name in os.listdir(self.directory):
+            if name.startswith(self.prefix + "-") and name.endswith(".json"):
+                number = max(number,
+                        int(name[len(self.prefix) + 1:-len(".json")]) + 1)
+        base = os.path.join(self.directory,
+                "{0}-{1:06d}".format(self.prefix, number))
+        os.rename(self.__current_path__(), base + ".log")
+        with open(base + ".json", "w", encoding="utf-8") as sidecar:
+            sidecar.write(index.to_json())
+        executor.submit(compress, base)
+
+    def snapshot(self):
+        """
+        Returns what a search reads now. Must be called from the thread
+        writing the log, and the snapshot passed to search.
+
+        Return:
+        Snapshot
+        """
+        segments = []
+        if os.path.isdir(self.directory):
+            for name in sorted(os.listdir(self.directory)):
+                if name.endswith(".json"):
+                    segments.append(os.path.join(self.directory, name[:-5]))
+        if self.current is None:
+            return Snapshot(segments, None, 0, SegmentIndex())
+        # The reading handle keeps the segment even if it is rotated during
+        # the search, and only the bytes written so far are read
+        return Snapshot(
+                segments,
+                open(self.__current_path__(), "rb"),
+                self.current.tell(),
+                self.index.copy())
+
+    def search(self, query, limit, snapshot):
+        """
+        Returns the records matching a query, from the oldest. Meant to run
+        in the worker thread.
+
+        Arguments:
+        query   (Query)
+        limit   (int)     : Records returned at most
+        snapshot(Snapshot): What to read, as taken by snapshot()
+
+        Return:
+        tuple: List of matching records, and the number of segments read out
+               of the number of segments
+        """
+        matches = []
+        num_read = 0
+        num_segments = len(snapshot.segments) + 1
+        try:
+            for base in snapshot.segments:
+                with open(base + ".json", encoding="utf-8") as sidecar:
+                    index = SegmentIndex(json.load(sidecar))
+                if not index.may_match(query):
+                    continue
+                num_read += 1
+                with open_segment(base) as log:
+                    if self.__collect__(log, query, matches, limit):
+                        return matches, num_read, num_segments
+            if snapshot.current is not None and snapshot.index.may_match(
+                    query):
+                num_read += 1
+                lines = snapshot.current.read(snapshot.size).decode(
+                        "utf-8").splitlines(True)
+                self.__collect__(lines, query, matches, limit)
+        finally:
+            if snapshot.current is not None:
+                snapshot.current.close()
+        return matches, num_read, num_segments
+
+    def __collect__(self, log, query, matches, limit):
+        """
+        Adds the records of a segment matching a query to the matches.
+
+        Arguments:
+        log    (iterable of str): Lines of the segment
+        query  (Query)
+        matches(list of dict)
+        limit  (int)
+
+        Return:
+        bool: Whether the limit has been reached
+        """
+        for record in read_records(log):
+            if query.matches(record):
+                matches.append(record)
+                if len(matches) >= limit:
+                    return True
+        return False
+
+
+def read_records(log):
+    """
+    Yields the records of a segment, read line by line.
+
+    Argument:
+    log(iterable of str): Lines of a segment
+
+    Return:
+    generator of dict of str: str: Fields of each record. Fields missing
+                                   from records of older logs are empty.
+    """
+    record = None
+    for line in log:
+        if line == RECORD_START:
+            if record is not None:
+                yield record
+            record = dict((field, "") for field in FIELDS)
+        elif record is not None:
+            field, separator, value = line.rstrip("\n").partition(": ")
+            if separator and field in record:
+                record[field] = unescape(value)
+    if record is not None:
+        yield record
+
+
+def escape(value):
+    """
+    Escapes the backslashes and line breaks of a value, so that it fits on
+    the line of its field.
+
+    Argument:
+    value(str)
+
+    Return:
+    str
+    """
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def unescape(value):
+    """
+    Returns a value escaped by escape().
+
+    Argument:
+    value(str)
+
+    Return:
+    str
+    """
+    return ESCAPED.sub(
+            lambda match: "\n" if match.group() == "\\n" else "\\", value)
+
+
+def open_segment(base):
+    """
+    Opens a finished segment, compressed or not. Another shard may compress
+    its segment meanwhile, so the compressed file is tried again if the text
+    file has just been removed.
+
+    Argument:
+    base(str): Path of the segment without extension
+
+    Return:
+    file: The segment opened as text
+    """
+    if os.path.exists(base + ".log.gz"):
+        return gzip.open(base + ".log.gz", "rt", encoding="utf-8")
+    try:
+        return open(base + ".log", encoding="utf-8")
+    except FileNotFoundError:
+        return gzip.open(base + ".log.gz", "rt", encoding="utf-8")
+
+
+def compress(base):
+    """
+    Compresses a rotated segment, replacing its text file.
+
+    Argument:
+    base(str): Path of the segment without extension
+    """
+    with open(base + ".log", "rb") as source:
+        with gzip.open(base + ".log.gz.tmp", "wb") as target:
+            shutil.copyfileobj(source, target)
+    os.replace(base + ".log.gz.tmp", base + ".log.gz")
+    os.remove(base + ".log")
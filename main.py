@@ -1,28 +1,144 @@
 import discord
-import random, datetime
+import asyncio, os, random, datetime, time
+import importlib, importlib.util, io, traceback
+import logarchive
+import matchmaking
+import messages
+import metrics
+import prefs
+import profiler
+import reaper
 import uno
+import store
+import triggers
+import ratelimit
+import strategy
 
-client = discord.Client()
+# Sharding is configured by the environment, as set by shards.py
+shard_id = int(os.environ.get("UNLIKEBOT_SHARD_ID", "0"))
+shard_count = int(os.environ.get("UNLIKEBOT_SHARD_COUNT", "1"))
+uno.configure_sharding(
+        store.connect(os.environ.get("UNLIKEBOT_STORE")),
+        shard_id)
+# PreferenceStore of users and channels, cached by each shard in front of a
+# database they share, opened by open_preferences when the bot starts
+preferences = None
 
-with open("token.txt", "r") as token_file:
-    token = token_file.read();
+class Client(discord.Client):
+    """discord.Client timing the messages it sends, edits and uploads."""
+    async def send_message(self, *args, **kwargs):
+        return await metrics.timed(
+                "bot_api_seconds",
+                'method="send_message"',
+                super().send_message(*args, **kwargs))
+
+    async def edit_message(self, *args, **kwargs):
+        return await metrics.timed(
+                "bot_api_seconds",
+                'method="edit_message"',
+                super().edit_message(*args, **kwargs))
+
+    async def send_file(self, *args, **kwargs):
+        return await metrics.timed(
+                "bot_api_seconds",
+                'method="send_file"',
+                super().send_file(*args, **kwargs))
+
+
+client = Client(shard_id=shard_id, shard_count=shard_count)
 
-is_curious = False
 channels = []
+MASTER_ID = "119701092731715585"    # ID of the user administering the bot
+# Modules replaced by `.reload`, each after the modules it imports
+RELOADED_MODULES = [uno, strategy]
+
+uno_lobbies = {}        # dict of str: list of discord.User, keyed by channel ID
+uno_target_scores = {}  # dict of str: int, keyed by channel ID
+uno_house_rules = {}    # dict of str: list of str, keyed by channel ID
+# dict of str: float, monotonic time of the last command of each lobby, keyed
+# by channel ID
+uno_lobby_activity = {}
+inbox_task = None       # asyncio.Task processing messages from other shards
+flusher_task = None     # asyncio.Task writing changed preferences
+# Users of this shard waiting to be matched into a game, from any channel of
+# this shard. Games are played by the shard of their channel, so users of
+# servers on other shards are not matched with them.
+match_queue = matchmaking.MatchQueue()
+# Commands outside of games allowed per user and per channel
+user_limiter = ratelimit.RateLimiter(rate=0.5, capacity=5)
+channel_limiter = ratelimit.RateLimiter(rate=2, capacity=10)
+# Log of the messages seen by this shard
+log = logarchive.LogArchive(prefix="shard" + str(shard_id))
+LOGSEARCH_LIMIT = 20    # Records sent back by `.logsearch` at most
+# Port of the metrics endpoint of the first shard, each shard serving on the
+# next port, or None to not serve metrics
+metrics_port = os.environ.get("UNLIKEBOT_METRICS_PORT")
+metrics_server = None   # asyncio.AbstractServer serving the metrics
+
+# Lobbies and games idle for longer than their TTL are closed, and the least
+# recently active ones are closed when there are too many or they hold too
+# much memory
+LOBBY_TTL = float(os.environ.get("UNLIKEBOT_LOBBY_TTL", 15 * 60))
+GAME_TTL = float(os.environ.get("UNLIKEBOT_GAME_TTL", 30 * 60))
+MAX_SESSIONS = int(os.environ.get("UNLIKEBOT_MAX_SESSIONS", 1000))
+MAX_SESSION_BYTES = int(os.environ.get(
+        "UNLIKEBOT_MAX_SESSION_BYTES", 256 * 1024 * 1024))
+REAP_INTERVAL = 60      # Seconds between sweeps of the reaper
+reaper_task = None      # asyncio.Task closing idle lobbies and games, and
+                        # removing users who waited too long in the queue
+session_bytes = 0       # Approximate bytes held by lobbies and games, as of
+                        # the last sweep
+SIZE_SAMPLES = 20       # Games measured at most by a sweep, so that a sweep
+                        # stalls the loop for a few milliseconds at most
+# dict of str: tuple, (Game, approximate bytes, monotonic time measured) of the
+# games measured, keyed by channel ID
+game_sizes = {}
+PROFILE_TOP = 10        # Functions listed in each ranking of a profile
+profiling = False       # Whether a profile is being taken
 
-is_playing_uno = False
-uno_players = []
-uno_host_channel = None
-log = None
+# Commands answered before the game of their author, so that they are throttled
+# for players in a game too
+GLOBAL_COMMANDS = [".help", ".ping", ".pong", ".curious", ".trigger",
+        ".unlikesuika", ".reload", ".logsearch", ".profile"]
+# Commands counted by name in the metrics; others are counted together, so
+# that made-up commands cannot add labels without limit
+COUNTED_COMMANDS = [".help", ".ping", ".pong", ".curious", ".trigger",
+        ".unlikesuika", ".spectate", ".unspectate", ".uno", ".ujoin", ".ubot",
+        ".ustart", ".ustop", ".p", ".play", ".d", ".draw", ".k", ".keep",
+        ".s", ".send", ".r", ".y", ".g", ".b", ".n", ".swap", ".hand",
+        ".turn", ".last", ".unohelp", ".announce", ".images", ".reload",
+        ".profile", ".logsearch", ".red", ".yellow", ".green", ".blue", ".yes", ".no",
+        ".uno!", ".catch", ".queue", ".unqueue"]
+# dict of str: str, metric label of each counted command
+command_labels = dict((command, 'command="' + command + '"')
+        for command in COUNTED_COMMANDS)
+OTHER_COMMAND_LABEL = 'command="other"'
+NO_COMMAND_LABEL = 'command="none"'
+metrics.register_gauge("bot_lobbies", lambda: len(uno_lobbies))
+metrics.register_gauge("bot_session_bytes", lambda: session_bytes)
+metrics.register_gauge("bot_queue_waiting", lambda: len(match_queue))
 
 @client.event
 async def on_ready():
-    global log
-    open_log()
-    log.write("========== {0} ==========\n".format(str(datetime.datetime.now())))
-    log.write("Bot is now booting up.\n")
+    log.write("========== {0} ==========\n".format(str(datetime.datetime.now()))
+            + "Bot is now booting up.\n")
     print("Name: " + client.user.name)
     print("ID: " + client.user.id)
+    print("Shard: {0} of {1}".format(shard_id + 1, shard_count))
+    global inbox_task
+    if inbox_task is None:
+        inbox_task = asyncio.ensure_future(uno.run_inbox())
+    global reaper_task
+    if reaper_task is None:
+        reaper_task = asyncio.ensure_future(run_reaper())
+    global flusher_task
+    if flusher_task is None:
+        flusher_task = asyncio.ensure_future(preferences.run_flusher())
+    global metrics_server
+    if metrics_port is not None and metrics_server is None:
+        metrics_server = await metrics.serve(int(metrics_port) + shard_id)
+        print("Metrics: http://127.0.0.1:{0}/metrics".format(
+                int(metrics_port) + shard_id))
     global channels
     channels = client.get_all_channels()
     """
@@ -32,35 +148,76 @@ async def on_ready():
         except:
             pass
     """
-    close_log()
 
 
 @client.event
 async def on_message(message):
-    global log
-    open_log()
-    log.write("----- on_message -----\n")
-    log.write("timestamp: {0}\n".format(str(message.timestamp)))
-    log.write("author name: {0}\n".format(message.author.name))
-    log.write("author ID: {0}\n".format(message.author.id))
-    log.write("content: {0}\n".format(message.content))
-    log.write("server: {0}\n".format(str(message.server)))
-    log.write("channel: {0}\n".format(str(message.channel)))
-    close_log()
+    started = time.monotonic()
+    if message.content.startswith("."):
+        label = command_labels.get(
+                message.content.split(None, 1)[0].lower(),
+                OTHER_COMMAND_LABEL)
+    else:
+        label = NO_COMMAND_LABEL
+    try:
+        await respond_to_message(message)
+    finally:
+        metrics.inc("bot_messages_total", label)
+        metrics.observe(
+                "bot_message_seconds",
+                time.monotonic() - started,
+                label)
+
+
+async def respond_to_message(message):
+    # The game of the author may be played by another shard, whose queue
+    # limits its inputs as it would on that shard
+    forwarded = (message.content.startswith(".")
+            and message.channel.is_private
+            and message.author != client.user
+            and uno.find_game(message.author) is None
+            and await uno.forward_to_owner(message))
+    # Throttled commands are dropped before costing a log write or a reply.
+    # Inputs to a game are left to the limits of the game.
+    if (message.content.startswith(".")
+            and message.author != client.user
+            and not forwarded
+            and (uno.find_game(message.author) is None
+                    or message.content.split(None, 1)[0].lower()
+                            in GLOBAL_COMMANDS)):
+        result = ratelimit.check_all([
+                (user_limiter, message.author.id),
+                (channel_limiter, message.channel.id)])
+        if result == ratelimit.NOTIFY:
+            await client.send_message(
+                    message.channel,
+                    message.author.name
+                    + ", slow down! Try again in a few seconds.")
+        if result != ratelimit.ALLOW:
+            return
+    log.write_record({
+            "timestamp": str(message.timestamp),
+            "author name": message.author.name,
+            "author ID": message.author.id,
+            "content": message.content,
+            "server": str(message.server),
+            "channel": str(message.channel),
+            "channel ID": message.channel.id})
     if message.author == client.user:
         return
 
-    if message.content.lower() == "ayy":
-        await client.send_message(message.channel, "lmao")
-    elif "unlike" in message.content.lower():
-        await client.send_message(message.channel, "**U N L I K E**")
-    
+    server_id = None if message.server is None else message.server.id
+    response = triggers.respond(server_id, message.content.lower())
+    if response is not None:
+        await client.send_message(message.channel, response)
+
+    if forwarded:
+        return
+
     if message.content.startswith("."):
         command_str = message.content
         command_words = message.content.split()
 
-        global is_playing_uno, uno_players, uno_host_channel
-
         if command_words[0].lower() == ".help":
             await post_command_list(message.channel)
         elif command_words[0].lower() == ".ping":
@@ -69,94 +226,219 @@ async def on_message(message):
             await client.send_message(message.channel, "Ping!")
         elif command_words[0].lower() == ".curious":
             if (len(command_words) < 2 
-                    or command_words[1].lower() not in ["on", "off"]):
+                    or command_words[1].lower() not in ["on", "off", "me"]
+                    or (command_words[1].lower() == "me"
+                            and (len(command_words) < 3
+                                    or command_words[2].lower() not in [
+                                            "on", "off"]))):
                 await client.send_message(
                         message.channel,
-                        "`.curious on` or `.curious off`?")
+                        "`.curious on`, `.curious off` for this channel, or "
+                        + "`.curious me on`, `.curious me off` for you?")
                 return
-            global is_curious
-            if command_words[1].lower() == "off":
+            if command_words[1].lower() == "me":
+                # Users who opt out are left alone in every channel
+                opted_out = command_words[2].lower() == "off"
+                preferences.set(
+                        prefs.USER,
+                        message.author.id,
+                        "curious_opt_out",
+                        opted_out)
+                if opted_out:
+                    await client.send_message(
+                            message.channel,
+                            "Okay, I'll never disturb you while you type.")
+                else:
+                    await client.send_message(
+                            message.channel,
+                            "Okay, I may ask what you are typing again.")
+            elif command_words[1].lower() == "off":
                 await client.send_message(
                         message.channel,
                         "Okay, I'll stop disturbing you while you type.")
-                is_curious = False
+                preferences.set(
+                        prefs.CHANNEL, message.channel.id, "curious", False)
             else:
-                is_curious = True
+                preferences.set(
+                        prefs.CHANNEL, message.channel.id, "curious", True)
                 await client.send_message(
                         message.channel,
                         "<:chew:313116045718323211>\n"
                         + "    <:duwang:232058392196153345>")
+        elif command_words[0].lower() == ".trigger":
+            await edit_triggers(message, command_words)
         elif command_words[0].lower() == ".unlikesuika":
-            await client.send_message(message.channel, "<@119701092731715585>")
-        elif is_playing_uno:
-            if not await uno.process_message(message):
-                # Game ended
-                is_playing_uno = False
-                uno_players = []
-                uno_host_channel = None
-        elif command_words[0].lower() == ".uno":
-            if uno_players:
+            await client.send_message(message.channel, "<@" + MASTER_ID + ">")
+        elif command_words[0].lower() == ".reload":
+            if message.author.id != MASTER_ID:
+                await client.send_message(
+                        message.channel,
+                        "Only the master can reload the bot.")
+            else:
+                await reload_modules(message.channel)
+        elif command_words[0].lower() == ".logsearch":
+            if message.author.id != MASTER_ID:
+                await client.send_message(
+                        message.channel,
+                        "Only the master can search the log.")
+            else:
+                await search_log(message, command_words)
+        elif command_words[0].lower() == ".profile":
+            if message.author.id != MASTER_ID:
+                await client.send_message(
+                        message.channel,
+                        "Only the master can profile the bot.")
+            else:
+                await profile(message, command_words)
+        elif uno.find_game(message.author) is not None:
+            await uno.process_message(message)
+        elif command_words[0].lower() in [".spectate", ".unspectate"]:
+            if not uno.is_hosting(message.channel):
                 await client.send_message(
                         message.channel,
-                        "**"
-                        + uno_players[0].name
-                        + "** has already hosted the game. Type `.ujoin` to "
-                        + "join their game. To start the game, the dealer must "
-                        + "type `.ustart`.")
+                        "There is no game being played in this channel.")
+            elif command_words[0].lower() == ".spectate":
+                await uno.spectate(message.author, message.channel)
+            else:
+                await uno.unspectate(message.author, message.channel)
+        elif command_words[0].lower() == ".uno":
+            refusal = refuse_hosting(message)
+            if refusal is not None:
+                await client.send_message(message.channel, refusal)
                 return
-            elif str(discord.PrivateChannel) == str(type(message.channel)):
+            options = [word.lower() for word in command_words[1:]]
+            house_rules = []
+            for option in options:
+                if option in uno.HOUSE_RULES:
+                    house_rules.append(option)
+                elif option != "match":
+                    await client.send_message(
+                            message.channel,
+                            "`" + option + "` is not a house rule. Choose from "
+                            + ", ".join("`" + name + "`"
+                                    for name in uno.HOUSE_RULES)
+                            + ".")
+                    return
+            if not await make_room():
                 await client.send_message(
                         message.channel,
-                        "You can't host in a private channel.")
+                        "Too many games are being played right now. Try "
+                        + "again later.")
+                return
+            # Making room waits for the games closed, so the channel or the
+            # author may have found a game meanwhile
+            refusal = refuse_hosting(message)
+            if refusal is not None:
+                await client.send_message(message.channel, refusal)
                 return
-            uno_players.append(message.author)
-            uno_host_channel = message.channel
+            uno_lobbies[message.channel.id] = [message.author]
+            uno_target_scores[message.channel.id] = 0
+            uno_house_rules[message.channel.id] = house_rules
+            uno_lobby_activity[message.channel.id] = time.monotonic()
+            match_str = ""
+            if "match" in options:
+                uno_target_scores[message.channel.id] = uno.MATCH_SCORE
+                match_str = (" Rounds are played until someone reaches "
+                        + str(uno.MATCH_SCORE)
+                        + " points.")
+            for name in house_rules:
+                match_str += "\n- " + uno.HOUSE_RULES[name] + "."
             await client.send_message(
                     message.channel,
                     "**"
                     + message.author.name
                     + "** is the dealer. Type `.ujoin` to join their game. The "
-                    + "dealer must type `.ustart` to start the game.")
+                    + "dealer must type `.ustart` to start the game."
+                    + match_str)
         elif command_words[0].lower() == ".ujoin":
+            uno_players = uno_lobbies.get(message.channel.id)
             if not uno_players:
                 await client.send_message(
                         message.channel,
                         "The game has not been hosted yet. Type `.uno` to host "
                         + "a game.")
-            elif message.channel != uno_host_channel:
-                await client.send_message(
-                        message.channel,
-                        "The game is being hosted at `#"
-                        + str(uno_host_channel)
-                        + "`. Please join or start the game at that channel.")
             elif message.author in uno_players:
                 await client.send_message(
                         message.channel,
                         "You are already in this game.")
-            elif len(uno_players) >= 10:
+            elif find_uno_lobby(message.author) is not None:
+                await client.send_message(
+                        message.channel,
+                        "You have already joined a game in another channel.")
+            elif message.author.id in match_queue:
                 await client.send_message(
                         message.channel,
-                        "Only up to ten players can join per game.")
+                        "You are waiting in the queue. Type `.unqueue` to "
+                        + "leave it first.")
+            elif len(uno_players) >= uno.MAX_PLAYERS:
+                await client.send_message(
+                        message.channel,
+                        "Only up to "
+                        + str(uno.MAX_PLAYERS)
+                        + " players can join per game.")
             else:
                 uno_players.append(message.author)
+                uno_lobby_activity[message.channel.id] = time.monotonic()
                 await client.send_message(
                         message.channel,
                         message.author.name
                         + " joins as **Player #"
                         + str(len(uno_players))
                         + "**.")
+        elif command_words[0].lower() == ".ubot":
+            uno_players = uno_lobbies.get(message.channel.id)
+            strategy_name = "greedy"
+            if len(command_words) >= 2:
+                strategy_name = command_words[1].lower()
+            if not uno_players:
+                await client.send_message(
+                        message.channel,
+                        "The game has not been hosted yet. Type `.uno` to host "
+                        + "a game.")
+            elif message.author != uno_players[0]:
+                await client.send_message(
+                        message.channel,
+                        "Only the dealer can add computer players.")
+            elif strategy_name not in strategy.STRATEGIES:
+                await client.send_message(
+                        message.channel,
+                        "Choose the computer player from `"
+                        + "`, `".join(sorted(strategy.STRATEGIES))
+                        + "`.")
+            elif len(uno_players) >= uno.MAX_PLAYERS:
+                await client.send_message(
+                        message.channel,
+                        "Only up to "
+                        + str(uno.MAX_PLAYERS)
+                        + " players can join per game.")
+            else:
+                bot = uno.BotUser(strategy.STRATEGIES[strategy_name]())
+                uno_players.append(bot)
+                uno_lobby_activity[message.channel.id] = time.monotonic()
+                await client.send_message(
+                        message.channel,
+                        bot.name
+                        + " joins as **Player #"
+                        + str(len(uno_players))
+                        + "**.")
+        elif command_words[0].lower() == ".queue":
+            await join_queue(message)
+        elif command_words[0].lower() == ".unqueue":
+            if match_queue.remove(message.author.id) is None:
+                await client.send_message(
+                        message.channel,
+                        "You are not waiting in the queue.")
+            else:
+                await client.send_message(
+                        message.channel,
+                        message.author.name + " has left the queue.")
         elif command_words[0].lower() == ".ustart":
+            uno_players = uno_lobbies.get(message.channel.id)
             if not uno_players:
                 await client.send_message(
                         message.channel,
                         "There is no game being hosted right now. Type `.uno`"
                         + " to host a game.")
-            elif message.channel != uno_host_channel:
-                await client.send_message(
-                        message.channel,
-                        "The game is being hosted at `#"
-                        + str(uno_host_channel)
-                        + "`. Please join or start the game at that channel.")
             elif len(uno_players) == 1:
                 await client.send_message(
                         message.channel,
@@ -173,31 +455,32 @@ async def on_message(message):
                         "You are not the dealer. The dealer must start the "
                         + "game.")
             else:
-                is_playing_uno = True
-                await uno.start(uno_players, client, uno_host_channel)
+                del(uno_lobbies[message.channel.id])
+                del(uno_lobby_activity[message.channel.id])
+                await uno.start(
+                        uno_players,
+                        client,
+                        message.channel,
+                        uno_target_scores.pop(message.channel.id),
+                        uno_house_rules.pop(message.channel.id))
         elif command_words[0].lower() == ".ustop":
-            if not uno_players:
+            if message.channel.id not in uno_lobbies:
                 await client.send_message(
                         message.channel,
                         "There is no game being hosted right now.")
-            elif message.channel != uno_host_channel:
-                await client.send_message(
-                        message.channel,
-                        "The game is being hosted at `#"
-                        + str(uno_host_channel)
-                        + "`. Please stop the game at that channel.")
             else:
                 await client.send_message(
                         message.channel,
                         "The game is no longer hosted.")
-                is_playing_uno = False
-                uno_players = []
-                uno_host_channel = None
-                
+                close_lobby(message.channel.id)
+
 
 @client.event
 async def on_typing(channel, user, when):
-    if is_curious:
+    # Typing events are frequent, so both checks are read from memory
+    if (preferences.get(prefs.CHANNEL, channel.id, "curious", False)
+            and not preferences.get(
+                    prefs.USER, user.id, "curious_opt_out", False)):
         await client.send_message(
                 channel,
                 "What are you typing, "
@@ -205,25 +488,601 @@ async def on_typing(channel, user, when):
                 + "?")
 
 
+def refuse_hosting(message):
+    """
+    Returns why the author of a message cannot host a game in its channel
+
+    Argument:
+    message(discord.Message)
+
+    Return:
+    str: The reason to send back, or None if they can host
+    """
+    if message.channel.id in uno_lobbies:
+        return ("**"
+                + uno_lobbies[message.channel.id][0].name
+                + "** has already hosted the game. Type `.ujoin` to "
+                + "join their game. To start the game, the dealer must "
+                + "type `.ustart`.")
+    elif message.channel.is_private:
+        return "You can't host in a private channel."
+    elif uno.is_hosting(message.channel):
+        return "A game is already being played in this channel."
+    elif find_uno_lobby(message.author) is not None:
+        return "You have already joined a game in another channel."
+    elif message.author.id in match_queue:
+        return ("You are waiting in the queue. Type `.unqueue` to "
+                + "leave it first.")
+    return None
+
+
+def find_uno_lobby(user):
+    """
+    Returns the ID of the channel whose UNO lobby the user has joined
+
+    Argument:
+    user(discord.User)
+
+    Return:
+    str: ID of the channel, or None if the user has not joined any lobby
+    """
+    for channel_id, uno_players in uno_lobbies.items():
+        if user in uno_players:
+            return channel_id
+    return None
+
+
+async def join_queue(message):
+    """
+    Puts the author in the matchmaking queue, and starts a game once enough
+    players of close ratings are waiting.
+
+    Argument:
+    message(discord.Message)
+    """
+    if message.channel.is_private:
+        await client.send_message(
+                message.channel,
+                "You can join the queue from a server channel.")
+        return
+    if message.author.id in match_queue:
+        await client.send_message(
+                message.channel,
+                "You are already waiting in the queue.")
+        return
+    if find_uno_lobby(message.author) is not None:
+        await client.send_message(
+                message.channel,
+                "You have already joined a game in another channel.")
+        return
+    # Users who have gone away must not be seated at the new table
+    await expire_queue()
+    rating = preferences.get(
+            prefs.USER,
+            message.author.id,
+            "rating",
+            matchmaking.DEFAULT_RATING)
+    table = match_queue.add(message.author, rating, message.channel)
+    if table is None:
+        await client.send_message(
+                message.channel,
+                "**{0}** is waiting for a game with a rating of {1:.0f}. "
+                "{2} players are waiting.".format(
+                        message.author.name, rating, len(match_queue)))
+        return
+    if not await make_room():
+        # Players who found another game meanwhile stop waiting
+        match_queue.put_back([waiting for waiting in table
+                if find_uno_lobby(waiting.user) is None
+                        and uno.find_game(waiting.user) is None])
+        await client.send_message(
+                message.channel,
+                "**{0}** is waiting for a game with a rating of {1:.0f}. "
+                "A table is ready, but too many games are being played "
+                "right now.".format(message.author.name, rating))
+        return
+    # The game is hosted where the player who waited longest queued, or the
+    # next free channel
+    channel = None
+    for waiting in sorted(table, key=lambda waiting: waiting.since):
+        if (waiting.channel.id not in uno_lobbies
+                and not uno.is_hosting(waiting.channel)):
+            channel = waiting.channel
+            break
+    if channel is None:
+        match_queue.put_back(table)
+        await client.send_message(
+                message.channel,
+                "**{0}** is waiting for a game with a rating of {1:.0f}. "
+                "A table is ready, but every channel of its players is "
+                "busy.".format(message.author.name, rating))
+        return
+    names = ", ".join("**{0}** ({1:.0f})".format(
+            waiting.user.name, waiting.rating) for waiting in table)
+    for waiting in table:
+        if waiting.channel.id != channel.id:
+            await client.send_message(
+                    waiting.channel,
+                    "**{0}**, your game is starting in {1}.".format(
+                            waiting.user.name, channel.mention))
+    await client.send_message(
+            channel,
+            "A game from the queue is starting with " + names + ".")
+    await uno.start([waiting.user for waiting in table], client, channel)
+
+
+async def expire_queue():
+    """
+    Removes the users who have waited too long in the queue, telling them in
+    the channel they queued in.
+    """
+    for waiting in match_queue.expire():
+        metrics.inc("bot_queue_expired_total")
+        await client.send_message(
+                waiting.channel,
+                "**{0}** has left the queue after {1} minutes without a "
+                "game.".format(
+                        waiting.user.name,
+                        int(match_queue.max_wait // 60)))
+
+
+def close_lobby(channel_id):
+    """
+    Removes the UNO lobby of a channel
+
+    Argument:
+    channel_id(str)
+
+    Return:
+    list of discord.User: Players who had joined the lobby
+    """
+    del(uno_target_scores[channel_id])
+    del(uno_house_rules[channel_id])
+    del(uno_lobby_activity[channel_id])
+    return uno_lobbies.pop(channel_id)
+
+
+async def make_room():
+    """
+    Closes the least recently active lobbies and games if there are
+    MAX_SESSIONS already, waiting until they are closed.
+
+    Return:
+    bool: Whether another lobby or game may open
+    """
+    if len(uno_lobbies) + len(uno.games) >= MAX_SESSIONS:
+        await reap_sessions(MAX_SESSIONS - 1)
+    return len(uno_lobbies) + len(uno.games) < MAX_SESSIONS
+
+
+async def run_reaper():
+    """
+    Closes idle lobbies and games, and removes the users who have waited too
+    long in the queue, every REAP_INTERVAL seconds.
+    """
+    while True:
+        await asyncio.sleep(REAP_INTERVAL)
+        try:
+            await reap_sessions(MAX_SESSIONS)
+            await expire_queue()
+        except Exception:
+            traceback.print_exc()
+
+
+async def reap_sessions(max_sessions):
+    """
+    Measures the lobbies and games, then closes those idle for longer than
+    their TTL and the least recently active ones over the limits. Games are
+    stopped by their own queue, which is waited for.
+
+    Argument:
+    max_sessions(int): Lobbies and games to keep at most
+    """
+    global session_bytes, game_sizes
+    # Objects belonging to a single game, looked up each time as `.reload`
+    # replaces the classes. Rule sets are shared by the games with the same
+    # house rules.
+    game_types = (uno.Game, uno.Player, uno.Card)
+    shared = list(uno.rule_sets.values())
+    sessions = []
+    for channel_id, uno_players in uno_lobbies.items():
+        sessions.append(reaper.Session(
+                channel_id,
+                "lobby",
+                uno_lobby_activity[channel_id],
+                reaper.approximate_size(
+                        [uno_players, uno_house_rules[channel_id]])))
+    # Walking a game takes about a millisecond, so only the new games and
+    # those measured longest ago are measured, and the others keep their
+    # last size
+    live = [(channel_id, game) for channel_id, game in uno.games.items()
+            if not game.is_over]
+    sizes = {}
+    for channel_id, game in live:
+        measured = game_sizes.get(channel_id)
+        if measured is not None and measured[0] is game:
+            sizes[channel_id] = measured
+    stale = sorted(live, key=lambda item: sizes.get(item[0], (0, 0, 0))[2])
+    now = time.monotonic()
+    for channel_id, game in stale[:SIZE_SAMPLES]:
+        sizes[channel_id] = (
+                game,
+                reaper.approximate_size(game, game_types, shared),
+                now)
+    game_sizes = sizes
+    # Games left to measure count as the average game so far
+    average = 0
+    if sizes:
+        average = sum(size for game, size, when in sizes.values()) // len(
+                sizes)
+    for channel_id, game in live:
+        sessions.append(reaper.Session(
+                channel_id,
+                "game",
+                game.last_active,
+                sizes.get(channel_id, (game, average, now))[1]))
+    session_bytes = sum(session.size for session in sessions)
+    stops = []
+    victims = reaper.choose_victims(
+            sessions,
+            time.monotonic(),
+            {"lobby": LOBBY_TTL, "game": GAME_TTL},
+            max_sessions,
+            MAX_SESSION_BYTES)
+    for session, reason in victims:
+        metrics.inc(
+                "bot_sessions_reaped_total",
+                'kind="' + session.kind + '",reason="' + reason + '"')
+        session_bytes -= session.size
+        if reason == reaper.EXPIRED:
+            why = "after {0} minutes without activity".format(
+                    int((LOBBY_TTL if session.kind == "lobby" else GAME_TTL)
+                            // 60))
+        else:
+            why = "to make room for other games"
+        if session.kind == "game":
+            game = uno.games[session.key]
+            stopped = asyncio.get_event_loop().create_future()
+            game.submit(
+                    uno.expire_game,
+                    game,
+                    "The game has been stopped " + why + ".",
+                    stopped)
+            # A game ending first never reaches the input
+            waited = [stopped]
+            if game.worker is not None:
+                waited.append(game.worker)
+            stops.append(asyncio.wait(
+                    waited,
+                    return_when=asyncio.FIRST_COMPLETED))
+            continue
+        uno_players = close_lobby(session.key)
+        channel = client.get_channel(session.key)
+        if channel is not None:
+            await client.send_message(
+                    channel,
+                    "The game hosted by **"
+                    + uno_players[0].name
+                    + "** is no longer hosted "
+                    + why
+                    + ".")
+    if stops:
+        await asyncio.gather(*stops)
+
+
+async def edit_triggers(message, command_words):
+    """
+    Lists, adds or removes the auto-responses of the server.
+
+    Arguments:
+    message      (discord.Message)
+    command_words(list of str)    : Words of the command
+    """
+    usage = ("`.trigger list`, `.trigger add [exact/contains] <words> = "
+            + "<response>` or `.trigger remove <words>`?")
+    if len(command_words) < 2 or command_words[1].lower() not in [
+            "list", "add", "remove"]:
+        await client.send_message(message.channel, usage)
+        return
+    if message.server is None:
+        await client.send_message(
+                message.channel,
+                "Auto-responses are set up in a server.")
+        return
+    action = command_words[1].lower()
+    if action == "list":
+        content = ""
+        for pattern, mode, response in triggers.get_set(
+                message.server.id).list():
+            content += "`{0}` ({1}) - {2}\n".format(pattern, mode, response)
+        if not content:
+            content = "There are no auto-responses in this server."
+        await client.send_message(message.channel, content)
+        return
+    if not message.channel.permissions_for(message.author).manage_server:
+        await client.send_message(
+                message.channel,
+                "Only those who can manage the server can change its "
+                + "auto-responses.")
+        return
+    # The words of the trigger may contain spaces, so take them as written
+    argument = message.content.split(None, 2)[2:]
+    argument = argument[0] if argument else ""
+    trigger_set = triggers.edit_set(message.server.id)
+    if action == "remove":
+        if trigger_set.remove(argument.strip()):
+            await client.send_message(
+                    message.channel,
+                    "`{0}` no longer gets a response.".format(
+                            argument.strip().lower()))
+        else:
+            await client.send_message(
+                    message.channel,
+                    "There is no auto-response to `{0}`.".format(
+                            argument.strip()))
+        return
+    mode = triggers.CONTAINS
+    first_word = argument.split(None, 1)[:1]
+    if first_word and first_word[0].lower() in triggers.MODES:
+        mode = first_word[0].lower()
+        argument = argument.split(None, 1)[1:]
+        argument = argument[0] if argument else ""
+    pattern, separator, response = argument.partition("=")
+    pattern = pattern.strip()
+    response = response.strip()
+    if not separator or not pattern or not response:
+        await client.send_message(message.channel, usage)
+    elif (len(pattern) > triggers.MAX_PATTERN_LENGTH
+            or len(response) > triggers.MAX_RESPONSE_LENGTH):
+        await client.send_message(
+                message.channel,
+                "That auto-response is too long.")
+    elif (len(trigger_set) >= triggers.MAX_TRIGGERS
+            and trigger_set.automaton.get(pattern.lower()) is None):
+        await client.send_message(
+                message.channel,
+                "This server already has {0} auto-responses.".format(
+                        triggers.MAX_TRIGGERS))
+    else:
+        trigger_set.add(pattern, mode, response)
+        await client.send_message(
+                message.channel,
+                "`{0}` now gets a response.".format(pattern.lower()))
+
+
+def load_scratch(module):
+    """
+    Runs the current source of a module in a new module object, so that
+    errors are found before the module itself is reloaded. Gauges registered
+    by the scratch module are put back.
+
+    Argument:
+    module(module)
+
+    Return:
+    module: The scratch module
+    """
+    gauges = dict(metrics.gauges)
+    try:
+        spec = importlib.util.find_spec(module.__name__)
+        scratch = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(scratch)
+    finally:
+        metrics.gauges.clear()
+        metrics.gauges.update(gauges)
+    return scratch
+
+
+async def reload_modules(channel):
+    """
+    Reloads the game modules, moving the live games onto the new code. Every
+    game is paused between two inputs while its state is moved, and messages
+    for it wait in its queue meanwhile.
+
+    Argument:
+    channel(discord.Channel): Where to report the reload
+    """
+    try:
+        scratch = load_scratch(uno)
+        for module in RELOADED_MODULES[1:]:
+            load_scratch(module)
+    except Exception as error:
+        traceback.print_exc()
+        await client.send_message(
+                channel,
+                "The new code does not load, so nothing was reloaded.```\n"
+                + "".join(traceback.format_exception_only(
+                        type(error), error))[-1500:]
+                + "```")
+        return
+    if scratch.STATE_VERSION < uno.STATE_VERSION:
+        await client.send_message(
+                channel,
+                "The new code cannot take the state of the games, so nothing "
+                + "was reloaded.")
+        return
+    started = time.monotonic()
+    resumes = await uno.pause_games()
+    paused = time.monotonic()
+    old_games = list(uno.games.values())
+    # Reloading runs the new code in the namespaces of the modules, which are
+    # put back as they were if the games cannot be moved
+    namespaces = [dict(module.__dict__) for module in RELOADED_MODULES]
+    try:
+        state = uno.export_state()
+        for module in RELOADED_MODULES:
+            importlib.reload(module)
+        num_games = uno.import_state(state)
+    except Exception as error:
+        traceback.print_exc()
+        for module, namespace in zip(RELOADED_MODULES, namespaces):
+            module.__dict__.clear()
+            module.__dict__.update(namespace)
+        await client.send_message(
+                channel,
+                "Reloading failed, so the games go on with the old code.```\n"
+                + "".join(traceback.format_exception_only(
+                        type(error), error))[-1500:]
+                + "```")
+        return
+    finally:
+        for resumed in resumes:
+            resumed.set_result(None)
+    # The old workers see that their games are over, and stop. The old
+    # processes run the old strategies, so the new module starts its own.
+    for game in old_games:
+        game.retire()
+    if state["bot_executor"] is not None:
+        state["bot_executor"].shutdown(wait=False)
+    swapped = time.monotonic()
+    for uno_players in uno_lobbies.values():
+        uno_players[:] = [uno.restore_user(user) for user in uno_players]
+    metrics.observe("bot_reload_seconds", swapped - paused)
+    await client.send_message(
+            channel,
+            "Reloaded with {0} games moved. Pausing them took {1:.1f} ms, "
+            "then moving them took {2:.1f} ms.".format(
+                    num_games,
+                    (paused - started) * 1000,
+                    (swapped - paused) * 1000))
+
+
+async def profile(message, command_words):
+    """
+    Samples the event loop for some seconds, then sends the master a summary
+    by PM, with the collapsed stacks attached for flame graphs. Messages keep
+    being handled while the profile is taken.
+
+    Arguments:
+    message      (discord.Message)
+    command_words(list of str)    : Words of the command
+    """
+    global profiling
+    try:
+        seconds = float(command_words[1])
+    except (IndexError, ValueError):
+        seconds = 0
+    if not 0 < seconds <= profiler.MAX_SECONDS:
+        await client.send_message(
+                message.channel,
+                "`.profile <seconds>`, up to {0} seconds?".format(
+                        profiler.MAX_SECONDS))
+        return
+    if profiling:
+        await client.send_message(
+                message.channel,
+                "A profile is already being taken.")
+        return
+    profiling = True
+    sampler = profiler.SamplingProfiler()
+    try:
+        await client.send_message(
+                message.channel,
+                "Profiling for {0:g} seconds.".format(seconds))
+        sampler.start()
+        await asyncio.sleep(seconds)
+    finally:
+        # Joining the sampler waits for one interval at most
+        sampler.stop()
+        profiling = False
+    for chunk in messages.split(sampler.summary(PROFILE_TOP)):
+        await client.send_message(message.author, chunk)
+    if sampler.num_samples:
+        await client.send_file(
+                message.author,
+                io.BytesIO(sampler.collapsed().encode()),
+                filename="profile.txt")
+
+
+async def search_log(message, command_words):
+    """
+    Searches the log in the worker thread of the log, and sends the master
+    the matching messages by PM. The finished segments of every shard are
+    searched, but only the current segment of this shard.
+
+    Arguments:
+    message      (discord.Message)
+    command_words(list of str)    : Words of the command, e.g. `.logsearch
+                                    author:<ID> since:2017-05-01 hello`
+    """
+    filters = {}
+    words = []
+    for word in command_words[1:]:
+        name, separator, value = word.partition(":")
+        if separator and name.lower() in ["author", "channel", "since",
+                "until"]:
+            filters[name.lower()] = value
+        else:
+            words.append(word)
+    if not words and not filters:
+        await client.send_message(
+                message.channel,
+                "`.logsearch [author:<ID>] [channel:<ID>] [since:<date>] "
+                + "[until:<date>] <text>`?")
+        return
+    query = logarchive.Query(" ".join(words), **filters)
+    matches, num_read, num_segments = (
+            await asyncio.get_event_loop().run_in_executor(
+                    logarchive.executor,
+                    log.search,
+                    query,
+                    LOGSEARCH_LIMIT,
+                    log.snapshot()))
+    lines = ["{0} messages found, reading {1} of {2} segments.".format(
+            len(matches), num_read, num_segments)]
+    for record in matches:
+        lines.append("`{0}` #{1} **{2}**: {3}".format(
+                record["timestamp"][:19],
+                record["channel"],
+                record["author name"],
+                record["content"]))
+    for chunk in messages.split("\n".join(lines)):
+        await client.send_message(message.author, chunk)
+
+
+def open_preferences(path):
+    """
+    Opens the preferences of users and channels, and hands them to the game
+    module
+
+    Argument:
+    path(str): Path of the database, or ":memory:"
+    """
+    global preferences
+    preferences = prefs.PreferenceStore(path)
+    uno.configure_preferences(preferences)
+
+
 async def post_command_list(channel):
     content = "`.help` - You probably already know this.\n"
     content += "`.uno`- Hosts a game for UNO.\n"
+    content += "`.uno match` - Hosts a match of UNO rounds played until "
+    content += "someone reaches 500 points.\n"
+    content += "`.uno [stack] [jumpin] [sevenzero] [drawuntil]` - Hosts a game "
+    content += "with house rules.\n"
+    content += "`.queue` - Waits for a game with players of a close rating, "
+    content += "from any channel. `.unqueue` stops waiting.\n"
+    content += "`.ubot [greedy/random/montecarlo]` - Adds a computer player "
+    content += "to the hosted game.\n"
+    content += "`.spectate` - Follows the game played in the channel through "
+    content += "a status message sent by PM. `.unspectate` stops it.\n"
     content += "`.ping` - Responds with Pong.\n"
     content += "`.pong` - Responds with Ping.\n"
-    content += "`.curious [on/off]` - Bugs a person whenever they type when "
-    content += "toggled on.\n"
+    content += "`.curious [on/off]` - Bugs a person whenever they type in the "
+    content += "channel when toggled on. `.curious me off` opts you out.\n"
+    content += "`.trigger [list/add/remove]` - Lists or sets up the "
+    content += "auto-responses of the server.\n"
     content += "`.unlikesuika` - Pings the master.\n"
     content += "`ayy` - lmao"
     await client.send_message(channel, content)
 
-def open_log():
-    global log
-    if (log is None) or log.closed:
-        log = open("log.txt", "a")
-
-def close_log():
-    global log
-    if (not log is None) and (not log.closed):
-        log.close()
 
-client.run(token)
+if __name__ == "__main__":
+    open_preferences(os.environ.get("UNLIKEBOT_PREFS", "prefs.db"))
+    with open("token.txt", "r") as token_file:
+        token = token_file.read();
+    try:
+        client.run(token)
+    finally:
+        # Changes still waiting for the flusher would be lost on a restart
+        preferences.close()
@@ -0,0 +1,331 @@
+"""
+Matchmaking of users waiting for a game across channels, by rating.
+
+Waiting users are kept in a skip list ordered by rating, so that adding or
+removing one takes O(log n) expected time, and the users closest in rating to
+a newcomer are its neighbours in the list. Users who wait longer than the
+longest wait leave the queue, so that those who have gone away do not hold
+places in it.
+
+A queue is kept by each shard, whose games start on that shard, so users only
+meet users of the servers of the same shard.
+"""
+
+import itertools
+import random
+import time
+
+DEFAULT_RATING = 1000       # Rating of a user who has not played yet
+K_FACTOR = 32               # Most rating a round can move between two players
+TABLE_SIZE = 4              # Players a table starts with
+MAX_SPREAD = 200            # Rating between the lowest and highest player of
+                            # a table at most
+MAX_LEVEL = 16              # Levels of the skip list, enough for 2 ** 16 users
+MAX_WAIT = 15 * 60          # Seconds a user waits in the queue at most
+
+class Waiting:
+    """
+    A user waiting in the queue.
+
+    Attributes:
+    user   (discord.User)
+    rating (float)
+    channel(discord.Channel): Channel the user queued in
+    since  (float)          : Monotonic time the user started waiting
+    key    (tuple)          : Rating then sequence number, ordering the queue
+    """
+    __slots__ = ["user", "rating", "channel", "since", "key"]
+
+    def __init__(self, user, rating, channel, key):
+        """
+        Constructor of the waiting user.
+
+        Arguments:
+        user   (discord.User)
+        rating (float)
+        channel(discord.Channel)
+        key    (tuple)
+        """
+        self.user = user
+        self.rating = rating
+        self.channel = channel
+        self.since = time.monotonic()
+        self.key = key
+
+
+class Node:
+    """
+    Node of the skip list.
+
+    Attributes:
+    key     (tuple)
+    value   (Waiting)
+    forward (list of Node): Next node at each level, or None
+    backward(Node)        : Previous node at the lowest level, or the head
+    """
+    __slots__ = ["key", "value", "forward", "backward"]
+
+    def __init__(self, key, value, level):
+        """
+        Constructor of the node.
+
+        Arguments:
+        key  (tuple)
+        value(Waiting)
+        level(int)    : Number of levels the node is linked at
+        """
+        self.key = key
+        self.value = value
+        self.forward = [None] * level
+        self.backward = None
+
+
+class SkipList:
+    """
+    Values ordered by key, with O(log n) expected insertion and removal.
+
+    Attributes:
+    head  (Node): Node before the first, linked at every level
+    level (int) : Number of levels in use
+    length(int) : Number of values
+    """
+    def __init__(self):
+        """Constructor of an empty list."""
+        self.head = Node(None, None, MAX_LEVEL)
+        self.level = 1
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def __find__(self, key):
+        """
+        Returns the last node before the key at every level.
+
+        Argument:
+        key(tuple)
+
+        Return:
+        list of Node
+        """
+        update = [self.head] * MAX_LEVEL
+        node = self.head
+        for i in range(self.level - 1, -1, -1):
+            while node.forward[i] is not None and node.forward[i].key < key:
+                node = node.forward[i]
+            update[i] = node
+        return update
+
+    def insert(self, key, value):
+        """
+        Inserts a value. Keys must be unique.
+
+        Arguments:
+        key  (tuple)
+        value(object)
+
+        Return:
+        Node: The node of the value
+        """
+        update = self.__find__(key)
+        level = 1
+        while level < MAX_LEVEL and random.random() < 0.5:
+            level += 1
+        self.level = max(self.level, level)
+        node = Node(key, value, level)
+        for i in range(level):
+            node.forward[i] = update[i].forward[i]
+            update[i].forward[i] = node
+        node.backward = update[0]
+        if node.forward[0] is not None:
+            node.forward[0].backward = node
+        self.length += 1
+        return node
+
+    def remove(self, key):
+        """
+        Removes the value of a key, if there is one.
+
+        Argument:
+        key(tuple)
+        """
+        update = self.__find__(key)
+        node = update[0].forward[0]
+        if node is None or node.key != key:
+            return
+        for i in range(len(node.forward)):
+            update[i].forward[i] = node.forward[i]
+        if node.forward[0] is not None:
+            node.forward[0].backward = node.backward
+        while self.level > 1 and self.head.forward[self.level - 1] is None:
+            self.level -= 1
+        self.length -= 1
+
+
+class MatchQueue:
+    """
+    Users waiting for a table, grouped by rating.
+
+    Attributes:
+    table_size(int)              : Players a table starts with
+    max_spread(float)            : Rating between the lowest and highest
+                                   player of a table at most
+    max_wait  (float)            : Seconds a user waits at most
+    waiting   (SkipList)         : Waiting users ordered by rating
+    nodes     (dict of str: Node): Node of each waiting user, by user ID
+    counter   (iterator)         : Sequence numbers telling apart users with
+                                   the same rating
+    """
+    def __init__(self, table_size=TABLE_SIZE, max_spread=MAX_SPREAD,
+            max_wait=MAX_WAIT):
+        """
+        Constructor of the queue.
+
+        Arguments:
+        table_size(int)
+        max_spread(float)
+        max_wait  (float)
+        """
+        self.table_size = table_size
+        self.max_spread = max_spread
+        self.max_wait = max_wait
+        self.waiting = SkipList()
+        self.nodes = {}
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, user_id):
+        return user_id in self.nodes
+
+    def add(self, user, rating, channel):
+        """
+        Adds a user to the queue, then forms a table with the users closest
+        in rating if enough of them are close enough.
+
+        Arguments:
+        user   (discord.User)
+        rating (float)
+        channel(discord.Channel): Channel the user queued in
+
+        Return:
+        list of Waiting: Players of the table formed, who have left the
+                         queue, or None if the user keeps waiting
+        """
+        key = (rating, next(self.counter))
+        self.nodes[user.id] = self.waiting.insert(
+                key, Waiting(user, rating, channel, key))
+        return self.__form_table__(self.nodes[user.id])
+
+    def put_back(self, table):
+        """
+        Returns the players of a table that could not start to the queue, in
+        their places, without forming a table again.
+
+        Argument:
+        table(list of Waiting)
+        """
+        for waiting in table:
+            self.nodes[waiting.user.id] = self.waiting.insert(
+                    waiting.key, waiting)
+
+    def remove(self, user_id):
+        """
+        Removes a user from the queue.
+
+        Argument:
+        user_id(str)
+
+        Return:
+        Waiting: The user removed, or None if they were not waiting
+        """
+        node = self.nodes.pop(user_id, None)
+        if node is None:
+            return None
+        self.waiting.remove(node.key)
+        return node.value
+
+    def expire(self, now=None):
+        """
+        Removes the users who have waited longer than max_wait.
+
+        Argument:
+        now(float): Monotonic time, or None for the current time
+
+        Return:
+        list of Waiting: The users removed
+        """
+        if now is None:
+            now = time.monotonic()
+        expired = [node.value for node in self.nodes.values()
+                if now - node.value.since > self.max_wait]
+        for waiting in expired:
+            self.remove(waiting.user.id)
+        return expired
+
+    def __form_table__(self, node):
+        """
+        Finds the tightest run of table_size users in rating order that
+        includes a node, and takes them out of the queue if their spread is
+        small enough. Only the neighbours of the node are looked at.
+
+        Argument:
+        node(Node)
+
+        Return:
+        list of Waiting: Players of the table, or None
+        """
+        if len(self.nodes) < self.table_size:
+            return None
+        around = [node.value]
+        before = node.backward
+        while len(around) < self.table_size and before is not self.waiting.head:
+            around.insert(0, before.value)
+            before = before.backward
+        start = len(around) - 1
+        after = node.forward[0]
+        while len(around) < start + self.table_size and after is not None:
+            around.append(after.value)
+            after = after.forward[0]
+        best = None
+        for i in range(max(0, start - self.table_size + 1),
+                min(start, len(around) - self.table_size) + 1):
+            spread = around[i + self.table_size - 1].rating - around[i].rating
+            if spread <= self.max_spread and (best is None
+                    or spread < best[0]):
+                best = (spread, i)
+        if best is None:
+            return None
+        table = around[best[1]:best[1] + self.table_size]
+        for waiting in table:
+            self.remove(waiting.user.id)
+        return table
+
+
+def rating_changes(ratings, winner_index):
+    """
+    Returns how the ratings of the players of a round change, Elo style: the
+    winner beats every other player, and each pairing weighs 1 / (n - 1) of a
+    game between two players.
+
+    Arguments:
+    ratings     (list of float): Rating of every player
+    winner_index(int)
+
+    Return:
+    list of float: Change of the rating of every player
+    """
+    if len(ratings) < 2:
+        # Nobody was beaten
+        return [0.0] * len(ratings)
+    weight = K_FACTOR / (len(ratings) - 1)
+    changes = [0.0] * len(ratings)
+    winner = ratings[winner_index]
+    for i, rating in enumerate(ratings):
+        if i == winner_index:
+            continue
+        expected = 1 / (1 + 10 ** ((rating - winner) / 400))
+        changes[winner_index] += weight * (1 - expected)
+        changes[i] -= weight * (1 - expected)
+    return changes
@@ -0,0 +1,82 @@
+"""
+Splits messages that are too long for Discord into as few messages as
+possible.
+"""
+
+MAX_LENGTH = 2000         # Characters Discord allows in a message
+MIN_LENGTH = 32           # Characters a message must allow to be split
+FENCE = "```"             # Opens and closes a code block
+MAX_LANGUAGE = 16         # Characters of the language of a code block kept
+                          # when the block is opened again
+
+def __reopening__(content, start):
+    """
+    Returns the line opening the code block that is open at a position, so
+    that it can be opened again in the next message.
+
+    Arguments:
+    content(str)
+    start  (int): Position of the fence opening the code block
+
+    Return:
+    str: The fence with its language, then a line break
+    """
+    end = content.find("\n", start)
+    language = content[start + len(FENCE):end] if end != -1 else ""
+    if (" " in language or "`" in language
+            or len(language) > MAX_LANGUAGE):
+        # Text on the same line as the fence is part of the code
+        language = ""
+    return FENCE + language + "\n"
+
+
+def split(content, limit=MAX_LENGTH):
+    """
+    Splits a message into as few messages as fit the limit, at line breaks if
+    possible, then at spaces. A code block split across messages is closed at
+    the end of one and opened again at the start of the next.
+
+    Arguments:
+    content(str)
+    limit  (int): Characters allowed in each message, at least MIN_LENGTH
+
+    Return:
+    list of str
+    """
+    if len(content) <= limit:
+        return [content]
+    if limit < MIN_LENGTH:
+        raise ValueError("cannot split messages to " + str(limit)
+                + " characters")
+    chunks = []
+    prefix = ""               # Fence opening the code block carried over
+    while len(prefix) + len(content) > limit:
+        # Leave room to close a code block
+        room = limit - len(prefix) - len(FENCE)
+        # A boundary is only taken if it fills at least half of the message,
+        # so that early boundaries do not add messages
+        cut = content.rfind("\n", 0, room + 1)
+        if cut < room // 2:
+            cut = max(cut, content.rfind(" ", 0, room + 1))
+        skip = 1
+        if cut < room // 2 or cut <= 0:
+            cut = room
+            skip = 0
+            # Do not cut a fence in two
+            while cut > 1 and content[cut - 1] == "`":
+                cut -= 1
+        chunk = prefix + content[:cut]
+        fences = []
+        position = chunk.find(FENCE)
+        while position != -1:
+            fences.append(position)
+            position = chunk.find(FENCE, position + len(FENCE))
+        if len(fences) % 2 == 1:
+            chunks.append(chunk + FENCE)
+            prefix = __reopening__(chunk, fences[-1])
+        else:
+            chunks.append(chunk)
+            prefix = ""
+        content = content[cut + skip:]
+    chunks.append(prefix + content)
+    return chunks
@@ -0,0 +1,294 @@
+"""
+Counters, gauges and histograms of the bot, served in the Prometheus text
+format by an optional HTTP endpoint on the event loop of the bot.
+
+Metrics are only updated from the event loop thread, so they need no locks: an
+increment is a single dictionary update.
+"""
+
+import asyncio
+import bisect
+import collections
+
+# dict of (str, str): int, keyed by the metric name and its label
+counters = collections.Counter()
+# dict of str: function, reading the current value of the gauge by its name
+gauges = {}
+# dict of (str, str): Histogram, keyed by the metric name and its label
+histograms = {}
+
+# Upper bounds in seconds of the buckets of every histogram
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5,
+        5, 10)
+LAG_INTERVAL = 1          # Seconds between measures of the event loop lag
+HEALTHY_LAG = 5           # Seconds of event loop lag above which the bot is
+                          # reported unhealthy
+REQUEST_TIMEOUT = 5       # Seconds a client has to send its HTTP request
+
+def inc(name, label="", amount=1):
+    """
+    Adds to a counter.
+
+    Arguments:
+    name  (str): Name of the counter
+    label (str): Label distinguishing the counter, e.g. 'view="hand"'
+    amount(int)
+    """
+    counters[(name, label)] += amount
+
+
+def get(name, label=""):
+    """
+    Returns the value of a counter.
+
+    Arguments:
+    name (str)
+    label(str)
+
+    Return:
+    int
+    """
+    return counters[(name, label)]
+
+
+def hit_rate(hits_name, misses_name, label=""):
+    """
+    Returns the rate of cache hits.
+
+    Arguments:
+    hits_name  (str): Name of the counter of hits
+    misses_name(str): Name of the counter of misses
+    label      (str)
+
+    Return:
+    float: Rate of hits, or 0 if the cache has not been used
+    """
+    hits = get(hits_name, label)
+    total = hits + get(misses_name, label)
+    if total == 0:
+        return 0.0
+    return hits / total
+
+
+def register_gauge(name, read):
+    """
+    Registers a gauge whose value is read when it is needed.
+
+    Arguments:
+    name(str)
+    read(function): Function returning the current value
+    """
+    gauges[name] = read
+
+
+def read_gauges():
+    """
+    Returns the current values of all gauges.
+
+    Return:
+    dict of str: float
+    """
+    values = {}
+    for name, read in gauges.items():
+        values[name] = read()
+    return values
+
+
+class Histogram:
+    """
+    Distribution of observed values, counted in the buckets of BUCKETS.
+
+    Attributes:
+    counts(list of int): Values observed in each bucket, then above the last
+    sum   (float)      : Sum of the observed values
+    count (int)        : Number of observed values
+    """
+    __slots__ = ["counts", "sum", "count"]
+
+    def __init__(self):
+        """Constructor of an empty histogram."""
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        Counts a value.
+
+        Argument:
+        value(float)
+        """
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def observe(name, value, label=""):
+    """
+    Adds a value to a histogram.
+
+    Arguments:
+    name (str)  : Name of the histogram
+    value(float): Observed value, usually in seconds
+    label(str)  : Label distinguishing the histogram, e.g. 'method="send"'
+    """
+    histogram = histograms.get((name, label))
+    if histogram is None:
+        histogram = histograms[(name, label)] = Histogram()
+    histogram.observe(value)
+
+
+async def timed(name, label, awaitable):
+    """
+    Waits for an awaitable, and adds the seconds it took to a histogram.
+
+    Arguments:
+    name     (str)
+    label    (str)
+    awaitable(awaitable)
+
+    Return:
+    object: The result of the awaitable
+    """
+    loop = asyncio.get_event_loop()
+    started = loop.time()
+    try:
+        return await awaitable
+    finally:
+        observe(name, loop.time() - started, label)
+
+
+def __labels__(label, extra):
+    """
+    Returns the labels of a sample in braces.
+
+    Arguments:
+    label(str): Label of the metric, or ""
+    extra(str): Label of the sample, or ""
+
+    Return:
+    str
+    """
+    both = ",".join(part for part in [label, extra] if part)
+    if not both:
+        return ""
+    return "{" + both + "}"
+
+
+def export():
+    """
+    Returns all metrics in the Prometheus text format.
+
+    Return:
+    str
+    """
+    lines = []
+    typed = set()
+    for name, label in sorted(counters):
+        if name not in typed:
+            typed.add(name)
+            lines.append("# TYPE " + name + " counter")
+        lines.append(name + __labels__(label, "") + " "
+                + str(counters[(name, label)]))
+    for name, value in sorted(read_gauges().items()):
+        lines.append("# TYPE " + name + " gauge")
+        lines.append(name + " " + str(value))
+    for name, label in sorted(histograms):
+        if name not in typed:
+            typed.add(name)
+            lines.append("# TYPE " + name + " histogram")
+        histogram = histograms[(name, label)]
+        cumulative = 0
+        for bound, count in zip(BUCKETS, histogram.counts):
+            cumulative += count
+            lines.append(name + "_bucket"
+                    + __labels__(label, 'le="' + str(bound) + '"')
+                    + " " + str(cumulative))
+        lines.append(name + "_bucket" + __labels__(label, 'le="+Inf"') + " "
+                + str(histogram.count))
+        lines.append(name + "_sum" + __labels__(label, "") + " "
+                + repr(histogram.sum))
+        lines.append(name + "_count" + __labels__(label, "") + " "
+                + str(histogram.count))
+    return "\n".join(lines) + "\n"
+
+
+loop_lag = 0.0            # Seconds the last timer of the lag watch was late
+
+async def watch_loop_lag():
+    """
+    Measures forever how late the event loop wakes up a sleeping task, which
+    is how long callbacks keep the loop busy.
+    """
+    global loop_lag
+    loop = asyncio.get_event_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        loop_lag = max(0.0, loop.time() - started - LAG_INTERVAL)
+        observe("bot_event_loop_lag_seconds", loop_lag)
+
+
+register_gauge("bot_event_loop_lag_seconds_last", lambda: loop_lag)
+
+
+async def handle_request(reader, writer):
+    """
+    Answers an HTTP request for /metrics or /health, then closes the
+    connection.
+
+    Arguments:
+    reader(asyncio.StreamReader)
+    writer(asyncio.StreamWriter)
+    """
+    try:
+        request_line = await asyncio.wait_for(
+                reader.readline(),
+                REQUEST_TIMEOUT)
+        # Headers are read and ignored
+        while True:
+            line = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+            if line in [b"\r\n", b"\n", b""]:
+                break
+    except (asyncio.TimeoutError, ConnectionError, ValueError):
+        writer.close()
+        return
+    words = request_line.decode("latin-1").split()
+    path = words[1].split("?")[0] if len(words) >= 2 else ""
+    if len(words) < 2 or words[0] != "GET":
+        status, body = "405 Method Not Allowed", "Only GET is allowed.\n"
+    elif path == "/metrics":
+        status, body = "200 OK", export()
+    elif path == "/health":
+        if loop_lag > HEALTHY_LAG:
+            status, body = "503 Service Unavailable", "lagging\n"
+        else:
+            status, body = "200 OK", "ok\n"
+    else:
+        status, body = "404 Not Found", "Try /metrics or /health.\n"
+    body = body.encode("utf-8")
+    writer.write(("HTTP/1.0 " + status + "\r\n"
+            + "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            + "Content-Length: " + str(len(body)) + "\r\n"
+            + "Connection: close\r\n\r\n").encode("latin-1") + body)
+    try:
+        await writer.drain()
+    except ConnectionError:
+        pass
+    writer.close()
+
+
+async def serve(port, host="127.0.0.1"):
+    """
+    Serves the metrics over HTTP on the running event loop, and starts
+    measuring its lag.
+
+    Arguments:
+    port(int)
+    host(str): Address to listen on, local only by default
+
+    Return:
+    asyncio.AbstractServer
+    """
+    asyncio.ensure_future(watch_loop_lag())
+    return await asyncio.start_server(handle_request, host, port)
@@ -0,0 +1,277 @@
+"""
+Preferences of users and channels, kept in SQLite.
+
+Every preference is loaded into memory when the store opens, so reading one is
+a dictionary lookup. Changes are applied to memory at once, and written to the
+database in batches by a write-behind flusher in a worker thread, so the event
+loop never waits on the disk.
+
+Each shard keeps its own cache of a database shared by the shards. A flush
+writes only the preferences this shard changed, then reads back those the
+other shards wrote since the last flush, found by the serial number every
+write transaction stamps on its rows. A change made on another shard is thus
+seen within about two flush intervals, and when shards set the same
+preference, the last write wins. Numbers changed with add are written as
+additions to the value in the database instead, so that the additions of every
+shard count.
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import sqlite3
+import traceback
+
+FLUSH_INTERVAL = 5          # Seconds between writes of changed preferences
+
+USER = "user"               # Scope of preferences of a user
+CHANNEL = "channel"         # Scope of preferences of a channel
+
+class PreferenceStore:
+    """
+    Preferences cached in memory and written behind to SQLite.
+
+    Attributes:
+    connection(sqlite3.Connection): Database, only used by the executor after
+                                    the store opens, until it closes
+    values    (dict of tuple: object): Value of each preference, keyed by
+                                    (scope, ID, name)
+    dirty     (dict of tuple: object): Values set since the last flush
+    added     (dict of tuple: tuple) : Amounts added since the last flush to
+                                    preferences not set meanwhile, as
+                                    (default, amount)
+    serial    (int)                  : Highest serial read from the database
+    executor  (concurrent.futures.ThreadPoolExecutor): Thread writing to and
+                                    reading from the database
+    """
+    def __init__(self, path):
+        """
+        Constructor of the store, loading every preference.
+
+        Argument:
+        path(str): Path of the database, or ":memory:"
+        """
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS preferences ("
+                "scope TEXT, id TEXT, name TEXT, value TEXT, "
+                "serial INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (scope, id, name))")
+        columns = [row[1] for row in self.connection.execute(
+                "PRAGMA table_info(preferences)")]
+        if "serial" not in columns:
+            # Databases written before the serials count as written first
+            self.connection.execute(
+                    "ALTER TABLE preferences "
+                    "ADD COLUMN serial INTEGER NOT NULL DEFAULT 0")
+        self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS preferences_serial "
+                "ON preferences (serial)")
+        self.connection.commit()
+        self.values = {}
+        self.dirty = {}
+        self.added = {}
+        rows, self.serial = self.__read__(-1)
+        self.__apply__(rows)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def get(self, scope, id, name, default=None):
+        """
+        Returns a preference from memory.
+
+        Arguments:
+        scope  (str)   : USER or CHANNEL
+        id     (str)   : ID of the user or channel
+        name   (str)   : Name of the preference, e.g. "images"
+        default(object): Value of a preference that was never set
+
+        Return:
+        object
+        """
+        return self.values.get((scope, id, name), default)
+
+    def set(self, scope, id, name, value):
+        """
+        Changes a preference in memory, to be written at the next flush.
+
+        Arguments:
+        scope(str)
+        id   (str)
+        name (str)
+        value(object): Value that can be stored as JSON
+        """
+        self.values[(scope, id, name)] = value
+        self.dirty[(scope, id, name)] = value
+        self.added.pop((scope, id, name), None)
+
+    def add(self, scope, id, name, amount, default=0):
+        """
+        Adds to a number in memory. The next flush adds the same amount to the
+        value in the database, whichever shard wrote it last.
+
+        Arguments:
+        scope  (str)
+        id     (str)
+        name   (str)
+        amount (float)
+        default(float): Value of a preference that was never set
+        """
+        key = (scope, id, name)
+        self.values[key] = self.values.get(key, default) + amount
+        if key in self.dirty:
+            # The value set is written whole, with the amount in it
+            self.dirty[key] = self.values[key]
+        else:
+            pending = self.added.get(key, (default, 0))[1]
+            self.added[key] = (default, pending + amount)
+
+    async def flush(self):
+        """
+        Writes the changed preferences in a single transaction, then takes on
+        those written by other shards. If writing fails, the changes are kept
+        for the next flush, unless changed again meanwhile.
+        """
+        loop = asyncio.get_event_loop()
+        batch = self.dirty
+        added = self.added
+        self.dirty = {}
+        self.added = {}
+        if batch or added:
+            try:
+                await loop.run_in_executor(
+                        self.executor,
+                        self.__write__,
+                        self.__rows__(batch),
+                        self.__added_rows__(added))
+            except sqlite3.Error:
+                for key, value in batch.items():
+                    self.dirty.setdefault(key, value)
+                for key, (default, amount) in added.items():
+                    # A value set since holds the amount already
+                    if key not in self.dirty:
+                        pending = self.added.get(key, (default, 0))[1]
+                        self.added[key] = (default, amount + pending)
+                raise
+        rows, self.serial = await loop.run_in_executor(
+                self.executor, self.__read__, self.serial)
+        self.__apply__(rows)
+
+    def close(self):
+        """
+        Writes the changed preferences left, once a flush in progress has
+        finished, and closes the database. Called when the bot stops, after
+        its event loop has closed.
+        """
+        self.executor.shutdown(wait=True)
+        batch = self.dirty
+        added = self.added
+        self.dirty = {}
+        self.added = {}
+        if batch or added:
+            self.__write__(self.__rows__(batch), self.__added_rows__(added))
+        self.connection.close()
+
+    def __rows__(self, batch):
+        """
+        Returns the rows to write for changed preferences.
+
+        Argument:
+        batch(dict of tuple: object): Values keyed by (scope, ID, name)
+
+        Return:
+        list of tuple: (scope, ID, name, value as JSON)
+        """
+        return [(scope, id, name, json.dumps(value))
+                for (scope, id, name), value in batch.items()]
+
+    def __added_rows__(self, added):
+        """
+        Returns the rows to write for amounts added to preferences.
+
+        Argument:
+        added(dict of tuple: tuple): (default, amount) keyed by (scope, ID,
+                                     name)
+
+        Return:
+        list of tuple: (scope, ID, name, value as JSON if the preference was
+                       never written, amount)
+        """
+        return [(scope, id, name, json.dumps(default + amount), amount)
+                for (scope, id, name), (default, amount) in added.items()]
+
+    def __write__(self, rows, added_rows):
+        """
+        Writes rows to the database, then adds the amounts. Runs in the
+        executor, or when the store closes.
+
+        Arguments:
+        rows      (list of tuple): (scope, ID, name, value as JSON)
+        added_rows(list of tuple): (scope, ID, name, value as JSON if the
+                                   preference was never written, amount)
+        """
+        with self.connection:
+            # The write lock is taken before the serial is chosen, so that
+            # serials grow in the order the shards commit
+            self.connection.execute("BEGIN IMMEDIATE")
+            serial = self.connection.execute(
+                    "SELECT COALESCE(MAX(serial), 0) + 1 "
+                    "FROM preferences").fetchone()[0]
+            self.connection.executemany(
+                    "INSERT OR REPLACE INTO preferences "
+                    "(scope, id, name, value, serial) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [row + (serial,) for row in rows])
+            self.connection.executemany(
+                    "INSERT INTO preferences "
+                    "(scope, id, name, value, serial) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (scope, id, name) DO UPDATE "
+                    "SET value = value + ?, serial = excluded.serial",
+                    [(scope, id, name, value, serial, amount)
+                            for scope, id, name, value, amount
+                            in added_rows])
+
+    def __read__(self, since):
+        """
+        Reads the rows written after a serial. Runs in the executor after the
+        store opens.
+
+        Argument:
+        since(int): Serial of the last rows read, or -1 for every row
+
+        Return:
+        tuple: Rows as (scope, ID, name, value as JSON), then the highest
+               serial read
+        """
+        rows = []
+        for scope, id, name, value, serial in self.connection.execute(
+                "SELECT scope, id, name, value, serial FROM preferences "
+                "WHERE serial > ?", (since,)):
+            rows.append((scope, id, name, value))
+            since = max(since, serial)
+        return rows, since
+
+    def __apply__(self, rows):
+        """
+        Takes on rows read from the database, except for the preferences set
+        here since, which are newer. Amounts added here since are added again.
+
+        Argument:
+        rows(list of tuple): (scope, ID, name, value as JSON)
+        """
+        for scope, id, name, value in rows:
+            key = (scope, id, name)
+            if key in self.dirty:
+                continue
+            self.values[key] = json.loads(value)
+            if key in self.added:
+                self.values[key] += self.added[key][1]
+
+    async def run_flusher(self):
+        """Flushes the changed preferences every FLUSH_INTERVAL seconds."""
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except sqlite3.Error:
+                traceback.print_exc()
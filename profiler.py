@@ -0,0 +1,198 @@
+"""
+Sampling profiler run on demand by `.profile`.
+
+A thread wakes up every few milliseconds and records the stack of the event
+loop thread. Nothing is sampled between profiles, so the bot only pays for
+profiling while a profile is running.
+"""
+
+import collections
+import os
+import sys
+import threading
+
+INTERVAL = 0.005          # Seconds between samples
+MAX_SECONDS = 60          # Longest profile allowed
+MAX_DEPTH = 64            # Frames kept of each stack, from the innermost
+# Functions of the bot that stacks are grouped under, as "module:function"
+ENTRY_POINTS = ["main:on_message", "uno:process_message", "uno:Game.run",
+        "uno:Game.run_queue"]
+OTHER_ENTRY = "other"     # Group of stacks under none of the entry points
+IDLE_ENTRY = "idle"       # Group of stacks of the loop waiting for events
+# Whether code objects know the qualified names of their functions, as they
+# do from Python 3.11. Before, frames only give the names of functions.
+HAS_QUALNAME = hasattr(sys._getframe().f_code, "co_qualname")
+
+def frame_label(frame):
+    """
+    Returns the name of the function of a frame, e.g. "uno:Game.run", or
+    "uno:run" without qualified names.
+
+    Argument:
+    frame(frame)
+
+    Return:
+    str
+    """
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    if HAS_QUALNAME:
+        return module + ":" + code.co_qualname
+    return module + ":" + code.co_name
+
+
+def entry_label(entry):
+    """
+    Returns the label frame_label gives to the function of an entry point.
+
+    Argument:
+    entry(str): Entry point, e.g. "uno:Game.run"
+
+    Return:
+    str
+    """
+    if HAS_QUALNAME:
+        return entry
+    module, name = entry.split(":", 1)
+    return module + ":" + name.rsplit(".", 1)[-1]
+
+
+# dict of str: str, entry point of each label of an entry point
+entry_labels = dict((entry_label(entry), entry) for entry in ENTRY_POINTS)
+
+
+class SamplingProfiler:
+    """
+    Stacks of a thread sampled at a steady interval by another thread.
+
+    Attributes:
+    thread_id  (int)                : Identifier of the sampled thread
+    interval   (float)              : Seconds between samples
+    stacks     (collections.Counter): Samples by stack, as tuples of labels
+                                      from the outermost frame
+    num_samples(int)                : Samples taken
+    stopped    (threading.Event)    : Set to stop sampling
+    sampler    (threading.Thread)   : Thread taking the samples, or None
+                                      before the profiler starts
+    """
+    def __init__(self, thread_id=None, interval=INTERVAL):
+        """
+        Constructor of the profiler.
+
+        Arguments:
+        thread_id(int)  : Thread to sample, or None for the calling thread
+        interval (float)
+        """
+        if thread_id is None:
+            thread_id = threading.get_ident()
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.num_samples = 0
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def start(self):
+        """Starts sampling in a daemon thread."""
+        self.sampler = threading.Thread(
+                target=self.__sample__,
+                name="profiler",
+                daemon=True)
+        self.sampler.start()
+
+    def stop(self):
+        """Stops sampling, and waits for the last sample to be recorded."""
+        self.stopped.set()
+        if self.sampler is not None:
+            self.sampler.join()
+
+    def __sample__(self):
+        """Records the stack of the sampled thread until stopped."""
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                return
+            labels = []
+            while frame is not None and len(labels) < MAX_DEPTH:
+                labels.append(frame_label(frame))
+                frame = frame.f_back
+            # Only the sampler writes the counter until it is stopped
+            self.stacks[tuple(reversed(labels))] += 1
+            self.num_samples += 1
+
+    def collapsed(self):
+        """
+        Returns the stacks in the collapsed format read by flame graph tools,
+        one "outer;inner count" line per stack.
+
+        Return:
+        str
+        """
+        return "".join(";".join(stack) + " " + str(count) + "\n"
+                for stack, count in self.stacks.most_common())
+
+    def summary(self, top):
+        """
+        Returns the share of samples under each entry point, and the
+        functions found most often on top of the stack and anywhere in it.
+
+        Argument:
+        top(int): Functions listed in each ranking
+
+        Return:
+        str
+        """
+        if not self.num_samples:
+            return "No samples were taken."
+        entries = collections.Counter()
+        own = collections.Counter()
+        total = collections.Counter()
+        for stack, count in self.stacks.items():
+            entries[entry_of(stack)] += count
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        lines = ["{0} samples every {1:g} ms".format(
+                self.num_samples, self.interval * 1000)]
+        lines.append("\nBy entry point:")
+        for label, count in entries.most_common():
+            lines.append(self.__line__(label, count))
+        lines.append("\nOn top of the stack:")
+        for label, count in own.most_common(top):
+            lines.append(self.__line__(label, count))
+        lines.append("\nAnywhere in the stack:")
+        for label, count in total.most_common(top):
+            lines.append(self.__line__(label, count))
+        return "```\n" + "\n".join(lines) + "```"
+
+    def __line__(self, label, count):
+        """
+        Returns a line of the summary.
+
+        Arguments:
+        label(str)
+        count(int): Samples of the label
+
+        Return:
+        str
+        """
+        return "{0:5.1f}% {1}".format(100 * count / self.num_samples, label)
+
+
+def entry_of(stack):
+    """
+    Returns the innermost entry point of a stack, so that a game input run by
+    the worker of the game is told apart from the message that queued it.
+
+    Argument:
+    stack(tuple of str): Labels from the outermost frame
+
+    Return:
+    str: An entry point, IDLE_ENTRY or OTHER_ENTRY
+    """
+    for label in reversed(stack):
+        if label in entry_labels:
+            return entry_labels[label]
+    if stack and stack[-1].endswith(("select", "poll")):
+        return IDLE_ENTRY
+    return OTHER_ENTRY
@@ -0,0 +1,122 @@
+import collections
+import time
+
+ALLOW = 0   # The command may run
+NOTIFY = 1  # The command is throttled, and its author should be told so
+DROP = 2    # The command is throttled, and its author has already been told
+
+class TokenBucket:
+    """
+    Token bucket allowing bursts of commands up to its capacity, refilled at a
+    steady rate.
+
+    Attributes:
+    tokens     (float): Commands that may run right now
+    updated    (float): Monotonic time the tokens were last refilled
+    is_notified(bool) : Whether a notice was sent since the bucket ran dry
+    """
+    __slots__ = ["tokens", "updated", "is_notified"]
+
+    def __init__(self, capacity, now):
+        """
+        Constructor of a full bucket.
+
+        Arguments:
+        capacity(float)
+        now     (float): Monotonic time
+        """
+        self.tokens = capacity
+        self.updated = now
+        self.is_notified = False
+
+    def take(self, rate, capacity, now):
+        """
+        Refills the bucket, and takes a token if there is one.
+
+        Arguments:
+        rate    (float): Tokens refilled per second
+        capacity(float)
+        now     (float): Monotonic time
+
+        Return:
+        bool: Whether a token was taken
+        """
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        self.is_notified = False
+        return True
+
+
+class RateLimiter:
+    """
+    Token buckets keyed by user or channel. Only the most recently used keys
+    are kept: a bucket evicted for being idle would have refilled anyway.
+
+    Attributes:
+    rate    (float)                  : Commands allowed per second
+    capacity(float)                  : Commands allowed in a burst
+    max_keys(int)                    : Buckets kept at most
+    buckets (collections.OrderedDict): TokenBucket by key, least recently
+                                       used first
+    """
+    def __init__(self, rate, capacity, max_keys=10000):
+        """
+        Constructor of the limiter.
+
+        Arguments:
+        rate    (float)
+        capacity(float)
+        max_keys(int)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self.buckets = collections.OrderedDict()
+
+    def check(self, key, now=None):
+        """
+        Takes a token for a command.
+
+        Arguments:
+        key(str)  : ID of the user or channel
+        now(float): Monotonic time, or None for the current time
+
+        Return:
+        int: ALLOW, NOTIFY or DROP
+        """
+        if now is None:
+            now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.capacity, now)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        if bucket.take(self.rate, self.capacity, now):
+            return ALLOW
+        if bucket.is_notified:
+            return DROP
+        bucket.is_notified = True
+        return NOTIFY
+
+
+def check_all(checks):
+    """
+    Combines the checks of several limiters, stopping at the first one that
+    throttles the command so that the others keep their tokens.
+
+    Argument:
+    checks(list of tuple): Limiter and key of each check
+
+    Return:
+    int: ALLOW, NOTIFY or DROP
+    """
+    for limiter, key in checks:
+        result = limiter.check(key)
+        if result != ALLOW:
+            return result
+    return ALLOW
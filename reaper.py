@@ -0,0 +1,106 @@
+import sys
+
+EXPIRED = "expired"     # The session has been idle for longer than its TTL
+EVICTED = "evicted"     # The session was the least recently active one when
+                        # there were too many sessions or bytes
+
+class Session:
+    """
+    A lobby or a game, as seen by the reaper.
+
+    Attributes:
+    key        (str)  : ID of the channel of the session
+    kind       (str)  : "lobby" or "game"
+    last_active(float): Monotonic time of the last input of a player
+    size       (int)  : Approximate bytes held by the session
+    """
+    __slots__ = ["key", "kind", "last_active", "size"]
+
+    def __init__(self, key, kind, last_active, size):
+        """
+        Constructor of the session.
+
+        Arguments:
+        key        (str)
+        kind       (str)
+        last_active(float)
+        size       (int)
+        """
+        self.key = key
+        self.kind = kind
+        self.last_active = last_active
+        self.size = size
+
+
+def approximate_size(root, owned_types=(), shared=()):
+    """
+    Returns the bytes held by an object, counting the containers and the
+    objects of the owned types it reaches. Other objects, such as Discord
+    users, are shared with the rest of the bot, so only their reference is
+    counted.
+
+    Arguments:
+    root       (object)
+    owned_types(tuple of type)   : Types whose attributes are counted too
+    shared     (iterable of object): Objects left out with everything they
+                                   reach, as other sessions hold them too
+
+    Return:
+    int
+    """
+    seen = set(id(obj) for obj in shared)
+    pending = [root]
+    total = 0
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pending.extend(obj)
+        elif isinstance(obj, owned_types):
+            if hasattr(obj, "__dict__"):
+                pending.append(obj.__dict__)
+            for name in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, name):
+                    pending.append(getattr(obj, name))
+    return total
+
+
+def choose_victims(sessions, now, ttls, max_sessions, max_bytes):
+    """
+    Chooses the sessions to close: those idle for longer than the TTL of their
+    kind, then the least recently active ones until at most 'max_sessions'
+    sessions holding at most 'max_bytes' bytes are left.
+
+    Arguments:
+    sessions    (list of Session)
+    now         (float)           : Monotonic time
+    ttls        (dict of str: float): Seconds of inactivity allowed, keyed by
+                                    the kind of session
+    max_sessions(int)
+    max_bytes   (int)
+
+    Return:
+    list of tuple: Session and EXPIRED or EVICTED, least recently active first
+    """
+    victims = []
+    kept = []
+    for session in sorted(sessions, key=lambda session: session.last_active):
+        if now - session.last_active > ttls[session.kind]:
+            victims.append((session, EXPIRED))
+        else:
+            kept.append(session)
+    num_sessions = len(kept)
+    num_bytes = sum(session.size for session in kept)
+    for session in kept:
+        if num_sessions <= max_sessions and num_bytes <= max_bytes:
+            break
+        victims.append((session, EVICTED))
+        num_sessions -= 1
+        num_bytes -= session.size
+    return victims
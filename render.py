@@ -0,0 +1,234 @@
+"""
+Renders hands of UNO cards as PNG images.
+
+Pillow is optional: without it, is_available() is False and the bot keeps
+showing hands as text.
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import io
+import threading
+import metrics
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+CARD_WIDTH = 48
+CARD_HEIGHT = 72
+MARGIN = 6               # Pixels around and between the cards
+LABEL_HEIGHT = 14        # Pixels under each card for its index
+CARDS_PER_ROW = 10
+CACHE_SIZE = 256         # Rendered hands kept at most
+
+# RGB of each card color, by the name of its CardColor
+COLORS = {
+        "RED": (215, 38, 0),
+        "YELLOW": (236, 212, 7),
+        "GREEN": (55, 151, 17),
+        "BLUE": (9, 86, 191),
+        "BLACK": (30, 30, 30)}
+# Text printed on each card, by the name of its CardType
+LABELS = {
+        "ZERO": "0", "ONE": "1", "TWO": "2", "THREE": "3", "FOUR": "4",
+        "FIVE": "5", "SIX": "6", "SEVEN": "7", "EIGHT": "8", "NINE": "9",
+        "SKIP": "S", "REVERSE": "R", "DRAW_TWO": "+2", "WILD": "W",
+        "WILD_DRAW_FOUR": "+4"}
+# RGB of the text on cards whose color does not read well on white
+TEXT_COLORS = {
+        "YELLOW": (160, 135, 0),
+        "BLACK": (0, 0, 0)}
+BACKGROUND = (54, 57, 63)  # The background of Discord's dark theme
+
+# Threads rendering the images, off the event loop
+render_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+def is_available():
+    """
+    Returns whether images can be rendered.
+
+    Return:
+    bool
+    """
+    return Image is not None
+
+
+class Atlas:
+    """
+    Sprites of all cards, drawn once into a single image and cut into one
+    image per card.
+
+    Attributes:
+    image  (PIL.Image.Image)                : All sprites side by side
+    sprites(dict of tuple: PIL.Image.Image) : Sprite of each card, keyed by
+                                              the names of its color and type
+    """
+    def __init__(self):
+        """Constructor of the atlas, drawing every sprite."""
+        pairs = []
+        for color in COLORS:
+            for type in LABELS:
+                if (color == "BLACK") == type.startswith("WILD"):
+                    pairs.append((color, type))
+        self.image = Image.new(
+                "RGB",
+                (CARD_WIDTH * len(pairs), CARD_HEIGHT),
+                BACKGROUND)
+        draw = ImageDraw.Draw(self.image)
+        font = ImageFont.load_default()
+        self.sprites = {}
+        for i in range(len(pairs)):
+            color, type = pairs[i]
+            left = i * CARD_WIDTH
+            draw.rounded_rectangle(
+                    [left, 0, left + CARD_WIDTH - 1, CARD_HEIGHT - 1],
+                    radius=6,
+                    fill=COLORS[color],
+                    outline=(255, 255, 255),
+                    width=2)
+            draw.ellipse(
+                    [left + 8, 16, left + CARD_WIDTH - 9, CARD_HEIGHT - 17],
+                    fill=(255, 255, 255))
+            # Yellow is too light to read on white
+            text_color = TEXT_COLORS.get(color, COLORS[color])
+            draw.text(
+                    (left + CARD_WIDTH // 2, CARD_HEIGHT // 2),
+                    LABELS[type],
+                    fill=text_color,
+                    font=font,
+                    anchor="mm")
+            self.sprites[(color, type)] = self.image.crop(
+                    (left, 0, left + CARD_WIDTH, CARD_HEIGHT))
+
+    def sprite(self, card):
+        """
+        Returns the sprite of a card.
+
+        Argument:
+        card(Card)
+
+        Return:
+        PIL.Image.Image
+        """
+        return self.sprites[(card.color.name, card.type.name)]
+
+
+atlas = None              # Atlas, drawn when the first image is rendered
+atlas_lock = threading.Lock()
+
+def get_atlas():
+    """
+    Returns the atlas, drawing it the first time.
+
+    Return:
+    Atlas
+    """
+    global atlas
+    with atlas_lock:
+        if atlas is None:
+            atlas = Atlas()
+    return atlas
+
+
+def render_hand(cards, top, wild_color):
+    """
+    Renders the top card and a hand with the index of each card under it.
+
+    Arguments:
+    cards     (list of Card)
+    top       (Card)        : Last discarded card
+    wild_color(CardColor)   : Color chosen for a Wild card on top, or BLACK
+
+    Return:
+    bytes: The PNG image
+    """
+    sprites = get_atlas()
+    rows = max(1, (len(cards) + CARDS_PER_ROW - 1) // CARDS_PER_ROW)
+    columns = max(1, min(len(cards), CARDS_PER_ROW))
+    # The top card has a column of its own, left of the hand
+    hand_left = MARGIN * 3 + CARD_WIDTH
+    cell_height = CARD_HEIGHT + LABEL_HEIGHT + MARGIN
+    image = Image.new(
+            "RGB",
+            (hand_left + columns * (CARD_WIDTH + MARGIN),
+                    MARGIN + rows * cell_height),
+            BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    image.paste(sprites.sprite(top), (MARGIN, MARGIN))
+    if wild_color.name != "BLACK":
+        draw.rectangle(
+                [MARGIN, MARGIN + CARD_HEIGHT + 2,
+                        MARGIN + CARD_WIDTH - 1,
+                        MARGIN + CARD_HEIGHT + LABEL_HEIGHT - 2],
+                fill=COLORS[wild_color.name])
+    for i in range(len(cards)):
+        left = hand_left + (i % CARDS_PER_ROW) * (CARD_WIDTH + MARGIN)
+        top_edge = MARGIN + (i // CARDS_PER_ROW) * cell_height
+        image.paste(sprites.sprite(cards[i]), (left, top_edge))
+        draw.text(
+                (left + CARD_WIDTH // 2,
+                        top_edge + CARD_HEIGHT + LABEL_HEIGHT // 2),
+                str(i + 1),
+                fill=(255, 255, 255),
+                font=font,
+                anchor="mm")
+    output = io.BytesIO()
+    image.save(output, "PNG")
+    return output.getvalue()
+
+
+def fingerprint(cards, top, wild_color):
+    """
+    Returns a key identifying what an image of the hand shows.
+
+    Arguments:
+    cards     (list of Card)
+    top       (Card)
+    wild_color(CardColor)
+
+    Return:
+    tuple
+    """
+    return (tuple(card.get_compare_key() for card in cards),
+            top.get_compare_key(),
+            wild_color.value)
+
+
+# collections.OrderedDict of tuple: bytes, rendered images keyed by their
+# fingerprint, least recently used first
+cache = collections.OrderedDict()
+
+async def render_hand_async(cards, top, wild_color):
+    """
+    Returns the image of a hand, rendering it in a worker thread unless it is
+    cached.
+
+    Arguments:
+    cards     (list of Card)
+    top       (Card)
+    wild_color(CardColor)
+
+    Return:
+    bytes: The PNG image
+    """
+    key = fingerprint(cards, top, wild_color)
+    png = cache.get(key)
+    if png is not None:
+        metrics.inc("uno_image_cache_hits_total")
+        cache.move_to_end(key)
+        return png
+    metrics.inc("uno_image_cache_misses_total")
+    png = await asyncio.get_event_loop().run_in_executor(
+            render_executor,
+            render_hand,
+            list(cards),
+            top,
+            wild_color)
+    cache[key] = png
+    if len(cache) > CACHE_SIZE:
+        cache.popitem(last=False)
+    return png
@@ -0,0 +1,146 @@
+import asyncio
+import heapq
+import itertools
+
+class Timer:
+    """
+    A function scheduled to be called at a certain time.
+
+    Attributes:
+    when     (float)    : Loop time at which the callback is called
+    callback (function) : Function or coroutine function to call
+    args     (tuple)    : Arguments to call the function with
+    cancelled(bool)     : Whether the timer has been cancelled
+    owner    (Scheduler): Scheduler holding the timer
+    """
+    __slots__ = ["when", "callback", "args", "cancelled", "owner"]
+
+    def __init__(self, when, callback, args, owner):
+        """
+        Constructor of the timer.
+
+        Arguments:
+        when    (float)
+        callback(function)
+        args    (tuple)
+        owner   (Scheduler)
+        """
+        self.owner = owner
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """Cancels the timer, if it has not been called yet."""
+        if not self.cancelled:
+            self.cancelled = True
+            self.owner.num_cancelled += 1
+
+
+class Scheduler:
+    """
+    Timers of every UNO game kept in a single heap.
+
+    Only the earliest timer is armed on the event loop, so the number of
+    pending games does not add sleeping tasks or loop wakeups.
+
+    Attributes:
+    heap         (list of tuple): Heap of (when, sequence number, Timer)
+    counter      (iterator)     : Sequence numbers to order timers with the
+                                  same time
+    handle       (TimerHandle)  : Loop callback armed for the earliest timer,
+                                  or None if nothing is armed
+    handle_when  (float)        : Time the armed loop callback runs at
+    num_cancelled(int)          : Number of cancelled timers left in the heap
+    """
+    def __init__(self):
+        """Constructor of the scheduler."""
+        self.heap = []
+        self.counter = itertools.count()
+        self.handle = None
+        self.handle_when = None
+        self.num_cancelled = 0
+
+    def call_later(self, delay, callback, *args):
+        """
+        Schedules 'callback(*args)' to be run after 'delay' seconds.
+
+        Arguments:
+        delay   (float)   : Seconds to wait
+        callback(function): Function or coroutine function to call
+        args              : Arguments for the function
+
+        Return:
+        Timer: The scheduled timer, which can be cancelled
+        """
+        loop = asyncio.get_event_loop()
+        timer = Timer(loop.time() + delay, callback, args, self)
+        heapq.heappush(self.heap, (timer.when, next(self.counter), timer))
+        if self.handle is None or timer.when < self.handle_when:
+            self.__arm__()
+        return timer
+
+    def __len__(self):
+        """
+        Number of pending timers.
+
+        Return:
+        int
+        """
+        return len(self.heap) - self.num_cancelled
+
+    def __arm__(self):
+        """Arms the loop callback for the earliest pending timer."""
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        # Drop the cancelled timers when they take up most of the heap
+        if self.num_cancelled > 64 and self.num_cancelled * 2 > len(self.heap):
+            self.heap = [
+                    entry for entry in self.heap if not entry[2].cancelled]
+            heapq.heapify(self.heap)
+            self.num_cancelled = 0
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+            self.num_cancelled -= 1
+        if not self.heap:
+            return
+        self.handle_when = self.heap[0][0]
+        self.handle = asyncio.get_event_loop().call_at(
+                self.handle_when,
+                self.__fire__)
+
+    def __fire__(self):
+        """Calls every timer that is due, then arms the next one."""
+        self.handle = None
+        # The loop may call back slightly before the time it was armed for
+        now = asyncio.get_event_loop().time() + 0.001
+        while self.heap and self.heap[0][0] <= now:
+            timer = heapq.heappop(self.heap)[2]
+            if timer.cancelled:
+                self.num_cancelled -= 1
+                continue
+            # Mark as done, so that cancelling it later is a no-op
+            timer.cancelled = True
+            result = timer.callback(*timer.args)
+            if asyncio.iscoroutine(result):
+                asyncio.ensure_future(result)
+        self.__arm__()
+
+
+scheduler = Scheduler()     # Scheduler shared by every game
+
+def call_later(delay, callback, *args):
+    """
+    Schedules 'callback(*args)' on the shared scheduler.
+
+    Arguments:
+    delay   (float)   : Seconds to wait
+    callback(function): Function or coroutine function to call
+    args              : Arguments for the function
+
+    Return:
+    Timer
+    """
+    return scheduler.call_later(delay, callback, *args)
@@ -0,0 +1,92 @@
+"""
+Starts the bot locally as several shards sharing a store server.
+
+Usage: python shards.py [--shards N] [--port PORT]
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import store
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+STARTUP_TIMEOUT = 10        # Seconds to wait for the store server to listen
+
+def wait_for_port(port, process):
+    """
+    Waits until the store server accepts connections.
+
+    Arguments:
+    port   (int)
+    process(subprocess.Popen): The store server, which must not exit
+    """
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError("the store server exited with code "
+                        + str(process.returncode))
+            if time.monotonic() > deadline:
+                raise RuntimeError("the store server is not listening on "
+                        + "port " + str(port))
+            time.sleep(0.1)
+
+
+def start_shards(num_shards, port):
+    """
+    Starts the store server and the shards as child processes.
+
+    Arguments:
+    num_shards(int)
+    port      (int): Port of the store server
+
+    Return:
+    list of subprocess.Popen: The store server, then the shards
+    """
+    processes = [subprocess.Popen(
+            [sys.executable, os.path.join(DIRECTORY, "store.py"),
+                    "--port", str(port)])]
+    try:
+        wait_for_port(port, processes[0])
+    except RuntimeError:
+        processes[0].terminate()
+        raise
+    for shard_id in range(num_shards):
+        env = dict(os.environ)
+        env["UNLIKEBOT_SHARD_ID"] = str(shard_id)
+        env["UNLIKEBOT_SHARD_COUNT"] = str(num_shards)
+        env["UNLIKEBOT_STORE"] = "127.0.0.1:" + str(port)
+        processes.append(subprocess.Popen(
+                [sys.executable, os.path.join(DIRECTORY, "main.py")],
+                env=env))
+    return processes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Runs the bot as several local shards.")
+    parser.add_argument("--shards", type=int, default=2)
+    parser.add_argument("--port", type=int, default=store.DEFAULT_PORT)
+    args = parser.parse_args()
+    processes = start_shards(args.shards, args.port)
+    try:
+        # Stop everything as soon as any process exits
+        while all(process.poll() is None for process in processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
+    for process in processes:
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
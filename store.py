@@ -0,0 +1,379 @@
+"""
+Session store shared by the shards of the bot.
+
+Run a local store server with: python store.py [--host HOST] [--port PORT]
+"""
+
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+
+DEFAULT_PORT = 7600
+REQUEST_TIMEOUT = 5         # Seconds to wait for a response, besides the
+                            # waiting time of a pop
+MIN_BACKOFF = 0.5           # Seconds before connecting again after the first
+                            # failure
+MAX_BACKOFF = 30            # Seconds between connection attempts at most
+
+class StoreError(Exception):
+    """Raised when the store server cannot be reached or does not answer."""
+
+
+class MemoryStore:
+    """
+    Store kept in the memory of the process, used when there is one shard and
+    behind the store server.
+
+    Attributes:
+    values(dict of str: object)       : Values keyed by their key
+    lists (dict of str: deque)        : Lists for push and pop keyed by their
+                                        key
+    events(dict of str: asyncio.Event): Events set when a value is pushed to
+                                        the list of the key
+    """
+    def __init__(self):
+        """Constructor of the store."""
+        self.values = {}
+        self.lists = collections.defaultdict(collections.deque)
+        self.events = collections.defaultdict(asyncio.Event)
+
+    async def get(self, key):
+        """
+        Returns the value of the key.
+
+        Argument:
+        key(str)
+
+        Return:
+        object: The value, or None if the key is not set
+        """
+        return self.values.get(key)
+
+    async def set(self, key, value):
+        """
+        Sets the value of the key.
+
+        Arguments:
+        key  (str)
+        value(object): Value that can be encoded as JSON
+        """
+        self.values[key] = value
+
+    async def delete(self, key):
+        """
+        Removes the value of the key.
+
+        Argument:
+        key(str)
+        """
+        self.values.pop(key, None)
+
+    async def push(self, key, value):
+        """
+        Appends the value to the list of the key.
+
+        Arguments:
+        key  (str)
+        value(object): Value that can be encoded as JSON
+        """
+        self.lists[key].append(value)
+        self.events[key].set()
+
+    async def pop(self, key, timeout):
+        """
+        Takes the first value from the list of the key, waiting for one if the
+        list is empty.
+
+        Arguments:
+        key    (str)
+        timeout(float): Seconds to wait
+
+        Return:
+        object: The value, or None if nothing was pushed in time
+        """
+        if not self.lists[key]:
+            event = self.events[key]
+            event.clear()
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        if not self.lists[key]:
+            return None
+        return self.lists[key].popleft()
+
+
+class SocketStore:
+    """
+    Store served by a store server, shared by all shards connected to it.
+
+    Requests and responses are lines of JSON, matched by their ID so that a
+    waiting pop does not hold up other requests. A lost connection fails the
+    pending requests, and is made again by the next request, waiting longer
+    after each failure.
+
+    Attributes:
+    host      (str)
+    port      (int)
+    reader    (asyncio.StreamReader)
+    writer    (asyncio.StreamWriter)
+    pending   (dict of int: asyncio.Future): Requests waiting for a response
+    ids       (iterator)                   : IDs of the requests
+    connection(asyncio.Future)             : Connection to the server being
+                                             made or made, or None if there is
+                                             none
+    backoff   (float)                      : Seconds to wait after the next
+                                             failure to connect
+    retry_at  (float)                      : Loop time before which no
+                                             connection is attempted
+    """
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """
+        Constructor of the store.
+
+        Arguments:
+        host(str)
+        port(int)
+        """
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.pending = {}
+        self.ids = itertools.count()
+        self.connection = None
+        self.backoff = MIN_BACKOFF
+        self.retry_at = 0
+
+    async def connect(self):
+        """Connects to the store server."""
+        self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port),
+                REQUEST_TIMEOUT)
+        asyncio.ensure_future(self.__read_responses__(self.reader))
+
+    async def __ensure_connection__(self):
+        """
+        Connects to the store server unless connected already. Raises
+        StoreError if connecting fails, or failed too recently to try again.
+        """
+        loop = asyncio.get_event_loop()
+        if self.connection is None:
+            if loop.time() < self.retry_at:
+                raise StoreError("store server unavailable, retrying in "
+                        + "{0:.1f} s".format(self.retry_at - loop.time()))
+            self.connection = asyncio.ensure_future(self.connect())
+        connection = self.connection
+        try:
+            await asyncio.shield(connection)
+        except (OSError, asyncio.TimeoutError) as error:
+            if self.connection is connection:
+                self.connection = None
+                self.retry_at = loop.time() + self.backoff
+                self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+            raise StoreError("cannot connect to the store server: "
+                    + repr(error)) from error
+        self.backoff = MIN_BACKOFF
+
+    def close(self):
+        """
+        Closes the connection to the store server. Pending requests fail, and
+        the next request connects again.
+        """
+        if self.writer is not None:
+            self.writer.close()
+
+    async def __read_responses__(self, reader):
+        """
+        Resolves the pending requests as their responses arrive, until the
+        connection is lost.
+
+        Argument:
+        reader(asyncio.StreamReader): Reader of the connection
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = json.loads(line.decode())
+                future = self.pending.pop(response["id"], None)
+                if future is not None and not future.done():
+                    future.set_result(response.get("value"))
+        except (OSError, ValueError):
+            pass
+        # The server has gone away, so the next request connects again
+        if self.reader is reader:
+            self.writer.close()
+            self.reader = None
+            self.writer = None
+            self.connection = None
+        pending = self.pending
+        self.pending = {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(StoreError("store server closed"))
+
+    async def __request__(self, op, key, value=None, timeout=None):
+        """
+        Sends a request and waits for its response. Raises StoreError if the
+        server cannot be reached or does not answer in time.
+
+        Arguments:
+        op     (str)   : Name of the operation
+        key    (str)
+        value  (object)
+        timeout(float) : Seconds a pop waits for a value
+
+        Return:
+        object: The value in the response
+        """
+        await self.__ensure_connection__()
+        request_id = next(self.ids)
+        future = asyncio.get_event_loop().create_future()
+        self.pending[request_id] = future
+        request = {"id": request_id, "op": op, "key": key, "value": value,
+                "timeout": timeout}
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        try:
+            return await asyncio.wait_for(
+                    future, REQUEST_TIMEOUT + (timeout or 0))
+        except asyncio.TimeoutError:
+            raise StoreError("no response from the store server to "
+                    + op) from None
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def get(self, key):
+        """Returns the value of the key. See MemoryStore.get."""
+        return await self.__request__("get", key)
+
+    async def set(self, key, value):
+        """Sets the value of the key. See MemoryStore.set."""
+        await self.__request__("set", key, value)
+
+    async def delete(self, key):
+        """Removes the value of the key. See MemoryStore.delete."""
+        await self.__request__("delete", key)
+
+    async def push(self, key, value):
+        """Appends the value to the list of the key. See MemoryStore.push."""
+        await self.__request__("push", key, value)
+
+    async def pop(self, key, timeout):
+        """
+        Takes the first value from the list of the key. See MemoryStore.pop.
+        """
+        return await self.__request__("pop", key, timeout=timeout)
+
+
+class StoreServer:
+    """
+    Serves a memory store to the shards over TCP.
+
+    Attributes:
+    store(MemoryStore)
+    """
+    def __init__(self):
+        """Constructor of the server."""
+        self.store = MemoryStore()
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """
+        Starts accepting connections.
+
+        Arguments:
+        host(str)
+        port(int)
+
+        Return:
+        asyncio.Server
+        """
+        return await asyncio.start_server(self.__serve__, host, port)
+
+    async def __serve__(self, reader, writer):
+        """
+        Answers the requests of a single connection.
+
+        Arguments:
+        reader(asyncio.StreamReader)
+        writer(asyncio.StreamWriter)
+        """
+        answers = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = json.loads(line.decode())
+                answer = asyncio.ensure_future(self.__answer__(request, writer))
+                answers.add(answer)
+                answer.add_done_callback(answers.discard)
+        except (OSError, ValueError):
+            pass
+        # A pop left waiting would take a value nobody can receive anymore
+        for answer in answers:
+            answer.cancel()
+        writer.close()
+
+    async def __answer__(self, request, writer):
+        """
+        Applies a request to the store, and writes the response.
+
+        Arguments:
+        request(dict)
+        writer (asyncio.StreamWriter)
+        """
+        op = request["op"]
+        key = request["key"]
+        value = None
+        if op == "get":
+            value = await self.store.get(key)
+        elif op == "set":
+            await self.store.set(key, request["value"])
+        elif op == "delete":
+            await self.store.delete(key)
+        elif op == "push":
+            await self.store.push(key, request["value"])
+        elif op == "pop":
+            value = await self.store.pop(key, request["timeout"])
+        if writer.is_closing():
+            return
+        writer.write(
+                json.dumps({"id": request["id"], "value": value}).encode()
+                + b"\n")
+
+
+def connect(address):
+    """
+    Returns the store for the address given in the configuration.
+
+    Argument:
+    address(str): "host:port" of a store server, or None or "" for a store in
+                  this process
+
+    Return:
+    MemoryStore or SocketStore
+    """
+    if not address:
+        return MemoryStore()
+    host, port = address.rsplit(":", 1)
+    return SocketStore(host, int(port))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Serves the session store shared by the shards.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(StoreServer().start(args.host, args.port))
+    print("Store server listening on {0}:{1}".format(args.host, args.port))
+    loop.run_forever()
+
+
+if __name__ == "__main__":
+    main()
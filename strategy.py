@@ -0,0 +1,459 @@
+import random
+import time
+from uno import CardColor, CardType, full_deck
+
+COLOR_COMMANDS = [".r", ".y", ".g", ".b"]
+
+class Strategy:
+    """
+    Decision maker of a computer player.
+
+    Subclasses decide by overriding choose_play, choose_keep, choose_color,
+    choose_challenge and choose_swap. Decisions are made in worker
+    processes, so strategies must be picklable and only look at the given
+    view.
+
+    Attributes:
+    name(str): Name of the strategy
+    """
+    name = "strategy"
+
+    def decide(self, view):
+        """
+        Returns the command for the pending decision.
+
+        Argument:
+        view(GameView)
+
+        Return:
+        str
+        """
+        if view.decision == "play":
+            index = self.choose_play(view)
+            if index is None:
+                return ".d"
+            return ".p " + str(index + 1)
+        elif view.decision == "keep":
+            if self.choose_keep(view):
+                return ".k"
+            return ".p"
+        elif view.decision == "color":
+            return COLOR_COMMANDS[self.choose_color(view).value - 1]
+        elif view.decision == "swap":
+            return ".swap " + str(self.choose_swap(view))
+        if self.choose_challenge(view):
+            return ".y"
+        return ".n"
+
+    def fallback(self, view):
+        """
+        Returns a quick command when the decision takes too long.
+
+        Argument:
+        view(GameView)
+
+        Return:
+        str
+        """
+        return RandomStrategy().decide(view)
+
+    def choose_play(self, view):
+        """
+        Chooses the card to play.
+
+        Argument:
+        view(GameView)
+
+        Return:
+        int: Index of the card, or None to draw a card
+        """
+        raise NotImplementedError
+
+    def choose_keep(self, view):
+        """
+        Chooses whether to keep the card just drawn.
+
+        Argument:
+        view(GameView)
+
+        Return:
+        bool: True to keep the card, False to play it
+        """
+        return not view.legal
+
+    def choose_color(self, view):
+        """
+        Chooses the color for a Wild card.
+
+        Argument:
+        view(GameView)
+
+        Return:
+        CardColor
+        """
+        return most_common_color(view.hand)
+
+    def choose_challenge(self, view):
+        """
+        Chooses whether to challenge a Wild Draw Four card.
+
+        Argument:
+        view(GameView)
+
+        Return:
+        bool
+        """
+        return False
+
+    def choose_swap(self, view):
+        """
+        Chooses whom to swap hands with after playing a 7, by default the
+        player with the fewest cards.
+
+        Argument:
+        view(GameView)
+
+        Return:
+        int: Number of turns after the deciding player of the chosen player
+        """
+        best = 1
+        for i in range(2, len(view.hand_sizes)):
+            if view.hand_sizes[i] < view.hand_sizes[best]:
+                best = i
+        return best
+
+
+class RandomStrategy(Strategy):
+    """Plays a random card that can be played."""
+    name = "random"
+
+    def choose_play(self, view):
+        if not view.legal:
+            return None
+        return random.choice(view.legal)
+
+    def choose_keep(self, view):
+        return not view.legal or random.random() < 0.5
+
+    def choose_color(self, view):
+        return CardColor(random.randint(1, 4))
+
+    def choose_challenge(self, view):
+        return random.random() < 0.5
+
+    def choose_swap(self, view):
+        return random.randint(1, len(view.hand_sizes) - 1)
+
+
+class GreedyStrategy(Strategy):
+    """
+    Plays the card of the color it holds the most of, keeping Wild cards for
+    when nothing else can be played.
+    """
+    name = "greedy"
+
+    def choose_play(self, view):
+        if not view.legal:
+            return None
+        counts = color_counts(view.hand)
+        best = None
+        best_key = None
+        for index in view.legal:
+            card = view.hand[index]
+            # Wild cards come last, higher valued cards first
+            key = (card.get_color() != CardColor["BLACK"],
+                    counts.get(card.get_color(), 0),
+                    card.get_type().value)
+            if best is None or key > best_key:
+                best = index
+                best_key = key
+        return best
+
+
+class MonteCarloStrategy(Strategy):
+    """
+    Plays out random games from every possible move, with the unseen cards
+    dealt at random to the other players, and picks the move that wins most
+    often within the time budget.
+
+    Attributes:
+    max_rollouts(int): Maximum number of playouts per move
+    max_plies   (int): Maximum number of turns in a single playout
+    """
+    name = "montecarlo"
+
+    def __init__(self, max_rollouts=200, max_plies=80):
+        """
+        Constructor of the strategy.
+
+        Arguments:
+        max_rollouts(int)
+        max_plies   (int)
+        """
+        self.max_rollouts = max_rollouts
+        self.max_plies = max_plies
+
+    def choose_play(self, view):
+        if len(view.legal) <= 1:
+            if view.legal:
+                return view.legal[0]
+            return None
+        return self.__search__(view, view.legal)
+
+    def choose_color(self, view):
+        colors = [CardColor(value) for value in range(1, 5)]
+        return self.__search__(view, colors)
+
+    def __search__(self, view, moves):
+        """
+        Runs playouts for every move in turn until the budget runs out.
+
+        Arguments:
+        view (GameView)
+        moves(list)    : Indices of cards to play, or colors to call
+
+        Return:
+        The move with the highest winning rate
+        """
+        deadline = time.monotonic() + view.budget
+        unseen = unseen_cards(view)
+        # Seeded from the module's generator, so that seeded games repeat
+        rng = random.Random(random.getrandbits(64))
+        wins = [0.0] * len(moves)
+        count = 0
+        while count < self.max_rollouts and time.monotonic() < deadline:
+            for i in range(len(moves)):
+                wins[i] += Playout(view, unseen, moves[i], rng).run(
+                        self.max_plies)
+            count += 1
+        return moves[wins.index(max(wins))]
+
+
+class Playout:
+    """
+    A simplified game played out with random moves, starting from the view of
+    the deciding player, who is player 0.
+
+    Attributes:
+    hands    (list of list of tuple): Hands as (color value, type value)
+    pile     (list of tuple)        : Cards left to draw
+    top_type (int)                  : Type value of the last discarded card
+    color    (int)                  : Color value to match
+    turn     (int)                  : Index of the current player
+    rng      (random.Random)
+    """
+    def __init__(self, view, unseen, move, rng):
+        """
+        Constructor of the playout, with the deciding player's move applied.
+
+        Arguments:
+        view  (GameView)
+        unseen(list of tuple): Cards not seen by the deciding player
+        move                 : Index of the card to play, or color to call
+        rng   (random.Random)
+        """
+        self.rng = rng
+        pile = list(unseen)
+        rng.shuffle(pile)
+        self.hands = [[(card.get_color().value, card.get_type().value)
+                for card in view.hand]]
+        for size in view.hand_sizes[1:]:
+            self.hands.append(pile[:size])
+            del(pile[:size])
+        self.pile = pile
+        self.top_type = view.top.get_type().value
+        if view.wild_color != CardColor["BLACK"]:
+            self.color = view.wild_color.value
+        else:
+            self.color = view.top.get_color().value
+        self.turn = 0
+        if isinstance(move, CardColor):
+            self.color = move.value
+            self.__after_play__(view.top.get_type().value)
+        else:
+            self.__play__(self.hands[0].pop(move))
+
+    def run(self, max_plies):
+        """
+        Plays the game out.
+
+        Argument:
+        max_plies(int)
+
+        Return:
+        float: 1 if the deciding player wins, 0 if another player wins, and
+               their share of the fewest cards if nobody wins in time
+        """
+        for ply in range(max_plies):
+            for i in range(len(self.hands)):
+                if not self.hands[i]:
+                    return 1.0 if i == 0 else 0.0
+            hand = self.hands[self.turn]
+            legal = [i for i in range(len(hand)) if self.__legal__(hand[i])]
+            if not legal:
+                num_cards = len(hand)
+                self.__draw__(self.turn, 1)
+                if len(hand) == num_cards or not self.__legal__(hand[-1]):
+                    self.__advance__(1)
+                    continue
+                legal = [len(hand) - 1]
+            # Wild cards are kept for when nothing else can be played
+            colored = [i for i in legal
+                    if hand[i][0] != CardColor["BLACK"].value]
+            if colored:
+                legal = colored
+            self.__play__(hand.pop(self.rng.choice(legal)))
+        fewest = min(len(hand) for hand in self.hands)
+        if len(self.hands[0]) == fewest:
+            return 0.5
+        return 0.0
+
+    def __legal__(self, card):
+        """
+        Determines if the card can currently be played.
+
+        Argument:
+        card(tuple)
+
+        Return:
+        bool
+        """
+        return (card[0] == CardColor["BLACK"].value or card[0] == self.color
+                or card[1] == self.top_type)
+
+    def __draw__(self, index, count):
+        """
+        Gives cards from the pile to the player, as long as there are any.
+
+        Arguments:
+        index(int): Index of the player
+        count(int): Number of cards to draw
+        """
+        for _ in range(count):
+            if not self.pile:
+                return
+            self.hands[index].append(self.pile.pop())
+
+    def __advance__(self, count):
+        """
+        Passes the turn by the given number of players.
+
+        Argument:
+        count(int)
+        """
+        self.turn = (self.turn + count) % len(self.hands)
+
+    def __play__(self, card):
+        """
+        Plays the card, which has already been taken from the current hand.
+
+        Argument:
+        card(tuple)
+        """
+        self.top_type = card[1]
+        if card[0] == CardColor["BLACK"].value:
+            self.color = most_common_value(self.hands[self.turn])
+        else:
+            self.color = card[0]
+        self.__after_play__(card[1])
+
+    def __after_play__(self, type):
+        """
+        Applies the action of the card just played and passes the turn.
+
+        Argument:
+        type(int): Type value of the card
+        """
+        next_index = (self.turn + 1) % len(self.hands)
+        if type == CardType["DRAW_TWO"].value:
+            self.__draw__(next_index, 2)
+            self.__advance__(2)
+        elif type == CardType["WILD_DRAW_FOUR"].value:
+            self.__draw__(next_index, 4)
+            self.__advance__(2)
+        elif type in [CardType["SKIP"].value, CardType["REVERSE"].value]:
+            # The order of the other players does not matter to the playout
+            self.__advance__(2)
+        else:
+            self.__advance__(1)
+
+
+def color_counts(cards):
+    """
+    Counts the cards of each color, leaving out Wild cards.
+
+    Argument:
+    cards(list of Card)
+
+    Return:
+    dict of CardColor: int
+    """
+    counts = {}
+    for card in cards:
+        if card.get_color() != CardColor["BLACK"]:
+            counts[card.get_color()] = counts.get(card.get_color(), 0) + 1
+    return counts
+
+
+def most_common_color(cards):
+    """
+    Returns the color of the most cards, or a random color if there is none.
+
+    Argument:
+    cards(list of Card)
+
+    Return:
+    CardColor
+    """
+    counts = color_counts(cards)
+    if not counts:
+        return CardColor(random.randint(1, 4))
+    return max(counts, key=counts.get)
+
+
+def most_common_value(cards):
+    """
+    Returns the color value of the most cards in a playout hand.
+
+    Argument:
+    cards(list of tuple)
+
+    Return:
+    int
+    """
+    counts = [0, 0, 0, 0, 0]
+    for card in cards:
+        if card[0] != CardColor["BLACK"].value:
+            counts[card[0]] += 1
+    return counts.index(max(counts[1:]), 1)
+
+
+def unseen_cards(view):
+    """
+    Returns the cards the player has not seen in their hand or the discard pile.
+
+    Argument:
+    view(GameView)
+
+    Return:
+    list of tuple: Cards as (color value, type value)
+    """
+    seen = {}
+    for card in view.hand + view.discard:
+        key = card.get_compare_key()
+        seen[key] = seen.get(key, 0) + 1
+    unseen = []
+    for card in full_deck():
+        key = card.get_compare_key()
+        if seen.get(key, 0) > 0:
+            seen[key] -= 1
+        else:
+            unseen.append((card.get_color().value, card.get_type().value))
+    return unseen
+
+
+STRATEGIES = {
+    "random": RandomStrategy,
+    "greedy": GreedyStrategy,
+    "montecarlo": MonteCarloStrategy,
+}
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+# The modules of the bot live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def pytest_addoption(parser):
+    parser.addoption("--runslow", action="store_true",
+            help="also run the tests marked slow")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: takes most of a minute")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--runslow"):
+        return
+    skip = pytest.mark.skip(reason="slow, run with --runslow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def bot(monkeypatch, tmp_path):
+    """
+    Returns the main module of the bot with a fake client and no sessions.
+
+    Return:
+    module
+    """
+    pytest.importorskip("discord")
+    import loadtest
+    import logarchive
+    import main
+    import matchmaking
+    import prefs
+    import scheduler
+    import uno
+    # Each test runs its own event loop, which timers must not outlive
+    monkeypatch.setattr(scheduler, "scheduler", scheduler.Scheduler())
+    monkeypatch.setattr(main, "client", loadtest.FakeClient())
+    monkeypatch.setattr(main, "log", logarchive.LogArchive(str(tmp_path)))
+    monkeypatch.setattr(main, "preferences", prefs.PreferenceStore(":memory:"))
+    monkeypatch.setattr(uno, "preferences", main.preferences)
+    monkeypatch.setattr(main, "uno_lobbies", {})
+    monkeypatch.setattr(main, "uno_target_scores", {})
+    monkeypatch.setattr(main, "uno_house_rules", {})
+    monkeypatch.setattr(main, "uno_lobby_activity", {})
+    monkeypatch.setattr(main, "game_sizes", {})
+    monkeypatch.setattr(main, "match_queue", matchmaking.MatchQueue())
+    monkeypatch.setattr(main, "user_limiter", main.ratelimit.RateLimiter(
+            rate=1000, capacity=1000))
+    monkeypatch.setattr(main, "channel_limiter", main.ratelimit.RateLimiter(
+            rate=1000, capacity=1000))
+    monkeypatch.setattr(uno, "games", {})
+    monkeypatch.setattr(uno, "user_games", {})
+    return main
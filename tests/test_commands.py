@@ -0,0 +1,32 @@
+import commands
+
+def test_long_forms_resolve_to_their_command():
+    assert commands.resolve_command(".RED") == ".r"
+    assert commands.resolve_command(".r") == ".r"
+    assert commands.resolve_command(".yes") == ".y"
+    assert commands.resolve_command(".yellow") == ".y"
+
+
+def test_prefixes_of_words_are_not_commands():
+    # ".re" and ".dra" only lead to words in the trie
+    assert commands.resolve_command(".re") == ".re"
+    assert commands.resolve_command(".dra") == ".dra"
+    assert commands.resolve_command(".redd") == ".redd"
+    assert commands.resolve_command(".") == "."
+
+
+def test_uno_with_or_without_exclamation_mark():
+    assert commands.resolve_command(".uno") == ".uno!"
+    assert commands.resolve_command(".UNO!") == ".uno!"
+    assert commands.resolve_command(".uno!!") == ".uno!!"
+
+
+def test_card_names():
+    assert commands.resolve_card("red 7") == ("RED", "SEVEN")
+    assert commands.resolve_card("R7") == ("RED", "SEVEN")
+    assert commands.resolve_card("[R](7)") == ("RED", "SEVEN")
+    assert commands.resolve_card("r r") == ("RED", "REVERSE")
+    assert commands.resolve_card("Wild Draw Four") == (
+            "BLACK", "WILD_DRAW_FOUR")
+    assert commands.resolve_card("red") is None
+    assert commands.resolve_card("red 10") is None
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+
+import loadtest
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_scenario_plays_its_games_to_the_end(bot, capsys):
+    scenario = loadtest.Scenario(bot, bot.client, 3, 3, 20, 0)
+
+    async def play():
+        await scenario.run()
+        await asyncio.sleep(0.05)
+
+    run(play())
+    assert bot.uno.games == {}
+    assert bot.uno.user_games == {}
+    assert len(scenario.latencies[".uno"]) == 3
+    assert len(scenario.latencies[".ujoin"]) == 6
+    assert bot.client.calls["send_message"] > 0
+    scenario.report(1.0)
+    out, err = capsys.readouterr()
+    assert "Traceback" not in err
+    assert ".ustart" in out
+
+
+def test_fake_client_rate_limit():
+    client = loadtest.FakeClient(rate_limit=2, on_limit="fail")
+    channel = loadtest.FakeChannel("c", "c", False)
+
+    async def send_three():
+        for _ in range(3):
+            await client.send_message(channel, "hi")
+
+    with pytest.raises(loadtest.RateLimited):
+        run(send_three())
+    assert client.calls["send_message"] == 3
+    assert client.limited == 1
+
+
+def test_percentile():
+    values = [float(value) for value in range(1, 101)]
+    assert loadtest.percentile(values, 50) == 51.0
+    assert loadtest.percentile(values, 99) == 100.0
+    assert loadtest.percentile([], 50) == 0.0
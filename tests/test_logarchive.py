@@ -0,0 +1,84 @@
+import os
+
+import logarchive
+
+def record(number, author, content):
+    return {
+            "timestamp": "2017-05-01 12:00:" + "{0:02d}".format(number),
+            "author name": "name" + author,
+            "author ID": author,
+            "content": content,
+            "server": "server",
+            "channel": "channel",
+            "channel ID": "c1"}
+
+
+def wait_for_compression():
+    logarchive.executor.submit(lambda: None).result()
+
+
+def search(archive, query, limit=100):
+    return archive.search(query, limit, archive.snapshot())
+
+
+def test_escaped_values_are_found_across_gzip_segments(monkeypatch, tmp_path):
+    monkeypatch.setattr(logarchive, "SEGMENT_SIZE", 400)
+    archive = logarchive.LogArchive(str(tmp_path))
+    contents = []
+    for number in range(12):
+        content = "path C:\\uno\\" + str(number) + "\nsecond line \\n"
+        contents.append(content)
+        archive.write_record(record(number, "a" + str(number % 2), content))
+    wait_for_compression()
+    names = os.listdir(str(tmp_path))
+    assert any(name.endswith(".log.gz") for name in names)
+    assert not any(name.endswith("0.log") for name in names)
+    matches, num_read, num_segments = search(
+            archive, logarchive.Query("C:\\UNO\\"))
+    assert [match["content"] for match in matches] == contents
+    # The segment just rotated to is empty, so it is not read
+    assert num_read == num_segments - 1 > 2
+    # A literal backslash n is not a line break
+    matches, _, _ = search(archive, logarchive.Query("line \\n"))
+    assert len(matches) == 12
+    matches, _, _ = search(archive, logarchive.Query("\\uno\\7\n"))
+    assert [match["timestamp"] for match in matches] == [
+            "2017-05-01 12:00:07"]
+    archive.current.close()
+
+
+def test_indices_skip_segments_that_cannot_match(monkeypatch, tmp_path):
+    monkeypatch.setattr(logarchive, "SEGMENT_SIZE", 400)
+    archive = logarchive.LogArchive(str(tmp_path))
+    for number in range(6):
+        archive.write_record(record(number, "early", "hello"))
+    for number in range(6, 12):
+        archive.write_record(record(number, "late", "hello"))
+    wait_for_compression()
+    matches, num_read, num_segments = search(
+            archive, logarchive.Query(author="late"))
+    assert len(matches) == 6
+    assert num_read < num_segments
+    matches, _, _ = search(
+            archive, logarchive.Query(since="2017-05-01 12:00:10"))
+    assert len(matches) == 2
+    matches, _, _ = search(archive, logarchive.Query(until="2017-04-30"))
+    assert matches == []
+    matches, _, _ = search(archive, logarchive.Query("hello"), limit=3)
+    assert len(matches) == 3
+    archive.current.close()
+
+
+def test_segment_of_a_previous_run_is_rotated(tmp_path):
+    archive = logarchive.LogArchive(str(tmp_path), "shard0")
+    archive.write_record(record(1, "a", "before the restart"))
+    archive.current.close()
+    restarted = logarchive.LogArchive(str(tmp_path), "shard0")
+    restarted.write_record(record(2, "a", "after the restart"))
+    wait_for_compression()
+    matches, num_read, num_segments = search(
+            restarted, logarchive.Query("restart"))
+    assert [match["content"] for match in matches] == [
+            "before the restart", "after the restart"]
+    assert num_segments == 2
+    restarted.current.close()
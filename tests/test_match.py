@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("discord")
+
+import strategy
+import uno
+
+def make_game(target_score, num_players=3):
+    players = []
+    for _ in range(num_players):
+        bot_strategy = strategy.STRATEGIES["greedy"]()
+        players.append(uno.Player(uno.BotUser(bot_strategy), bot_strategy))
+    game = uno.Game(players, None, target_score)
+    game.use_timers = False
+    return game
+
+
+def count_cards(game):
+    return len(game.deck) + len(game.discard) + sum(
+            len(player.get_cards()) for player in game.players)
+
+
+def test_winner_scores_the_cards_left_in_other_hands():
+    game = make_game(uno.MATCH_SCORE)
+    for player, names in zip(game.players, [
+            [], [("RED", "SEVEN"), ("BLUE", "SKIP")],
+            [("BLACK", "WILD_DRAW_FOUR"), ("GREEN", "ZERO")]]):
+        player.reset_cards()
+        for color, type in names:
+            player.receive_card(
+                    uno.Card(uno.CardColor[color], uno.CardType[type]))
+    game.winner_index = 0
+    assert game.game_end() == 0
+    assert game.round_score == 7 + 20 + 50
+    assert game.players[0].get_score() == 77
+    assert not game.is_match_over()
+    game.players[0].add_score(uno.MATCH_SCORE - 77)
+    assert game.is_match_over()
+
+
+def test_single_rounds_are_always_over():
+    assert make_game(0).is_match_over()
+
+
+def test_new_round_reuses_the_cards_and_moves_the_dealer():
+    game = make_game(uno.MATCH_SCORE)
+    total = count_cards(game)
+    assert total == len(uno.full_deck())
+    for round in range(1, 4):
+        game.new_round()
+        assert game.dealer == round % len(game.players)
+        assert count_cards(game) == total
+        assert all(len(player.get_cards()) >= 7 for player in game.players)
+        assert len(game.discard) == 1
@@ -0,0 +1,140 @@
+import matchmaking
+
+class User:
+    def __init__(self, id):
+        self.id = id
+        self.name = id
+
+
+def test_users_waiting_too_long_leave_the_queue():
+    queue = matchmaking.MatchQueue(max_wait=60)
+    early = queue.add(User("early"), 1000, None)
+    assert early is None
+    queue.nodes["early"].value.since -= 61
+    queue.add(User("late"), 1000, None)
+    expired = queue.expire()
+    assert [waiting.user.id for waiting in expired] == ["early"]
+    assert "early" not in queue
+    assert "late" in queue
+    assert len(queue) == 1 and len(queue.waiting) == 1
+    assert queue.expire() == []
+
+
+def keys(skip_list):
+    """
+    Returns the keys of a skip list in the order of its lowest level, checking
+    the backward links and every higher level on the way.
+
+    Return:
+    list of tuple
+    """
+    found = []
+    node = skip_list.head.forward[0]
+    previous = skip_list.head
+    while node is not None:
+        assert node.backward is previous
+        found.append(node.key)
+        previous = node
+        node = node.forward[0]
+    for level in range(1, skip_list.level):
+        node = skip_list.head.forward[level]
+        linked = []
+        while node is not None:
+            linked.append(node.key)
+            node = node.forward[level]
+        assert linked == [key for key in found if key in linked]
+    return found
+
+
+def test_skip_list_keeps_keys_in_order():
+    skip_list = matchmaking.SkipList()
+    values = [(rating, i) for i, rating in enumerate(
+            [1200, 900, 1000, 1000, 1500, 700, 1100, 1300] * 8)]
+    for key in values:
+        skip_list.insert(key, key)
+    assert len(skip_list) == len(values)
+    assert keys(skip_list) == sorted(values)
+    for key in values[::2]:
+        skip_list.remove(key)
+    # Keys that are not there are left alone
+    skip_list.remove((1000, -1))
+    assert len(skip_list) == len(values) // 2
+    assert keys(skip_list) == sorted(values[1::2])
+    for key in values[1::2]:
+        skip_list.remove(key)
+    assert len(skip_list) == 0
+    assert skip_list.level == 1
+    assert skip_list.head.forward[0] is None
+
+
+def test_table_forms_with_close_ratings():
+    queue = matchmaking.MatchQueue(table_size=3, max_spread=100)
+    assert queue.add(User("a"), 1000, None) is None
+    assert queue.add(User("b"), 1050, None) is None
+    # Too far from the others
+    assert queue.add(User("c"), 1200, None) is None
+    table = queue.add(User("d"), 1080, None)
+    assert [waiting.user.id for waiting in table] == ["a", "b", "d"]
+    assert len(queue) == 1 and "c" in queue
+    assert keys(queue.waiting) == [queue.nodes["c"].key]
+
+
+def test_table_forms_at_either_end_of_the_queue():
+    # The newcomer is the lowest rating, then the highest
+    queue = matchmaking.MatchQueue(table_size=3, max_spread=100)
+    for name, rating in [("a", 1040), ("b", 1060), ("c", 1500)]:
+        queue.add(User(name), rating, None)
+    table = queue.add(User("low"), 1000, None)
+    assert [waiting.user.id for waiting in table] == ["low", "a", "b"]
+    queue = matchmaking.MatchQueue(table_size=3, max_spread=100)
+    for name, rating in [("a", 500), ("b", 1440), ("c", 1460)]:
+        queue.add(User(name), rating, None)
+    table = queue.add(User("high"), 1500, None)
+    assert [waiting.user.id for waiting in table] == ["b", "c", "high"]
+
+
+def test_tightest_table_around_the_newcomer_is_chosen():
+    for low, expected in [(800, ["a", "b", "c"]), (700, ["b", "c", "d"])]:
+        queue = matchmaking.MatchQueue(table_size=3, max_spread=300)
+        queue.add(User("a"), low, None)
+        queue.add(User("b"), 990, None)
+        assert queue.add(User("d"), 1250, None) is None
+        table = queue.add(User("c"), 1010, None)
+        assert [waiting.user.id for waiting in table] == expected
+        assert len(queue) == 1
+
+
+def test_table_put_back_keeps_its_places():
+    queue = matchmaking.MatchQueue(table_size=2, max_spread=100)
+    queue.add(User("a"), 1000, None)
+    table = queue.add(User("b"), 1010, None)
+    assert len(queue) == 0
+    queue.put_back(table)
+    assert len(queue) == 2
+    assert keys(queue.waiting) == [waiting.key for waiting in table]
+    # Putting back does not form the table again, but the next user may
+    table = queue.add(User("c"), 1005, None)
+    assert [waiting.user.id for waiting in table] == ["a", "c"]
+    assert "b" in queue
+
+
+def test_rating_changes_are_zero_sum():
+    for ratings in [[1000, 1000], [1000, 1200, 800, 1500], [1300] * 10]:
+        for winner in range(len(ratings)):
+            changes = matchmaking.rating_changes(ratings, winner)
+            assert abs(sum(changes)) < 1e-9
+            assert changes[winner] > 0
+            assert all(change < 0 for i, change in enumerate(changes)
+                    if i != winner)
+            assert changes[winner] < matchmaking.K_FACTOR
+
+
+def test_upset_wins_move_ratings_more():
+    favourite = matchmaking.rating_changes([1400, 1000], 0)
+    upset = matchmaking.rating_changes([1400, 1000], 1)
+    assert upset[1] > favourite[0]
+    assert matchmaking.rating_changes([1000, 1000], 0) == [16, -16]
+
+
+def test_rating_changes_of_a_lone_player():
+    assert matchmaking.rating_changes([1000], 0) == [0.0]
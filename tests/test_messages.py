@@ -0,0 +1,52 @@
+import pytest
+
+import messages
+
+def test_short_messages_are_kept_whole():
+    content = "x" * messages.MAX_LENGTH
+    assert messages.split(content) == [content]
+
+
+def test_long_messages_fit_the_limit_and_are_cut_at_line_breaks():
+    lines = ["line " + str(i) + " " + "y" * 40 for i in range(200)]
+    content = "\n".join(lines)
+    chunks = messages.split(content)
+    assert all(len(chunk) <= messages.MAX_LENGTH for chunk in chunks)
+    # Each message is filled up to the line that would not fit
+    longest_line = max(len(line) for line in lines)
+    assert all(len(chunk) > messages.MAX_LENGTH - len(messages.FENCE)
+            - longest_line - 1 for chunk in chunks[:-1])
+    # Only the line breaks the messages were cut at are lost
+    assert "\n".join(chunks) == content
+
+
+def test_words_are_not_cut_without_line_breaks():
+    content = " ".join(["word"] * 1000)
+    chunks = messages.split(content)
+    assert all(len(chunk) <= messages.MAX_LENGTH for chunk in chunks)
+    assert " ".join(chunks) == content
+
+
+def test_code_blocks_are_closed_and_opened_again():
+    code = "\n".join("print(" + str(i) + ")" for i in range(500))
+    content = "Profile:\n```python\n" + code + "\n```\nDone."
+    chunks = messages.split(content)
+    assert len(chunks) > 2
+    for chunk in chunks:
+        assert len(chunk) <= messages.MAX_LENGTH
+        assert chunk.count(messages.FENCE) % 2 == 0
+    for chunk in chunks[1:]:
+        assert chunk.startswith("```python\n")
+    assert chunks[-1].endswith("```\nDone.")
+
+
+def test_fences_are_not_cut_in_two():
+    content = "a" * 45 + "```" + "b" * 40
+    for chunk in messages.split(content, 50):
+        assert len(chunk) <= 50
+        assert "``" not in chunk.replace(messages.FENCE, "")
+
+
+def test_limits_too_small_to_split_are_refused():
+    with pytest.raises(ValueError):
+        messages.split("z" * 100, messages.MIN_LENGTH - 1)
@@ -0,0 +1,76 @@
+import asyncio
+
+import metrics
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def get(port, request):
+    """
+    Sends a raw HTTP request to the metrics server.
+
+    Return:
+    tuple: Status line and body
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request.encode("latin-1"))
+    response = (await reader.read()).decode("utf-8")
+    writer.close()
+    head, _, body = response.partition("\r\n\r\n")
+    return head.split("\r\n")[0], body
+
+
+def test_export_in_the_prometheus_text_format(monkeypatch):
+    monkeypatch.setattr(metrics, "counters", metrics.counters.__class__())
+    monkeypatch.setattr(metrics, "gauges", {})
+    monkeypatch.setattr(metrics, "histograms", {})
+    metrics.inc("sends_total", 'kind="a"')
+    metrics.inc("sends_total", 'kind="b"', 2)
+    metrics.register_gauge("games", lambda: 3)
+    metrics.observe("latency_seconds", 0.003, 'method="send"')
+    metrics.observe("latency_seconds", 20, 'method="send"')
+    lines = metrics.export().splitlines()
+    assert lines[:3] == ["# TYPE sends_total counter",
+            'sends_total{kind="a"} 1', 'sends_total{kind="b"} 2']
+    assert "# TYPE games gauge" in lines
+    assert "games 3" in lines
+    assert 'latency_seconds_bucket{method="send",le="0.0025"} 0' in lines
+    assert 'latency_seconds_bucket{method="send",le="0.005"} 1' in lines
+    assert 'latency_seconds_bucket{method="send",le="10"} 1' in lines
+    assert 'latency_seconds_bucket{method="send",le="+Inf"} 2' in lines
+    assert 'latency_seconds_count{method="send"} 2' in lines
+    assert metrics.hit_rate("sends_total", "misses_total", 'kind="b"') == 1.0
+    assert metrics.hit_rate("hits_total", "misses_total") == 0.0
+
+
+def test_metrics_and_health_are_served(monkeypatch):
+    async def scenario():
+        server = await asyncio.start_server(
+                metrics.handle_request, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            status, body = await get(port, "GET /metrics HTTP/1.0\r\n"
+                    + "Accept: text/plain\r\n\r\n")
+            assert status == "HTTP/1.0 200 OK"
+            assert "# TYPE bot_event_loop_lag_seconds_last gauge" in body
+            status, body = await get(
+                    port, "GET /health?verbose HTTP/1.0\r\n\r\n")
+            assert (status, body) == ("HTTP/1.0 200 OK", "ok\n")
+            monkeypatch.setattr(metrics, "loop_lag", metrics.HEALTHY_LAG + 1)
+            status, body = await get(port, "GET /health HTTP/1.0\r\n\r\n")
+            assert status == "HTTP/1.0 503 Service Unavailable"
+            status, _ = await get(port, "POST /metrics HTTP/1.0\r\n\r\n")
+            assert status == "HTTP/1.0 405 Method Not Allowed"
+            status, _ = await get(port, "GET /other HTTP/1.0\r\n\r\n")
+            assert status == "HTTP/1.0 404 Not Found"
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    run(scenario())
@@ -0,0 +1,100 @@
+import asyncio
+
+import prefs
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_close_writes_the_changes_left(tmp_path):
+    path = str(tmp_path / "prefs.db")
+    store = prefs.PreferenceStore(path)
+    store.set(prefs.USER, "u1", "images", True)
+    store.set(prefs.CHANNEL, "c1", "announce", True)
+    # The flusher never ran, as when the bot stops within an interval
+    store.close()
+    reopened = prefs.PreferenceStore(path)
+    assert reopened.get(prefs.USER, "u1", "images") is True
+    assert reopened.get(prefs.CHANNEL, "c1", "announce") is True
+    assert reopened.get(prefs.USER, "u2", "images", False) is False
+    reopened.close()
+
+
+def test_shards_take_on_each_others_changes(tmp_path):
+    path = str(tmp_path / "prefs.db")
+    first = prefs.PreferenceStore(path)
+    second = prefs.PreferenceStore(path)
+
+    async def scenario():
+        first.set(prefs.USER, "u1", "images", True)
+        second.set(prefs.USER, "u2", "images", True)
+        await first.flush()
+        await second.flush()
+        await first.flush()
+        assert first.get(prefs.USER, "u2", "images") is True
+        assert second.get(prefs.USER, "u1", "images") is True
+        # A shard writes only what it changed, so its cached copy of another
+        # preference does not overwrite a newer value
+        second.set(prefs.USER, "u1", "images", False)
+        await second.flush()
+        first.set(prefs.CHANNEL, "c1", "announce", True)
+        await first.flush()
+        assert first.get(prefs.USER, "u1", "images") is False
+        # A change not flushed yet is newer than what the database holds
+        first.set(prefs.USER, "u2", "images", False)
+        second.set(prefs.USER, "u2", "images", True)
+        await second.flush()
+        first.__apply__([(prefs.USER, "u2", "images", "true")])
+        assert first.get(prefs.USER, "u2", "images") is False
+        await first.flush()
+        await second.flush()
+        assert second.get(prefs.USER, "u2", "images") is False
+
+    run(scenario())
+    first.close()
+    second.close()
+
+
+def test_additions_of_every_shard_count(tmp_path):
+    path = str(tmp_path / "prefs.db")
+    first = prefs.PreferenceStore(path)
+    second = prefs.PreferenceStore(path)
+
+    async def scenario():
+        # Both shards rate a round of the same user from the same cached
+        # rating
+        first.add(prefs.USER, "u1", "rating", 16, 1000)
+        second.add(prefs.USER, "u1", "rating", -8.5, 1000)
+        assert first.get(prefs.USER, "u1", "rating") == 1016
+        await first.flush()
+        await second.flush()
+        await first.flush()
+        assert first.get(prefs.USER, "u1", "rating") == 1007.5
+        assert second.get(prefs.USER, "u1", "rating") == 1007.5
+        # An addition not flushed yet stays on top of what is read
+        first.add(prefs.USER, "u1", "rating", 2, 1000)
+        second.add(prefs.USER, "u1", "rating", 4, 1000)
+        await second.flush()
+        rows, first.serial = first.__read__(first.serial)
+        first.__apply__(rows)
+        assert first.get(prefs.USER, "u1", "rating") == 1013.5
+        # Setting a value replaces the additions before it, while the
+        # addition left on the other shard still counts
+        second.add(prefs.USER, "u1", "rating", 100, 1000)
+        second.set(prefs.USER, "u1", "rating", 1200)
+        second.add(prefs.USER, "u1", "rating", 1, 1000)
+        await second.flush()
+        await first.flush()
+        assert first.get(prefs.USER, "u1", "rating") == 1203
+
+    run(scenario())
+    first.close()
+    second.close()
+    reopened = prefs.PreferenceStore(path)
+    assert reopened.get(prefs.USER, "u1", "rating") == 1203
+    reopened.close()
@@ -0,0 +1,53 @@
+import sys
+import time
+
+import profiler
+
+class Worker:
+    def spin(self, seconds):
+        ends_at = time.monotonic() + seconds
+        while time.monotonic() < ends_at:
+            pass
+        return sys._getframe()
+
+
+def test_frames_are_labelled_by_module_and_function():
+    frame = Worker().spin(0)
+    if profiler.HAS_QUALNAME:
+        assert profiler.frame_label(frame) == "test_profiler:Worker.spin"
+    else:
+        assert profiler.frame_label(frame) == "test_profiler:spin"
+
+
+def test_entry_points_match_without_qualified_names(monkeypatch):
+    monkeypatch.setattr(profiler, "HAS_QUALNAME", False)
+    assert profiler.entry_label("uno:Game.run_queue") == "uno:run_queue"
+    assert profiler.entry_label("main:on_message") == "main:on_message"
+    monkeypatch.setattr(profiler, "entry_labels", dict(
+            (profiler.entry_label(entry), entry)
+            for entry in profiler.ENTRY_POINTS))
+    stack = ("main:on_message", "uno:process_message", "uno:handle_message")
+    assert profiler.entry_of(stack) == "uno:process_message"
+    # The innermost entry point wins, under the name it is listed by
+    stack = ("uno:run_queue", "uno:run", "uno:__play_card__")
+    assert profiler.entry_of(stack) == "uno:Game.run"
+
+
+def test_entry_of_idle_and_other_stacks():
+    assert profiler.entry_of(("asyncio:run_forever", "selectors:select")) == (
+            profiler.IDLE_ENTRY)
+    assert profiler.entry_of(("asyncio:run_forever", "x:y")) == (
+            profiler.OTHER_ENTRY)
+    assert profiler.entry_of(()) == profiler.OTHER_ENTRY
+
+
+def test_sampling_finds_the_busy_function():
+    sampler = profiler.SamplingProfiler(interval=0.001)
+    sampler.start()
+    Worker().spin(0.2)
+    sampler.stop()
+    assert sampler.num_samples > 0
+    label = profiler.frame_label(Worker().spin(0))
+    assert any(stack[-1] == label for stack in sampler.stacks)
+    assert label in sampler.summary(5)
+    assert sampler.collapsed().count("\n") == len(sampler.stacks)
@@ -0,0 +1,48 @@
+import ratelimit
+
+def test_burst_then_refill():
+    limiter = ratelimit.RateLimiter(rate=2, capacity=3)
+    assert [limiter.check("u", 10.0) for _ in range(4)] == [
+            ratelimit.ALLOW, ratelimit.ALLOW, ratelimit.ALLOW,
+            ratelimit.NOTIFY]
+    # Half a second refills a single token
+    assert limiter.check("u", 10.5) == ratelimit.ALLOW
+    assert limiter.check("u", 10.5) == ratelimit.NOTIFY
+    # The bucket never holds more than its capacity
+    assert [limiter.check("u", 100.0) for _ in range(4)] == [
+            ratelimit.ALLOW, ratelimit.ALLOW, ratelimit.ALLOW,
+            ratelimit.NOTIFY]
+
+
+def test_author_is_notified_once_until_a_command_runs():
+    limiter = ratelimit.RateLimiter(rate=1, capacity=1)
+    assert limiter.check("u", 0.0) == ratelimit.ALLOW
+    assert limiter.check("u", 0.1) == ratelimit.NOTIFY
+    assert limiter.check("u", 0.2) == ratelimit.DROP
+    assert limiter.check("u", 0.3) == ratelimit.DROP
+    assert limiter.check("u", 1.5) == ratelimit.ALLOW
+    assert limiter.check("u", 1.6) == ratelimit.NOTIFY
+    # Other keys have their own buckets
+    assert limiter.check("v", 1.6) == ratelimit.ALLOW
+
+
+def test_least_recently_used_bucket_is_evicted():
+    limiter = ratelimit.RateLimiter(rate=0, capacity=1, max_keys=2)
+    limiter.check("a", 0.0)
+    limiter.check("b", 0.0)
+    limiter.check("a", 0.0)
+    limiter.check("c", 0.0)
+    assert list(limiter.buckets) == ["a", "c"]
+
+
+def test_check_all_stops_at_the_first_throttle():
+    users = ratelimit.RateLimiter(rate=0, capacity=1)
+    channels = ratelimit.RateLimiter(rate=0, capacity=2)
+    checks = [(users, "u"), (channels, "c")]
+    assert ratelimit.check_all(checks) == ratelimit.ALLOW
+    assert ratelimit.check_all(checks) == ratelimit.NOTIFY
+    assert ratelimit.check_all(checks) == ratelimit.DROP
+    # The throttled user did not use up the tokens of the channel
+    assert channels.buckets["c"].tokens == 1
+    assert ratelimit.check_all([(channels, "c")]) == ratelimit.ALLOW
+    assert ratelimit.check_all([(channels, "c")]) == ratelimit.NOTIFY
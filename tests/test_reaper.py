@@ -0,0 +1,50 @@
+import reaper
+
+TTLS = {"lobby": 100, "game": 1000}
+
+def keys(victims):
+    return [(session.key, reason) for session, reason in victims]
+
+
+def test_idle_sessions_expire_then_the_least_active_are_evicted():
+    sessions = [
+            reaper.Session("new game", "game", 990, 10),
+            reaper.Session("idle lobby", "lobby", 850, 10),
+            reaper.Session("old game", "game", 500, 10),
+            reaper.Session("idle game", "game", -50, 10),
+            reaper.Session("new lobby", "lobby", 980, 10)]
+    victims = reaper.choose_victims(sessions, 1000, TTLS, 2, 1000)
+    assert keys(victims) == [
+            ("idle game", reaper.EXPIRED),
+            ("idle lobby", reaper.EXPIRED),
+            ("old game", reaper.EVICTED)]
+
+
+def test_sessions_are_evicted_until_their_bytes_fit():
+    sessions = [
+            reaper.Session("a", "game", 1, 500),
+            reaper.Session("b", "game", 2, 300),
+            reaper.Session("c", "game", 3, 300)]
+    victims = reaper.choose_victims(sessions, 10, TTLS, 10, 700)
+    assert keys(victims) == [("a", reaper.EVICTED)]
+    victims = reaper.choose_victims(sessions, 10, TTLS, 10, 200)
+    assert keys(victims) == [
+            ("a", reaper.EVICTED), ("b", reaper.EVICTED),
+            ("c", reaper.EVICTED)]
+    assert reaper.choose_victims(sessions, 10, TTLS, 3, 1100) == []
+
+
+def test_sizes_count_owned_objects_once():
+    class Owned:
+        def __init__(self):
+            self.items = ["x" * 100]
+
+    shared = ["y" * 1000]
+    owned = Owned()
+    alone = reaper.approximate_size(owned, (Owned,))
+    assert alone > 100
+    twice = reaper.approximate_size([owned, owned], (Owned,))
+    assert twice - alone < 100
+    # Shared objects and objects of other types are not walked
+    assert reaper.approximate_size([shared], (Owned,), [shared]) < 1000
+    assert reaper.approximate_size(owned) < 100
@@ -0,0 +1,169 @@
+import asyncio
+import concurrent.futures
+
+import pytest
+
+pytest.importorskip("discord")
+
+import loadtest
+import scheduler
+import uno
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def start_game(bot, num_players):
+    """
+    Starts a match of people in its own channel.
+
+    Return:
+    Game
+    """
+    users = [loadtest.FakeUser("u" + str(i), "player" + str(i))
+            for i in range(num_players)]
+    channel = loadtest.FakeChannel("c", "game", False)
+    await uno.start(users, bot.client, channel, uno.MATCH_SCORE, ["stack"])
+    return uno.games[channel.id]
+
+
+def snapshot(game):
+    """
+    Returns what a reload must keep of a game.
+
+    Return:
+    tuple
+    """
+    return ([[str(card) for card in player.get_cards()]
+                    for player in game.players],
+            [str(card) for card in game.deck],
+            [str(card) for card in game.discard],
+            game.turn,
+            game.clockwise,
+            game.wild_color.name,
+            game.version,
+            sorted(game.rule_set.options),
+            game.target_score)
+
+
+def test_reload_moves_games_without_dealing(bot):
+    async def scenario():
+        game = await start_game(bot, 3)
+        await game.queue.join()
+        kept = snapshot(game)
+        timers = len(game.turn_timers)
+        old_executor = uno.bot_executor = (
+                concurrent.futures.ProcessPoolExecutor(max_workers=1))
+        await bot.reload_modules(loadtest.FakeChannel("admin", "admin", False))
+        moved = uno.games["c"]
+        assert moved is not game
+        assert type(moved) is not type(game)
+        assert snapshot(moved) == kept
+        assert len(moved.turn_timers) == timers
+        assert uno.find_game(game.players[0].get_user()) is moved
+        # The old game stopped for good
+        assert game.is_over
+        assert all(timer.cancelled for timer in game.turn_timers)
+        # The new module starts processes of its own when they are needed
+        assert uno.bot_executor is None
+        assert old_executor._shutdown_thread
+        # The moved game takes inputs
+        user = moved.players[moved.turn].get_user()
+        await uno.process_message(loadtest.FakeMessage(
+                user, loadtest.FakeChannel("dm", user.name, True), ".d"))
+        await moved.queue.join()
+        assert moved.version > kept[6]
+        uno.end_game(moved)
+        await asyncio.sleep(0.05)
+
+    run(scenario())
+
+
+def test_failed_reload_keeps_the_old_games(bot):
+    async def scenario():
+        game = await start_game(bot, 2)
+        await game.queue.join()
+        kept = snapshot(game)
+        calls = []
+
+        async def only_in_old_class(game):
+            calls.append(game)
+
+        # The new class has no such method, so the timer cannot be moved
+        uno.Game.only_in_old_class = only_in_old_class
+        game.hand_timer = scheduler.call_later(
+                0.2, game.submit, game.only_in_old_class)
+        old_game_class = uno.Game
+        sent = []
+        send_message = bot.client.send_message
+
+        async def record(destination, content=None, **kwargs):
+            sent.append(content)
+            return await send_message(destination, content, **kwargs)
+
+        bot.client.send_message = record
+        await bot.reload_modules(loadtest.FakeChannel("admin", "admin", False))
+        assert "the old code" in sent[-1]
+        assert uno.Game is old_game_class
+        assert uno.games["c"] is game
+        assert not game.is_over
+        assert snapshot(game) == kept
+        await asyncio.sleep(0.3)
+        await game.queue.join()
+        assert calls == [game]
+        uno.end_game(game)
+        await asyncio.sleep(0.05)
+        del uno.Game.only_in_old_class
+
+    run(scenario())
+
+
+def without_delays(state):
+    """
+    Returns an exported state with the delays of its timers left out, as they
+    shrink while the test runs.
+
+    Return:
+    dict
+    """
+    state = dict(state)
+    for name in ["spectate_timer", "hand_timer", "uno_timer"]:
+        if state[name] is not None:
+            state[name] = state[name][1]
+    state["turn_timers"] = [item for delay, item in state["turn_timers"]]
+    return state
+
+
+def test_exported_state_round_trips(bot):
+    async def scenario():
+        game = await start_game(bot, 3)
+        await game.queue.join()
+        game.draw_penalty = 4
+        game.penalty_type = uno.CardType["DRAW_TWO"]
+        game.players[1].add_score(120)
+        game.uno_timer = scheduler.call_later(
+                30, game.submit, game.__open_uno_window__, 2)
+        # Inputs are kept in the paused game for the export
+        game.queue.put_nowait((uno.expire_game, (game, "stopped")))
+        state = game.export_state()
+        assert game.queue.qsize() == 1
+        assert state["inputs"] == [("function", "expire_game", ("stopped",))]
+        restored = uno.restore_game(state)
+        assert without_delays(restored.export_state()) == without_delays(
+                state)
+        assert restored.penalty_type is uno.CardType["DRAW_TWO"]
+        assert restored.players[1].get_score() == 120
+        assert restored.queue.get_nowait() == (
+                uno.expire_game, (restored, "stopped"))
+        restored.retire()
+        assert restored.uno_timer.cancelled
+        assert all(timer.cancelled for timer in restored.turn_timers)
+        uno.end_game(game)
+        await asyncio.sleep(0.05)
+
+    run(scenario())
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+
+import render
+import uno
+
+def card(color, type):
+    return uno.Card(uno.CardColor[color], uno.CardType[type])
+
+
+HAND = [card("RED", "SEVEN"), card("BLUE", "SKIP"), card("BLACK", "WILD")]
+
+def test_rendered_hands_are_cached_by_what_they_show(monkeypatch):
+    rendered = []
+
+    def render_hand(cards, top, wild_color):
+        rendered.append(len(cards))
+        return b"png" + bytes([len(cards)])
+
+    monkeypatch.setattr(render, "render_hand", render_hand)
+    monkeypatch.setattr(render, "cache", render.cache.__class__())
+    monkeypatch.setattr(render, "CACHE_SIZE", 2)
+    black = uno.CardColor["BLACK"]
+
+    async def scenario():
+        top = card("RED", "ONE")
+        first = await render.render_hand_async(HAND, top, black)
+        # Equal cards show the same image
+        again = await render.render_hand_async(
+                [card("RED", "SEVEN"), card("BLUE", "SKIP"),
+                        card("BLACK", "WILD")],
+                card("RED", "ONE"),
+                black)
+        assert again == first
+        assert rendered == [3]
+        await render.render_hand_async(HAND, top, uno.CardColor["RED"])
+        await render.render_hand_async(HAND[:1], top, black)
+        # The least recently used image was dropped
+        assert len(render.cache) == 2
+        await render.render_hand_async(HAND, top, black)
+        assert rendered == [3, 3, 1, 3]
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(scenario())
+    finally:
+        loop.close()
+
+
+def test_hands_render_as_png():
+    pytest.importorskip("PIL")
+    assert render.is_available()
+    png = render.render_hand(
+            HAND * 5, card("GREEN", "TWO"), uno.CardColor["BLACK"])
+    assert png.startswith(b"\x89PNG")
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+
+import strategy
+import uno
+
+def card(color, type):
+    return uno.Card(uno.CardColor[color], uno.CardType[type])
+
+
+def make_game(house_rules, num_players=3):
+    """
+    Returns a dealt game of computer players.
+
+    Arguments:
+    house_rules(list of str)
+    num_players(int)
+
+    Return:
+    Game
+    """
+    players = []
+    for _ in range(num_players):
+        bot_strategy = strategy.STRATEGIES["greedy"]()
+        players.append(uno.Player(uno.BotUser(bot_strategy), bot_strategy))
+    game = uno.Game(players, None, 0, house_rules)
+    game.use_timers = False
+    game.is_wild_during_init = False
+    return game
+
+
+def test_rules_are_compiled_once_per_options_and_table():
+    three = uno.compile_rules(["stack", "jumpin"], 3)
+    assert uno.compile_rules(("jumpin", "stack"), 5) is three
+    two = uno.compile_rules(["stack", "jumpin"], 2)
+    assert two is not three
+    assert two.play_handlers[uno.CardType["REVERSE"]] == "__play_skip__"
+    assert three.play_handlers[uno.CardType["REVERSE"]] == "__play_reverse__"
+
+
+def test_house_rules_pick_the_handlers():
+    default = uno.compile_rules([], 3)
+    assert default.play_handlers[uno.CardType["DRAW_TWO"]] == (
+            "__play_draw_two__")
+    assert default.wd4_handler == "__offer_challenge__"
+    assert default.draw_handler == "__draw_one__"
+    assert not default.jump_in
+    house = uno.compile_rules(["stack", "sevenzero", "drawuntil"], 3)
+    assert house.play_handlers[uno.CardType["DRAW_TWO"]] == (
+            "__stack_draw_two__")
+    assert house.wd4_handler == "__stack_wild_draw_four__"
+    assert house.play_handlers[uno.CardType["SEVEN"]] == "__play_seven__"
+    assert house.play_handlers[uno.CardType["ZERO"]] == "__play_zero__"
+    assert house.draw_handler == "__draw_until_playable__"
+
+
+def test_only_the_stacked_type_can_be_played_onto_a_penalty():
+    rule_set = uno.compile_rules(["stack"], 3)
+    black = uno.CardColor["BLACK"]
+    stacked = rule_set.legal_keys(
+            card("RED", "DRAW_TWO"), black, uno.CardType["DRAW_TWO"])
+    assert stacked == frozenset(card(color, "DRAW_TWO").key
+            for color in ["RED", "YELLOW", "GREEN", "BLUE"])
+    stacked = rule_set.legal_keys(
+            card("BLACK", "WILD_DRAW_FOUR"), uno.CardColor["GREEN"],
+            uno.CardType["WILD_DRAW_FOUR"])
+    assert stacked == frozenset([card("BLACK", "WILD_DRAW_FOUR").key])
+    # Without a penalty, color, type and wild cards can be played
+    free = rule_set.legal_keys(card("RED", "DRAW_TWO"), black, None)
+    assert card("BLUE", "DRAW_TWO").key in free
+    assert card("RED", "FIVE").key in free
+    assert card("BLACK", "WILD").key in free
+    assert card("BLUE", "FIVE").key not in free
+
+
+def test_stacked_draw_twos_add_up(monkeypatch):
+    game = make_game(["stack"])
+    game.discard.append(card("RED", "DRAW_TWO"))
+    game.turn = 0
+    announced = []
+
+    async def announce_turn():
+        announced.append(game.turn)
+
+    monkeypatch.setattr(game, "announce_turn", announce_turn)
+
+    async def play():
+        await game.__stack_draw_two__(card("RED", "DRAW_TWO"))
+        await game.__stack_draw_two__(card("BLUE", "DRAW_TWO"))
+
+    asyncio.run(play())
+    assert game.draw_penalty == 4
+    assert game.penalty_type == uno.CardType["DRAW_TWO"]
+    assert game.__can_be_played__(card("GREEN", "DRAW_TWO"))
+    assert not game.__can_be_played__(card("BLUE", "FOUR"))
+
+
+def test_jump_in_needs_the_same_card_as_the_last_discard():
+    game = make_game(["jumpin"])
+    game.discard.append(card("RED", "SEVEN"))
+    jumper = (game.turn + 1) % len(game.players)
+    game.players[jumper].receive_card(card("RED", "SEVEN"))
+    game.players[jumper].receive_card(card("BLUE", "SEVEN"))
+    assert game.__can_jump_in__(jumper, ".p red 7")
+    assert game.__can_jump_in__(jumper, ".play r7")
+    assert not game.__can_jump_in__(jumper, ".p blue 7")
+    assert not game.__can_jump_in__(jumper, ".d")
+    game.draw_penalty = 2
+    assert not game.__can_jump_in__(jumper, ".p red 7")
+    game.draw_penalty = 0
+    game.discard.append(card("BLACK", "WILD"))
+    game.players[jumper].receive_card(card("BLACK", "WILD"))
+    assert not game.__can_jump_in__(jumper, ".p wild")
+
+
+def test_jump_in_needs_the_house_rule():
+    game = make_game([])
+    game.discard.append(card("RED", "SEVEN"))
+    jumper = (game.turn + 1) % len(game.players)
+    game.players[jumper].receive_card(card("RED", "SEVEN"))
+    assert not game.__can_jump_in__(jumper, ".p red 7")
+
+
+@pytest.mark.parametrize("num_players, decks", [
+        (2, 1), (10, 1), (11, 2), (20, 2), (21, 3), (50, 5)])
+def test_a_deck_is_shuffled_in_for_every_ten_players(num_players, decks):
+    assert uno.num_decks(num_players) == decks
+
+
+def test_largest_table_is_dealt_from_five_decks():
+    game = make_game([], uno.MAX_PLAYERS)
+    cards = len(game.deck) + len(game.discard) + sum(
+            len(player.get_cards()) for player in game.players)
+    assert cards == 5 * len(uno.full_deck())
+    assert all(len(player.get_cards()) >= 7 for player in game.players)
@@ -0,0 +1,103 @@
+import asyncio
+
+import scheduler
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def test_timers_fire_in_order_of_time():
+    fired = []
+
+    async def scenario():
+        timers = scheduler.Scheduler()
+        timers.call_later(0.03, fired.append, "c")
+        timers.call_later(0.01, fired.append, "a")
+        timers.call_later(0.02, fired.append, "b")
+        # Timers due at the same time fire in the order they were scheduled
+        timers.call_later(0.02, fired.append, "b2")
+        await asyncio.sleep(0.06)
+        assert len(timers) == 0
+        assert timers.handle is None
+
+    run(scenario())
+    assert fired == ["a", "b", "b2", "c"]
+
+
+def test_cancelled_timers_do_not_fire():
+    fired = []
+
+    async def scenario():
+        timers = scheduler.Scheduler()
+        first = timers.call_later(0.01, fired.append, "first")
+        timers.call_later(0.02, fired.append, "second")
+        first.cancel()
+        first.cancel()
+        assert len(timers) == 1
+        await asyncio.sleep(0.04)
+        # Cancelling a timer that has fired is a no-op
+        first.cancel()
+        assert len(timers) == 0
+        assert timers.num_cancelled == 0
+
+    run(scenario())
+    assert fired == ["second"]
+
+
+def test_rescheduling_earlier_arms_the_loop_again():
+    fired = []
+
+    async def scenario():
+        loop = asyncio.get_event_loop()
+        timers = scheduler.Scheduler()
+        started = loop.time()
+        timer = timers.call_later(10, fired.append, loop)
+        timer.cancel()
+        timer = timers.call_later(0.01, fired.append, loop)
+        assert timers.handle_when < started + 1
+        await asyncio.sleep(0.03)
+        # Rescheduling later keeps the earlier timer armed
+        timer = timers.call_later(0.01, fired.append, "kept")
+        later = timers.call_later(0.02, fired.append, "moved")
+        later.cancel()
+        timers.call_later(0.04, fired.append, "moved")
+        await asyncio.sleep(0.06)
+
+    run(scenario())
+    assert len(fired) == 3
+    assert fired[1:] == ["kept", "moved"]
+
+
+def test_cancelled_timers_are_dropped_when_they_fill_the_heap():
+    async def scenario():
+        timers = scheduler.Scheduler()
+        kept = timers.call_later(100, print)
+        for _ in range(100):
+            timers.call_later(50, print).cancel()
+        # The heap is compacted when the earliest timer is armed again
+        timers.call_later(1, print).cancel()
+        assert len(timers.heap) < 10
+        assert len(timers) == 1
+        kept.cancel()
+        timers.handle.cancel()
+
+    run(scenario())
+
+
+def test_coroutine_callbacks_are_run():
+    done = []
+
+    async def callback(value):
+        done.append(value)
+
+    async def scenario():
+        timers = scheduler.Scheduler()
+        timers.call_later(0.01, callback, 1)
+        await asyncio.sleep(0.03)
+
+    run(scenario())
+    assert done == [1]
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+
+import loadtest
+import matchmaking
+import uno
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def user(name):
+    return loadtest.FakeUser(name, name)
+
+
+def channel(name):
+    return loadtest.FakeChannel(name, name, False)
+
+
+async def send(bot, author, where, content):
+    await bot.on_message(loadtest.FakeMessage(author, where, content))
+
+
+async def host_game(bot, name):
+    """
+    Hosts and starts a game of two players in a channel of its own.
+
+    Return:
+    Game
+    """
+    players = [user(name + "-a"), user(name + "-b")]
+    where = channel(name)
+    await send(bot, players[0], where, ".uno")
+    await send(bot, players[1], where, ".ujoin")
+    await send(bot, players[0], where, ".ustart")
+    return uno.games[where.id]
+
+
+async def end_all():
+    for game in list(uno.games.values()):
+        uno.end_game(game)
+    await asyncio.sleep(0.05)
+
+
+def test_hosting_at_the_limit_waits_for_a_game_to_stop(bot, monkeypatch):
+    monkeypatch.setattr(bot, "MAX_SESSIONS", 2)
+
+    async def scenario():
+        oldest = await host_game(bot, "one")
+        await host_game(bot, "two")
+        await send(bot, user("host"), channel("three"), ".uno")
+        # The least recently active game has stopped before the lobby opens
+        assert oldest.is_over
+        assert "one" not in uno.games
+        assert "three" in bot.uno_lobbies
+        assert len(bot.uno_lobbies) + len(uno.games) == 2
+        await end_all()
+
+    run(scenario())
+
+
+def test_queue_tables_respect_the_limit(bot, monkeypatch):
+    monkeypatch.setattr(bot, "MAX_SESSIONS", 1)
+    monkeypatch.setattr(bot, "match_queue", matchmaking.MatchQueue(
+            table_size=2))
+
+    async def scenario():
+        oldest = await host_game(bot, "one")
+        await send(bot, user("q1"), channel("queue"), ".queue")
+        await send(bot, user("q2"), channel("queue"), ".queue")
+        assert oldest.is_over
+        assert list(uno.games) == ["queue"]
+        assert len(bot.match_queue) == 0
+        await end_all()
+
+    run(scenario())
+
+
+def test_least_recently_active_sessions_are_reaped_first(bot, monkeypatch):
+    sent = []
+    send_message = bot.client.send_message
+
+    async def record(where, content):
+        sent.append((where.id, content))
+        return await send_message(where, content)
+
+    monkeypatch.setattr(bot.client, "send_message", record)
+
+    async def scenario():
+        games = [await host_game(bot, name) for name in ["a", "b", "c"]]
+        await send(bot, user("host"), channel("lobby"), ".uno")
+        now = bot.time.monotonic()
+        for game, idle in zip(games, [30, 10, 20]):
+            game.last_active = now - idle
+        bot.uno_lobby_activity["lobby"] = now - 40
+        await bot.reap_sessions(1)
+        assert games[0].is_over and games[2].is_over
+        assert not games[1].is_over
+        assert sorted(uno.games) == ["b"]
+        assert bot.uno_lobbies == {}
+        # Games stop on their own queues, so only the lobby comes first
+        reaped = [where for where, content in sent
+                if "make room for other games" in content
+                and not where.startswith("dm")]
+        assert reaped[0] == "lobby"
+        assert sorted(reaped[1:]) == ["a", "c"]
+        await end_all()
+
+    run(scenario())
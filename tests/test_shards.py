@@ -0,0 +1,127 @@
+import asyncio
+import importlib.util
+
+import pytest
+
+pytest.importorskip("discord")
+
+import loadtest
+import logarchive
+import metrics
+import ratelimit
+import scheduler
+import store
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def load_shard(shard_id, session_store):
+    """
+    Loads the game module afresh, as the process of a shard would, sharing
+    the session store.
+
+    Return:
+    module
+    """
+    spec = importlib.util.find_spec("uno")
+    shard = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(shard)
+    shard.configure_sharding(session_store, shard_id)
+    shard.client = loadtest.FakeClient()
+    return shard
+
+
+@pytest.fixture(autouse=True)
+def fresh_scheduler(monkeypatch):
+    # Each test runs its own event loop, which timers must not outlive
+    monkeypatch.setattr(scheduler, "scheduler", scheduler.Scheduler())
+    monkeypatch.setattr(metrics, "gauges", dict(metrics.gauges))
+
+
+def test_messages_reach_the_shard_owning_the_game():
+    async def scenario():
+        server = await store.StoreServer().start(port=0)
+        port = server.sockets[0].getsockname()[1]
+        owner = load_shard(0, store.SocketStore(port=port))
+        other = load_shard(1, store.SocketStore(port=port))
+        users = [loadtest.FakeUser("u" + str(i), "player" + str(i))
+                for i in range(2)]
+        channel = loadtest.FakeChannel("c", "game", False)
+        await owner.start(users, owner.client, channel)
+        inbox = asyncio.ensure_future(owner.run_inbox())
+        game = owner.games[channel.id]
+        player = game.players[game.turn]
+        num_cards = len(player.get_cards())
+        user = player.get_user()
+        message = loadtest.FakeMessage(
+                user, loadtest.FakeChannel("dm" + user.id, user.name, True),
+                ".d")
+        # The shard without the game forwards the message, the owner does
+        # not
+        assert other.find_game(user) is None
+        assert await other.forward_to_owner(message)
+        assert not await owner.forward_to_owner(message)
+        for _ in range(500):
+            if len(player.get_cards()) > num_cards:
+                break
+            await asyncio.sleep(0.01)
+        await game.queue.join()
+        assert len(player.get_cards()) > num_cards
+        owner.end_game(game)
+        inbox.cancel()
+        await asyncio.sleep(0.05)
+        # Ending the game released its players
+        assert await other.session_store.get("owner:" + user.id) is None
+        owner.session_store.close()
+        other.session_store.close()
+        server.close()
+        await server.wait_closed()
+        await asyncio.sleep(0.05)
+    run(scenario())
+
+
+def test_forwarded_game_input_is_not_throttled(monkeypatch, tmp_path):
+    import main
+    monkeypatch.setattr(main, "client", loadtest.FakeClient())
+    monkeypatch.setattr(main, "log", logarchive.LogArchive(str(tmp_path)))
+    monkeypatch.setattr(main, "user_limiter",
+            ratelimit.RateLimiter(rate=0.5, capacity=5))
+    monkeypatch.setattr(main, "channel_limiter",
+            ratelimit.RateLimiter(rate=2, capacity=10))
+
+    async def scenario():
+        shared = store.MemoryStore()
+        monkeypatch.setattr(main.uno, "session_store", shared)
+        monkeypatch.setattr(main.uno, "shard_id", 0)
+        owner = load_shard(1, shared)
+        users = [loadtest.FakeUser("u" + str(i), "player" + str(i))
+                for i in range(2)]
+        channel = loadtest.FakeChannel("c", "game", False)
+        await owner.start(users, owner.client, channel)
+        game = owner.games[channel.id]
+        user = users[0]
+        dm = loadtest.FakeChannel("dm" + user.id, user.name, True)
+        # Far more moves than a burst of commands outside of games
+        num_moves = main.user_limiter.capacity * 4
+        for _ in range(num_moves):
+            await main.on_message(loadtest.FakeMessage(user, dm, ".d"))
+        assert len(shared.lists["inbox:1"]) == num_moves
+        assert main.client.calls["send_message"] == 0
+        # Commands of users without a game are still throttled
+        stranger = loadtest.FakeUser("u9", "stranger")
+        for _ in range(main.user_limiter.capacity + 1):
+            await main.on_message(loadtest.FakeMessage(
+                    stranger,
+                    loadtest.FakeChannel("dmu9", stranger.name, True),
+                    ".ping"))
+        assert main.client.calls["send_message"] == (
+                main.user_limiter.capacity + 1)
+        owner.end_game(game)
+        await asyncio.sleep(0.05)
+    run(scenario())
@@ -0,0 +1,114 @@
+import asyncio
+import socket
+
+import pytest
+
+import store
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def free_port():
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        return listener.getsockname()[1]
+
+
+async def stop(server, *clients):
+    """Closes the clients and the server, and lets their tasks finish."""
+    for client in clients:
+        client.close()
+    server.close()
+    await server.wait_closed()
+    await asyncio.sleep(0.05)
+
+
+async def start_server(handler=None):
+    """
+    Starts a store server, or a server answering with the given handler, on
+    a free port.
+
+    Return:
+    tuple: asyncio.Server and its port
+    """
+    if handler is None:
+        server = await store.StoreServer().start(port=0)
+    else:
+        server = await asyncio.start_server(handler, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1]
+
+
+def test_values_and_lists_are_shared_between_connections():
+    async def scenario():
+        server, port = await start_server()
+        first = store.SocketStore(port=port)
+        second = store.SocketStore(port=port)
+        await first.set("owner:1", 0)
+        assert await second.get("owner:1") == 0
+        popped = asyncio.ensure_future(second.pop("inbox:0", 5))
+        await first.push("inbox:0", {"content": ".d"})
+        assert await popped == {"content": ".d"}
+        await first.delete("owner:1")
+        assert await second.get("owner:1") is None
+        await stop(server, first, second)
+    run(scenario())
+
+
+def test_pending_requests_fail_when_the_server_closes():
+    async def close_after_request(reader, writer):
+        await reader.readline()
+        writer.close()
+
+    async def scenario():
+        server, port = await start_server(close_after_request)
+        client = store.SocketStore(port=port)
+        with pytest.raises(store.StoreError):
+            await asyncio.wait_for(client.pop("inbox:0", 30), 5)
+        # The next request connects again instead of writing to the old
+        # connection
+        with pytest.raises(store.StoreError):
+            await asyncio.wait_for(client.get("owner:1"), 5)
+        await stop(server, client)
+    run(scenario())
+
+
+def test_requests_time_out(monkeypatch):
+    monkeypatch.setattr(store, "REQUEST_TIMEOUT", 0.1)
+
+    async def never_answer(reader, writer):
+        await reader.read()
+        writer.close()
+
+    async def scenario():
+        server, port = await start_server(never_answer)
+        client = store.SocketStore(port=port)
+        with pytest.raises(store.StoreError):
+            await client.set("owner:1", 0)
+        assert not client.pending
+        await stop(server, client)
+    run(scenario())
+
+
+def test_failed_connections_back_off_then_recover(monkeypatch):
+    monkeypatch.setattr(store, "MIN_BACKOFF", 0.2)
+
+    async def scenario():
+        port = free_port()
+        client = store.SocketStore(port=port)
+        with pytest.raises(store.StoreError):
+            await client.get("owner:1")
+        server = await store.StoreServer().start(port=port)
+        # Too soon after the failure to connect again
+        with pytest.raises(store.StoreError):
+            await client.get("owner:1")
+        await asyncio.sleep(0.3)
+        await client.set("owner:1", 1)
+        assert await client.get("owner:1") == 1
+        await stop(server, client)
+    run(scenario())
@@ -0,0 +1,18 @@
+import pytest
+
+pytest.importorskip("discord")
+
+import tournament
+import uno
+
+# Montecarlo wins only a few more of the games than greedy, so fewer games
+# would not tell them apart
+@pytest.mark.slow
+def test_montecarlo_beats_greedy(monkeypatch):
+    # Searches stop after their number of playouts instead of on the clock,
+    # so that the seeded games play out the same on any machine
+    monkeypatch.setattr(uno, "BOT_LATENCY_BUDGET", 1000)
+    wins, unfinished, moves = tournament.play_batch(
+            (["montecarlo", "greedy"], list(range(60)), []))
+    assert unfinished == 0
+    assert wins["montecarlo"] > wins["greedy"]
@@ -0,0 +1,58 @@
+import triggers
+
+def matches(automaton, text):
+    return sorted((end, length, value)
+            for end, length, value in automaton.scan(text))
+
+
+def test_overlapping_patterns_are_all_found():
+    automaton = triggers.Automaton()
+    for pattern in ["he", "she", "his", "hers"]:
+        automaton.add(pattern, pattern)
+    assert matches(automaton, "ushers") == [
+            (3, 2, "he"), (3, 3, "she"), (5, 4, "hers")]
+    assert matches(automaton, "ahishe") == [
+            (3, 3, "his"), (5, 2, "he"), (5, 3, "she")]
+
+
+def test_patterns_are_added_and_removed_between_scans():
+    automaton = triggers.Automaton()
+    automaton.add("abc", 1)
+    assert matches(automaton, "xabcx") == [(3, 3, 1)]
+    automaton.add("bc", 2)
+    automaton.add("abc", 3)
+    assert matches(automaton, "xabcx") == [(3, 2, 2), (3, 3, 3)]
+    assert automaton.remove("abc")
+    assert not automaton.remove("abc")
+    assert not automaton.remove("ab")
+    assert matches(automaton, "xabcx") == [(3, 2, 2)]
+    assert automaton.get("abc") is None
+    assert automaton.get("bc") == 2
+
+
+def test_removed_patterns_are_pruned_and_their_nodes_reused():
+    automaton = triggers.Automaton()
+    automaton.add("ab", 1)
+    automaton.add("abcd", 2)
+    size = len(automaton.goto)
+    assert automaton.remove("abcd")
+    # The nodes of "c" and "d" are pruned, the node of "ab" is kept
+    assert automaton.goto[automaton.__find__("ab")] == {}
+    assert sorted(automaton.free) == sorted([size - 2, size - 1])
+    automaton.add("xyz", 3)
+    assert len(automaton.goto) == size + 1
+    assert automaton.free == []
+    assert matches(automaton, "abxyzabcd") == [(1, 2, 1), (4, 3, 3), (6, 2, 1)]
+    assert automaton.remove("ab")
+    assert automaton.goto[0] == {"x": automaton.__find__("x")}
+
+
+def test_exact_trigger_wins_over_contained_ones():
+    trigger_set = triggers.TriggerSet([
+            ("uno", triggers.CONTAINS, "contained"),
+            ("play uno", triggers.EXACT, "exact")])
+    assert trigger_set.respond("play uno") == "exact"
+    assert trigger_set.respond("let us play uno") == "contained"
+    assert trigger_set.remove("UNO")
+    assert trigger_set.respond("let us play uno") is None
+    assert trigger_set.list() == [("play uno", triggers.EXACT, "exact")]
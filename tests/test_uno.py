@@ -0,0 +1,268 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("discord")
+
+import loadtest
+import metrics
+import scheduler
+import uno
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_scheduler(monkeypatch):
+    # Each test runs its own event loop, which timers must not outlive
+    monkeypatch.setattr(scheduler, "scheduler", scheduler.Scheduler())
+
+
+async def start_game(num_players):
+    """
+    Starts a game of people on a fake client.
+
+    Return:
+    Game
+    """
+    users = [loadtest.FakeUser("u" + str(i), "player" + str(i))
+            for i in range(num_players)]
+    channel = loadtest.FakeChannel("c", "game", False)
+    await uno.start(users, loadtest.FakeClient(), channel)
+    return uno.games[channel.id]
+
+
+def test_unclaimed_uno_window_expires(monkeypatch, capsys):
+    monkeypatch.setattr(uno, "UNO_WINDOW", 0.05)
+    label = 'outcome="unclaimed"'
+
+    async def scenario():
+        game = await start_game(2)
+        unclaimed = metrics.get("uno_calls_total", label)
+        game.submit(game.__open_uno_window__, game.turn)
+        await game.queue.join()
+        assert game.uno_player == game.turn
+        await asyncio.sleep(0.2)
+        await game.queue.join()
+        assert game.uno_player == -1
+        assert game.uno_timer is None
+        assert metrics.get("uno_calls_total", label) == unclaimed + 1
+        uno.end_game(game)
+        await asyncio.sleep(0.05)
+
+    run(scenario())
+    assert "Traceback" not in capsys.readouterr().err
+
+
+def test_players_are_found_by_their_user_id(monkeypatch):
+    async def scenario():
+        game = await start_game(uno.MAX_PLAYERS)
+        await game.queue.join()
+        asked = []
+
+        async def request_hand(user):
+            asked.append(user)
+
+        monkeypatch.setattr(game, "request_hand", request_hand)
+        last = game.players[-1].get_user()
+        stranger = loadtest.FakeUser("x", "stranger")
+        for author in [last, stranger]:
+            await uno.handle_message(game, loadtest.FakeMessage(
+                    author,
+                    loadtest.FakeChannel("dm" + author.id, author.name, True),
+                    ".hand"))
+        assert asked == [last]
+        uno.end_game(game)
+        await asyncio.sleep(0.05)
+
+    run(scenario())
+
+
+def test_view_cache_hit_rate_is_a_gauge(monkeypatch):
+    monkeypatch.setattr(metrics, "counters", metrics.counters.__class__())
+
+    async def scenario():
+        game = await start_game(2)
+        await game.queue.join()
+        metrics.counters.clear()
+        for _ in range(4):
+            game.__cached_view__("turn", -1, game.__render_turn__)
+        assert metrics.read_gauges()["uno_view_cache_hit_rate_turn"] == 0.75
+        assert metrics.read_gauges()["uno_view_cache_hit_rate_hand"] == 0.0
+        assert "uno_view_cache_hit_rate_turn 0.75\n" in metrics.export()
+        uno.end_game(game)
+        await asyncio.sleep(0.05)
+
+    run(scenario())
+
+
+def test_bot_workers_are_seeded(monkeypatch):
+    monkeypatch.setattr(uno, "bot_executor", None)
+    monkeypatch.setattr(uno.random, "seed", lambda: seeded.append(True))
+    seeded = []
+    uno.seed_worker()
+    assert seeded
+
+    async def scenario():
+        assert await uno.decide(Pass(), None) == "pass"
+
+    run(scenario())
+    uno.bot_executor.shutdown()
+    assert uno.bot_executor._initializer is uno.seed_worker
+
+
+class Pass:
+    """Strategy passing on every turn."""
+
+    def decide(self, view):
+        return "pass"
+
+
+def test_spectators_get_one_edit_per_interval(monkeypatch):
+    monkeypatch.setattr(uno, "SPECTATE_INTERVAL", 0.05)
+
+    async def scenario():
+        game = await start_game(2)
+        await game.queue.join()
+        watcher = loadtest.FakeUser("w", "watcher")
+        await uno.spectate(watcher, game.channel)
+        status = game.spectators["w"][1]
+        assert status.content == game.get_status()
+        edits = uno.client.calls["edit_message"]
+        # A change of the game shows in a single edit
+        player = game.players[game.turn].get_user()
+        await uno.handle_message(game, loadtest.FakeMessage(
+                player, loadtest.FakeChannel("dm", player.name, True), ".d"))
+        game.mark_changed()
+        game.mark_changed()
+        await asyncio.sleep(0.15)
+        await game.queue.join()
+        assert uno.client.calls["edit_message"] == edits + 1
+        assert status.content == game.get_status()
+        # Nothing is edited if the status is the same
+        game.mark_changed()
+        await asyncio.sleep(0.15)
+        assert uno.client.calls["edit_message"] == edits + 1
+        await uno.unspectate(watcher, game.channel)
+        assert game.spectators == {}
+        uno.end_game(game)
+        await asyncio.sleep(0.05)
+
+    run(scenario())
+
+
+def test_inputs_are_applied_one_at_a_time_in_order(monkeypatch):
+    async def scenario():
+        game = await start_game(2)
+        await game.queue.join()
+        applied = []
+
+        async def slow(name):
+            applied.append(name + " started")
+            await asyncio.sleep(0.01)
+            applied.append(name + " done")
+
+        async def failing():
+            raise ValueError("lost input")
+
+        game.submit(slow, "first")
+        game.submit(failing)
+        game.submit(slow, "second")
+        await game.queue.join()
+        # An input failing does not stop the inputs after it
+        assert applied == ["first started", "first done", "second started",
+                "second done"]
+        uno.end_game(game)
+        await asyncio.sleep(0.05)
+
+    run(scenario())
+
+
+def test_busy_games_turn_messages_away(monkeypatch):
+    monkeypatch.setattr(uno, "GAME_QUEUE_SIZE", 2)
+
+    async def scenario():
+        game = await start_game(2)
+        await game.queue.join()
+        rejected = metrics.get("uno_queue_rejected_total")
+        release = asyncio.get_event_loop().create_future()
+        game.submit(lambda: release)
+        await asyncio.sleep(0)
+        user = game.players[0].get_user()
+        dm = loadtest.FakeChannel("dm" + user.id, user.name, True)
+        for _ in range(3):
+            await uno.process_message(loadtest.FakeMessage(user, dm, ".d"))
+        assert game.queue.qsize() == 2
+        assert metrics.get("uno_queue_rejected_total") == rejected + 1
+        release.set_result(None)
+        await game.queue.join()
+        uno.end_game(game)
+        await asyncio.sleep(0.05)
+
+    run(scenario())
+
+
+def test_private_channels_are_opened_once_per_player(monkeypatch):
+    async def scenario():
+        client = loadtest.FakeClient()
+        start_private_message = client.start_private_message
+
+        async def fail_for_u1(user):
+            if user.id == "u1":
+                raise ConnectionError("unreachable")
+            return await start_private_message(user)
+
+        client.start_private_message = fail_for_u1
+        users = [loadtest.FakeUser("u" + str(i), "player" + str(i))
+                for i in range(3)]
+        channel = loadtest.FakeChannel("c", "game", False)
+        await uno.start(users, client, channel)
+        game = uno.games["c"]
+        await game.queue.join()
+        assert sorted(uno.dm_channels) == ["u0", "u2"]
+        cached = metrics.get("uno_private_sends_total", 'channel="cached"')
+        resolved = metrics.get("uno_private_sends_total",
+                'channel="resolved"')
+        for user in users:
+            await uno.send_private(user, "hello")
+        assert metrics.get("uno_private_sends_total",
+                'channel="cached"') == cached + 2
+        assert metrics.get("uno_private_sends_total",
+                'channel="resolved"') == resolved + 1
+        uno.end_game(game)
+        assert uno.dm_channels == {}
+        await asyncio.sleep(0.05)
+
+    monkeypatch.setattr(uno, "dm_channels", {})
+    run(scenario())
+
+
+def test_hand_message_is_pinned_once_and_edited_on_change():
+    async def scenario():
+        game = await start_game(2)
+        await game.queue.join()
+        player = game.players[0]
+        await game.update_hand(player)
+        pins = uno.client.calls["pin_message"]
+        edits = uno.client.calls["edit_message"]
+        assert player.hand_message is not None
+        assert player.hand_message.content == (
+                "Your cards are:" + player.get_hand())
+        await game.update_hand(player)
+        assert uno.client.calls["edit_message"] == edits
+        player.receive_card(uno.Card(
+                uno.CardColor["BLACK"], uno.CardType["WILD"]))
+        await game.update_hand(player)
+        assert uno.client.calls["edit_message"] == edits + 1
+        assert uno.client.calls["pin_message"] == pins
+        assert player.hand_message.content.endswith("[W]  ```")
+        uno.end_game(game)
+        await asyncio.sleep(0.05)
+
+    run(scenario())
@@ -0,0 +1,141 @@
+"""
+Plays computer players against each other without Discord.
+
+Usage: python tournament.py [--games N] [--processes N] [--rule RULE]...
+                            STRATEGY...
+e.g.   python tournament.py --games 10000 random greedy montecarlo
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import random
+import time
+import uno
+import strategy
+
+async def play_headless(strategy_names, seed, house_rules=()):
+    """
+    Plays a single game between computer players, without sending messages.
+
+    Arguments:
+    strategy_names(list of str): Strategies of the players, in seat order
+    seed          (int)        : Seed for shuffling the deck
+    house_rules   (list of str): Names of the house rules in play
+
+    Return:
+    tuple: Index of the winner, or -1 if nobody won, and the number of moves
+    """
+    random.seed(seed)
+    players = []
+    for name in strategy_names:
+        bot_strategy = strategy.STRATEGIES[name]()
+        players.append(uno.Player(uno.BotUser(bot_strategy), bot_strategy))
+    game = uno.Game(players, None, 0, house_rules)
+    game.use_timers = False
+    moves = 0
+    # Stop games where the deck has run out and nobody can play anymore
+    while moves < 5000:
+        player = game.players[game.turn]
+        moves += 1
+        if not await game.__run_command__(
+                player.strategy.decide(game.get_view())):
+            return game.game_end(), moves
+    return -1, moves
+
+
+def play_batch(args):
+    """
+    Plays a batch of games in a worker process.
+
+    Argument:
+    args(tuple): Strategy names, the list of seeds of the games and the house
+                 rules
+
+    Return:
+    tuple: Number of wins of each strategy, number of unfinished games and
+           total number of moves
+    """
+    strategy_names, seeds, house_rules = args
+    loop = asyncio.new_event_loop()
+    wins = dict((name, 0) for name in strategy_names)
+    unfinished = 0
+    total_moves = 0
+    for seed in seeds:
+        # Rotate the seats so that no strategy always plays first
+        shift = seed % len(strategy_names)
+        seats = strategy_names[shift:] + strategy_names[:shift]
+        winner, moves = loop.run_until_complete(
+                play_headless(seats, seed, house_rules))
+        total_moves += moves
+        if winner == -1:
+            unfinished += 1
+        else:
+            wins[seats[winner]] += 1
+    loop.close()
+    return wins, unfinished, total_moves
+
+
+def run_tournament(strategy_names, num_games, num_processes, batch_size=100,
+        house_rules=()):
+    """
+    Plays the games in parallel worker processes.
+
+    Arguments:
+    strategy_names(list of str)
+    num_games     (int)
+    num_processes (int)
+    batch_size    (int)        : Number of games sent to a worker at once
+    house_rules   (list of str): Names of the house rules in play
+
+    Return:
+    tuple: Number of wins of each strategy, number of unfinished games and
+           total number of moves
+    """
+    batches = []
+    for start in range(0, num_games, batch_size):
+        seeds = list(range(start, min(start + batch_size, num_games)))
+        batches.append((strategy_names, seeds, list(house_rules)))
+    wins = dict((name, 0) for name in strategy_names)
+    unfinished = 0
+    total_moves = 0
+    with multiprocessing.Pool(num_processes) as pool:
+        for batch_wins, batch_unfinished, batch_moves in pool.imap_unordered(
+                play_batch, batches):
+            for name in batch_wins:
+                wins[name] += batch_wins[name]
+            unfinished += batch_unfinished
+            total_moves += batch_moves
+    return wins, unfinished, total_moves
+
+
+def main():
+    parser = argparse.ArgumentParser(
+            description="Plays UNO strategies against each other.")
+    parser.add_argument("strategies", nargs="+",
+            choices=sorted(strategy.STRATEGIES))
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--processes", type=int,
+            default=multiprocessing.cpu_count())
+    parser.add_argument("--rule", action="append", default=[],
+            choices=sorted(uno.HOUSE_RULES),
+            help="house rule in play, may be given several times")
+    args = parser.parse_args()
+    if len(args.strategies) < 2:
+        parser.error("at least two strategies are needed")
+    started = time.time()
+    wins, unfinished, total_moves = run_tournament(
+            args.strategies, args.games, args.processes,
+            house_rules=args.rule)
+    elapsed = time.time() - started
+    print("{0} games, {1} moves in {2:.1f} seconds".format(
+            args.games, total_moves, elapsed))
+    for name in args.strategies:
+        print("{0:<12} {1:>7} wins ({2:.1%})".format(
+                name, wins[name], wins[name] / args.games))
+    if unfinished:
+        print("{0} games did not finish".format(unfinished))
+
+
+if __name__ == "__main__":
+    main()
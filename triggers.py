@@ -0,0 +1,345 @@
+"""
+Auto-responses to words in messages, configured per server.
+
+The triggers of a server are compiled into a single Aho-Corasick automaton, so
+a message is scanned once whatever the number of triggers.
+"""
+
+MAX_TRIGGERS = 100        # Triggers a server may have
+MAX_PATTERN_LENGTH = 100  # Characters in the pattern of a trigger
+MAX_RESPONSE_LENGTH = 500 # Characters in the response of a trigger
+
+EXACT = "exact"        # The message must be the pattern
+CONTAINS = "contains"  # The pattern may be anywhere in the message
+MODES = [EXACT, CONTAINS]
+
+class Automaton:
+    """
+    Aho-Corasick automaton finding all patterns in a text in a single pass.
+
+    Patterns are added to the trie in place, and removing a pattern prunes the
+    nodes that no longer lead to one, to be reused by later patterns. After
+    either change, the failure links and outputs of the whole trie are
+    computed again the next time a text is scanned.
+
+    Attributes:
+    goto   (list of dict of str: int): Children of each node, by character
+    fail   (list of int)             : Node of the longest proper suffix of
+                                       each node that is in the trie
+    depth  (list of int)             : Length of the prefix of each node
+    own    (list of object)          : Value of the pattern ending at each
+                                       node, or None
+    output (list of list of int)     : Nodes of the patterns ending at each
+                                       node, its own first then by failure
+                                       links
+    free   (list of int)             : Pruned nodes, to be reused
+    is_dirty(bool)                   : Whether the failure links are out of
+                                       date
+    """
+    def __init__(self):
+        """Constructor of the automaton, with only the root node."""
+        self.goto = [{}]
+        self.fail = [0]
+        self.depth = [0]
+        self.own = [None]
+        self.output = [[]]
+        self.free = []
+        self.is_dirty = False
+
+    def add(self, pattern, value):
+        """
+        Adds a pattern, or replaces its value.
+
+        Arguments:
+        pattern(str)   : Non-empty pattern
+        value  (object): Value found when the pattern is matched, not None
+        """
+        node = 0
+        for char in pattern:
+            child = self.goto[node].get(char)
+            if child is None:
+                child = self.__new_node__(self.depth[node] + 1)
+                self.goto[node][char] = child
+            node = child
+        self.own[node] = value
+        self.is_dirty = True
+
+    def remove(self, pattern):
+        """
+        Removes a pattern, and prunes the nodes that only led to it.
+
+        Argument:
+        pattern(str)
+
+        Return:
+        bool: Whether the pattern was in the automaton
+        """
+        path = [0]
+        for char in pattern:
+            node = self.goto[path[-1]].get(char)
+            if node is None:
+                return False
+            path.append(node)
+        if self.own[path[-1]] is None:
+            return False
+        self.own[path[-1]] = None
+        # Walks back up until a node still ends or leads to another pattern
+        for depth in range(len(pattern), 0, -1):
+            node = path[depth]
+            if self.goto[node] or self.own[node] is not None:
+                break
+            del self.goto[path[depth - 1]][pattern[depth - 1]]
+            self.free.append(node)
+        self.is_dirty = True
+        return True
+
+    def get(self, pattern):
+        """
+        Returns the value of a pattern.
+
+        Argument:
+        pattern(str)
+
+        Return:
+        object: The value, or None if the pattern is not in the automaton
+        """
+        node = self.__find__(pattern)
+        if node is None:
+            return None
+        return self.own[node]
+
+    def __new_node__(self, depth):
+        """
+        Returns an empty node, reusing a pruned node if there is one.
+
+        Argument:
+        depth(int): Length of the prefix of the node
+
+        Return:
+        int
+        """
+        if self.free:
+            node = self.free.pop()
+            self.fail[node] = 0
+            self.depth[node] = depth
+            self.output[node] = []
+            return node
+        self.goto.append({})
+        self.fail.append(0)
+        self.depth.append(depth)
+        self.own.append(None)
+        self.output.append([])
+        return len(self.goto) - 1
+
+    def __find__(self, pattern):
+        """
+        Returns the node of a prefix in the trie.
+
+        Argument:
+        pattern(str)
+
+        Return:
+        int: The node, or None if the prefix is not in the trie
+        """
+        node = 0
+        for char in pattern:
+            node = self.goto[node].get(char)
+            if node is None:
+                return None
+        return node
+
+    def __link__(self):
+        """Computes the failure links and outputs in breadth-first order."""
+        self.output[0] = []
+        queue = []
+        for child in self.goto[0].values():
+            self.fail[child] = 0
+            queue.append(child)
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            fallback = self.output[self.fail[node]]
+            if self.own[node] is None:
+                self.output[node] = fallback
+            else:
+                self.output[node] = [node] + fallback
+            for char, child in self.goto[node].items():
+                state = self.fail[node]
+                while state and char not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(char, 0)
+                queue.append(child)
+        self.is_dirty = False
+
+    def scan(self, text):
+        """
+        Finds the patterns in a text.
+
+        Argument:
+        text(str)
+
+        Return:
+        generator of tuple: End index, length and value of each match, in the
+                            order their ends appear in the text
+        """
+        if self.is_dirty:
+            self.__link__()
+        goto = self.goto
+        fail = self.fail
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for match in self.output[node]:
+                yield index, self.depth[match], self.own[match]
+
+
+class TriggerSet:
+    """
+    Triggers of a server.
+
+    Attributes:
+    automaton(Automaton): Lowercase patterns, with their (mode, response)
+    patterns (list of str): Patterns in the order they were added
+    """
+    def __init__(self, triggers=()):
+        """
+        Constructor of the set.
+
+        Argument:
+        triggers(iterable of tuple): Pattern, mode and response of each
+                                     trigger
+        """
+        self.automaton = Automaton()
+        self.patterns = []
+        for pattern, mode, response in triggers:
+            self.add(pattern, mode, response)
+
+    def add(self, pattern, mode, response):
+        """
+        Adds a trigger, or replaces the trigger with the same pattern.
+
+        Arguments:
+        pattern (str)
+        mode    (str): EXACT or CONTAINS
+        response(str)
+        """
+        pattern = pattern.lower()
+        if self.automaton.get(pattern) is None:
+            self.patterns.append(pattern)
+        self.automaton.add(pattern, (mode, response))
+
+    def remove(self, pattern):
+        """
+        Removes a trigger.
+
+        Argument:
+        pattern(str)
+
+        Return:
+        bool: Whether there was a trigger with the pattern
+        """
+        pattern = pattern.lower()
+        if not self.automaton.remove(pattern):
+            return False
+        self.patterns.remove(pattern)
+        return True
+
+    def copy(self):
+        """
+        Returns a set with the same triggers.
+
+        Return:
+        TriggerSet
+        """
+        return TriggerSet(self.list())
+
+    def list(self):
+        """
+        Returns the triggers in the order they were added.
+
+        Return:
+        list of tuple: Pattern, mode and response of each trigger
+        """
+        triggers = []
+        for pattern in self.patterns:
+            mode, response = self.automaton.get(pattern)
+            triggers.append((pattern, mode, response))
+        return triggers
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def respond(self, content):
+        """
+        Returns the response to a message. An exact trigger wins over the
+        others, then the contained trigger ending first.
+
+        Argument:
+        content(str): Content of the message, in lowercase
+
+        Return:
+        str: The response, or None if no trigger matched
+        """
+        contained = None
+        for end, length, (mode, response) in self.automaton.scan(content):
+            if mode == EXACT:
+                if length == len(content):
+                    return response
+            elif contained is None:
+                contained = response
+        return contained
+
+
+DEFAULT_TRIGGERS = [
+        ("ayy", EXACT, "lmao"),
+        ("unlike", CONTAINS, "**U N L I K E**")]
+
+default_set = TriggerSet(DEFAULT_TRIGGERS)
+server_sets = {}  # dict of str: TriggerSet, keyed by server ID
+
+def get_set(server_id):
+    """
+    Returns the triggers of a server. Servers that have not changed their
+    triggers share the default set.
+
+    Argument:
+    server_id(str): ID of the server, or None for private channels
+
+    Return:
+    TriggerSet
+    """
+    return server_sets.get(server_id, default_set)
+
+
+def edit_set(server_id):
+    """
+    Returns the triggers of a server to be changed, copying the default set
+    the first time.
+
+    Argument:
+    server_id(str)
+
+    Return:
+    TriggerSet
+    """
+    trigger_set = server_sets.get(server_id)
+    if trigger_set is None:
+        trigger_set = server_sets[server_id] = default_set.copy()
+    return trigger_set
+
+
+def respond(server_id, content):
+    """
+    Returns the response to a message.
+
+    Arguments:
+    server_id(str): ID of the server, or None for private channels
+    content  (str): Content of the message, in lowercase
+
+    Return:
+    str: The response, or None if no trigger matched
+    """
+    return get_set(server_id).respond(content)
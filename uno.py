@@ -1,22 +1,100 @@
 ## TODO:
 ## 
 ## - Show the top card right after showing whose turn it is
-## - Allow commands for spelling out the entire word instead of
-##   using abbreviations (e.g. Accept `.red` as well as `.r`)
-## - UNO should be mentioned when only one card is left in hand
 ## - non-command PM to UnlikeBot during ongoing UNO game works like `.send`
 ## - mention when the deck runs out and discard pile goes into deck
 
 from enum import Enum
+import asyncio
+import commands
+import concurrent.futures
+import heapq
+import io
+import itertools
 import random
 from random import shuffle
+import time
+import traceback
 import discord
+import matchmaking
+import messages
+import metrics
+import prefs
+import ratelimit
+import render
+import scheduler
+import store
 
 client = None               # discord.Client
-players = []                # list of Player
-channel = None              # discord.Channel
-game = None                 # Game
-announce_to_channel = False # Boolean
+games = {}                  # dict of str: Game, keyed by the host channel ID
+user_games = {}             # dict of str: Game, keyed by the player's user ID
+# MemoryStore or SocketStore, holding which shard plays the game of each user
+session_store = store.MemoryStore()
+shard_id = 0                # Shard of this process
+# dict of str: discord.PrivateChannel, keyed by the user ID of players in games
+dm_channels = {}
+# PreferenceStore of users and channels, or None for games without Discord
+preferences = None
+
+MATCH_SCORE = 500           # Score to reach to win a match of several rounds
+MAX_PLAYERS = 50            # Players a game may have
+PLAYERS_PER_DECK = 10       # Players sharing each deck of 108 cards
+LISTED_PLAYERS = 10         # Players up to which the order of play lists
+                            # everyone, instead of a summary
+SUMMARY_PLAYERS = 3         # Players named in each line of a summary
+TURN_REMINDER = 60          # Seconds until the current player is reminded
+TURN_TIMEOUT = 120          # Seconds until a card is drawn for the current
+                            # player and their turn is passed
+GAME_QUEUE_SIZE = 20        # Messages a game holds before turning more away
+SPECTATE_INTERVAL = 5       # Seconds between edits of the spectators' status
+HAND_EDIT_DELAY = 2         # Seconds changes to hands are gathered before
+                            # their messages are edited
+UNO_WINDOW = 5              # Seconds a player left with one card can be
+                            # caught before they call UNO
+UNO_PENALTY = 2             # Cards drawn by a player caught not calling UNO
+BOT_DELAY = 1               # Seconds a computer player waits before acting
+BOT_LATENCY_BUDGET = 2      # Seconds a computer player may take to decide
+BOT_PROCESSES = 2           # Processes deciding for computer players at once
+INBOX_POLL = 30             # Seconds to wait for forwarded messages at a time
+INBOX_RETRY = 5             # Seconds to wait when the store cannot be reached
+STATE_VERSION = 1           # Version of the state passed on to a reloaded
+                            # module, raised when its format changes
+
+HELP_TEXT = "".join([
+        "```\n.p <card index> - During your turn, plays a card with the ",
+        "given index.\n",
+        ".p <card name> - Plays a card by its name, e.g. .p red 7, .p r7 or ",
+        ".p wd4.\n",
+        ".d - During your turn, draws a card for you.\n",
+        ".r/.y/.g/.b - Calls a color for a Wild card. .red, .yellow, .green ",
+        "and .blue work too.\n",
+        ".hand - Shows what cards you currently have.\n",
+        ".turn - Shows whose turn it currently is and how many cards they",
+        " have.\n",
+        ".last - Shows which card was discarded last.\n",
+        ".images <on/off> - Shows your hand as an image.\n",
+        ".uno! - Calls UNO when you have one card left.\n",
+        ".catch - Catches a player with one card left who has not called ",
+        "UNO yet, who then draws two cards.\n",
+        ".swap <number> - After playing a 7 with the sevenzero house ",
+        "rule, swaps hands with the player of the given number.\n",
+        ".send <message> - Sends <message> to everybody and the ",
+        "channel.\n",
+        ".ustop - Stops the current game.\n",
+        ".unohelp - You probably already know this.```"])
+
+# Queries about a game allowed per player; turns are not limited, as the queue
+# of the game already bounds them
+QUERY_COMMANDS = [".hand", ".turn", ".last", ".unohelp", ".announce",
+        ".images", ".catch"]
+query_limiter = ratelimit.RateLimiter(rate=0.5, capacity=5)
+
+# Processes for the decisions of computer players, so that searches do not
+# hold the interpreter lock of the event loop, started by the first decision
+# so that loading the module for a reload starts none
+bot_executor = None
+# Sequence numbers ordering UNO claims that arrive at the same time
+claim_sequence = itertools.count()
 
 class CardColor(Enum):
     """Enumeration of colors of UNO cards."""
@@ -53,6 +131,7 @@ class Card:
     Attributes:
     color(CardColor)
     type (CardType)
+    key  (int)      : Key for comparing multiple cards
     """
     def __init__(self, color, type):
         """
@@ -64,6 +143,7 @@ class Card:
         """
         self.color = color
         self.type = type
+        self.key = color.value * 100 + type.value
 
     def __str__(self):
         """String representation of the card.
@@ -184,28 +264,350 @@ class Card:
         Return:
         int
         """
-        return self.color.value * 100 + self.type.value
+        return self.key
         
 
+def card_key(color_name, type_name):
+    """
+    Returns the compare key of the card of a color and type.
+
+    Arguments:
+    color_name(str): Name of the CardColor, e.g. "RED"
+    type_name (str): Name of the CardType, e.g. "SEVEN"
+
+    Return:
+    int
+    """
+    return CardColor[color_name].value * 100 + CardType[type_name].value
+
+
+def full_deck():
+    """
+    Returns all cards of a single UNO deck.
+
+    Return:
+    list of Card
+    """
+    deck = []
+    # Add the colored cards
+    for color in range(1, 5):
+        deck.append(Card(CardColor(color), CardType["ZERO"]))
+        for type in range(1, 13):
+            for _ in range(2):
+                deck.append(Card(CardColor(color), CardType(type)))
+    # Add Wild cards and Wild Draw Four cards
+    for _ in range(4):
+        deck.append(Card(CardColor["BLACK"], CardType["WILD"]))
+        deck.append(Card(CardColor["BLACK"], CardType["WILD_DRAW_FOUR"]))
+    return deck
+
+
+def num_decks(num_players):
+    """
+    Returns the number of decks shuffled together for a table, so that large
+    tables do not run out of cards.
+
+    Argument:
+    num_players(int)
+
+    Return:
+    int
+    """
+    return max(1, (num_players + PLAYERS_PER_DECK - 1) // PLAYERS_PER_DECK)
+
+
+def export_cards(cards):
+    """
+    Returns cards as the names of their color and type, which outlive a reload
+    of this module.
+
+    Argument:
+    cards(list of Card)
+
+    Return:
+    list of tuple
+    """
+    return [(card.color.name, card.type.name) for card in cards]
+
+
+def import_cards(names):
+    """
+    Returns the cards exported by export_cards.
+
+    Argument:
+    names(list of tuple)
+
+    Return:
+    list of Card
+    """
+    return [Card(CardColor[color], CardType[type]) for color, type in names]
+
+
+# House rules that may be chosen when hosting a game, with their descriptions
+HOUSE_RULES = {
+        "stack": "Draw Two and Wild Draw Four cards can be stacked onto the "
+                + "same card, passing on the sum of the cards to draw",
+        "jumpin": "A card exactly like the last discard can be played out of "
+                + "turn",
+        "sevenzero": "Playing a 7 swaps hands with a chosen player, and "
+                + "playing a 0 passes every hand on in the order of play",
+        "drawuntil": "Drawing goes on until a card that can be played is "
+                + "drawn"}
+
+# Game methods playing each type of card under the default rules
+PLAY_HANDLERS = {
+        CardType["SKIP"]: "__play_skip__",
+        CardType["DRAW_TWO"]: "__play_draw_two__",
+        CardType["REVERSE"]: "__play_reverse__",
+        CardType["WILD"]: "__play_wild__",
+        CardType["WILD_DRAW_FOUR"]: "__play_wild_draw_four__"}
+
+class RuleSet:
+    """
+    Rules of a game, compiled when the game starts into tables that are only
+    looked up during turns, whichever house rules are chosen.
+
+    Attributes:
+    options      (frozenset of str)         : House rules in play
+    play_handlers(dict of CardType: str)    : Name of the Game method playing
+                                              each type of card
+    draw_handler (str)                      : Name of the Game method drawing
+                                              for the current player
+    wd4_handler  (str)                      : Name of the Game method
+                                              following the color chosen for a
+                                              Wild Draw Four
+    jump_in      (bool)                     : Whether players may jump in
+    cards        (list of Card)             : One card of every kind
+    legal        (dict of tuple: frozenset) : Compare keys of the cards that
+                                              can be played, keyed by the
+                                              compare key of the top card, the
+                                              wild color and the type of the
+                                              pending penalty
+    """
+    def __init__(self, options, num_players):
+        """
+        Constructor of the rules.
+
+        Arguments:
+        options    (iterable of str): Names of the house rules in play
+        num_players(int)
+        """
+        self.options = frozenset(options)
+        self.play_handlers = {}
+        for type in CardType:
+            self.play_handlers[type] = PLAY_HANDLERS.get(
+                    type,
+                    "__play_number__")
+        # Reverse acts as Skip if there are only two players
+        if num_players == 2:
+            self.play_handlers[CardType["REVERSE"]] = "__play_skip__"
+        self.draw_handler = "__draw_one__"
+        self.wd4_handler = "__offer_challenge__"
+        if "stack" in self.options:
+            self.play_handlers[CardType["DRAW_TWO"]] = "__stack_draw_two__"
+            self.wd4_handler = "__stack_wild_draw_four__"
+        if "sevenzero" in self.options:
+            self.play_handlers[CardType["SEVEN"]] = "__play_seven__"
+            self.play_handlers[CardType["ZERO"]] = "__play_zero__"
+        if "drawuntil" in self.options:
+            self.draw_handler = "__draw_until_playable__"
+        self.jump_in = "jumpin" in self.options
+        self.cards = []
+        for card in full_deck():
+            if not any(card.equals(kind) for kind in self.cards):
+                self.cards.append(card)
+        self.legal = {}
+
+    def legal_keys(self, top, wild_color, penalty_type):
+        """
+        Returns the cards that can be played, working them out the first time
+        the situation comes up.
+
+        Arguments:
+        top         (Card)
+        wild_color  (CardColor)
+        penalty_type(CardType) : Type of the cards stacked onto the pending
+                                 penalty, or None
+
+        Return:
+        frozenset of int: Compare keys of the cards
+        """
+        key = (top.key, wild_color, penalty_type)
+        keys = self.legal.get(key)
+        if keys is None:
+            keys = frozenset(
+                    card.key for card in self.cards
+                    if self.__is_legal__(card, top, wild_color, penalty_type))
+            self.legal[key] = keys
+        return keys
+
+    def __is_legal__(self, card, top, wild_color, penalty_type):
+        """
+        Determines if the card can be played.
+
+        Arguments:
+        card        (Card)
+        top         (Card)
+        wild_color  (CardColor)
+        penalty_type(CardType)
+
+        Return:
+        bool
+        """
+        # Only a card of the same type can be stacked onto a penalty
+        if penalty_type is not None:
+            return card.get_type() == penalty_type
+        if (wild_color != CardColor["BLACK"]
+                and card.get_color() == wild_color):
+            return True
+        if card.equals_color(top) or card.equals_type(top):
+            return True
+        return card.get_color() == CardColor["BLACK"]
+
+
+# dict of tuple: RuleSet, keyed by the house rules and whether there are only
+# two players, shared by the games played by the same rules
+rule_sets = {}
+
+def compile_rules(options, num_players):
+    """
+    Returns the rules of a game, compiling them the first time.
+
+    Arguments:
+    options    (iterable of str): Names of the house rules in play
+    num_players(int)
+
+    Return:
+    RuleSet
+    """
+    key = (frozenset(options), num_players == 2)
+    rule_set = rule_sets.get(key)
+    if rule_set is None:
+        rule_set = rule_sets[key] = RuleSet(options, num_players)
+    return rule_set
+
+
+class BotUser:
+    """
+    Stands in for discord.User for a computer player.
+
+    Attributes:
+    id      (str)     : Unique ID of the computer player
+    name    (str)     : Name shown to the other players
+    strategy(Strategy): Strategy making the decisions of the player
+    """
+    count = 0
+
+    def __init__(self, strategy, id=None, name=None):
+        """
+        Constructor of the computer player.
+
+        Arguments:
+        strategy(Strategy)
+        id      (str)     : ID of an existing computer player, or None for a
+                            new one
+        name    (str)     : Name of the existing computer player
+        """
+        if id is None:
+            BotUser.count += 1
+            id = "bot" + str(BotUser.count)
+            name = "Bot #" + str(BotUser.count) + " (" + strategy.name + ")"
+        self.id = id
+        self.name = name
+        self.strategy = strategy
+
+    def __str__(self):
+        """
+        String representation of the computer player.
+
+        Return:
+        str
+        """
+        return self.name
+
+
+class GameView:
+    """
+    What a player can see of the game when making a decision.
+
+    Attributes:
+    decision  (str)           : One of "play", "keep", "color", "challenge"
+                                and "swap"
+    hand      (list of Card)  : Cards in hand
+    legal     (list of int)   : Indices of the cards in hand that can be played
+    top       (Card)          : The last discarded card
+    wild_color(CardColor)     : Color called for the Wild card, or Black
+    hand_sizes(list of int)   : Number of cards in every player's hand, in the
+                                order of play starting from the deciding player
+    discard   (list of Card)  : Pile of discarded cards
+    budget    (float)         : Seconds available for the decision
+    """
+    def __init__(self, decision, hand, legal, top, wild_color, hand_sizes,
+            discard, budget):
+        """
+        Constructor of the view.
+
+        Arguments:
+        decision  (str)
+        hand      (list of Card)
+        legal     (list of int)
+        top       (Card)
+        wild_color(CardColor)
+        hand_sizes(list of int)
+        discard   (list of Card)
+        budget    (float)
+        """
+        self.decision = decision
+        self.hand = hand
+        self.legal = legal
+        self.top = top
+        self.wild_color = wild_color
+        self.hand_sizes = hand_sizes
+        self.discard = discard
+        self.budget = budget
+
+
 class Player:
     """
     An UNO player.
 
     Attributes:
-    cards(list of Card): UNO cards in hand
-    score(int):          Score accumulated during the set of UNO games
-    user (discord.User): User object represented
+    cards   (list of Card): UNO cards in hand
+    score   (int)         : Score accumulated during the set of UNO games
+    user    (discord.User): User object represented
+    name    (str)         : Name of the user, kept for the whole game
+    strategy(Strategy)    : Strategy of a computer player, or None if the
+                            player is a person
+    hand_message(discord.Message): Pinned PM showing the hand, edited as it
+                            changes, or None before it is sent
+    shown_hand  (str)     : Content of the hand message
+    hand_version(int)     : Number of changes to the hand
+    shown_version(int)    : Hand version shown by the hand message, so that
+                            unchanged hands are skipped without rendering
+    wants_images(bool)    : Whether the hand is also sent as an image on
+                            request and with the turn prompt
+    card_indices(dict of int: list of int): Indices of the cards in hand keyed
+                            by their compare key, in ascending order
     """
-    def __init__(self, user):
+    def __init__(self, user, strategy=None):
         """
         Constructor of the player.
 
-        Argument:
-        user(discord.User)
+        Arguments:
+        user    (discord.User)
+        strategy(Strategy)
         """
         self.cards = []
         self.score = 0
         self.user = user
+        self.name = user.name
+        self.strategy = strategy
+        self.hand_message = None
+        self.shown_hand = None
+        self.hand_version = 0
+        self.shown_version = -1
+        self.wants_images = False
+        self.card_indices = {}
 
     def receive_card(self, card):
         """
@@ -215,6 +617,8 @@ class Player:
         card(Card)
         """
         self.cards.append(card)
+        self.card_indices.setdefault(card.key, []).append(len(self.cards) - 1)
+        self.hand_version += 1
 
     def discard_card(self, index):
         """
@@ -223,7 +627,17 @@ class Player:
         Argument:
         index(int)
         """
+        index %= len(self.cards)
+        indices = self.card_indices[self.cards[index].key]
+        indices.remove(index)
+        if not indices:
+            del(self.card_indices[self.cards[index].key])
         del(self.cards[index])
+        # The cards after the discarded one move down by one
+        for i in range(index, len(self.cards)):
+            indices = self.card_indices[self.cards[i].key]
+            indices[indices.index(i + 1)] = i
+        self.hand_version += 1
 
     def get_hand(self):
         """
@@ -232,13 +646,39 @@ class Player:
         Return:
         str
         """
-        index = 1
-        str_repr = "```\n"
-        for card in self.cards:
-            str_repr += str(index) + "." + str(card) + "  "
-            index += 1
-        str_repr += "```"
-        return str_repr
+        parts = ["```\n"]
+        for index, card in enumerate(self.cards, 1):
+            parts.append(str(index) + "." + str(card) + "  ")
+        parts.append("```")
+        return "".join(parts)
+
+    def find_card(self, argument):
+        """
+        Returns the index of the card a player names, by its number in the
+        hand or its name, e.g. "3", "red 7" or "r7".
+
+        Argument:
+        argument(str)
+
+        Return:
+        int: Index of the card, out of range if the player does not have the
+             card named, or None if the argument names no card
+        """
+        if argument.isdigit():
+            return int(argument) - 1
+        card = commands.resolve_card(argument)
+        if card is None:
+            return None
+        indices = self.card_indices.get(card_key(*card))
+        if not indices:
+            return -1
+        return indices[0]
+
+    def index_cards(self):
+        """Rebuilds the indices of the cards after the hand is replaced."""
+        self.card_indices = {}
+        for index, card in enumerate(self.cards):
+            self.card_indices.setdefault(card.key, []).append(index)
 
     def get_cards(self):
         """
@@ -252,6 +692,8 @@ class Player:
     def shuffle_cards(self):
         """Shuffles the cards in hand."""
         shuffle(self.cards)
+        self.index_cards()
+        self.hand_version += 1
 
     def add_score(self, score):
         """
@@ -273,11 +715,26 @@ class Player:
 
     def reset_cards(self):
         """Empties the player's current hand."""
-        self.cards = []
+        del(self.cards[:])
+        self.card_indices = {}
+        self.hand_version += 1
+
+    def take_cards(self, cards):
+        """
+        Replaces the player's hand with the given cards.
+
+        Argument:
+        cards(list of Card)
+        """
+        self.cards = cards
+        self.index_cards()
+        self.hand_version += 1
 
     def sort_cards(self):
         """Sorts the player's current cards."""
         self.cards = sorted(self.cards, key=Card.get_compare_key)
+        self.index_cards()
+        self.hand_version += 1
 
     def get_user(self):
         """
@@ -288,6 +745,50 @@ class Player:
         """
         return self.user
 
+    def export_state(self):
+        """
+        Returns the state of the player, to be passed on to a reloaded module.
+
+        Return:
+        dict
+        """
+        return {
+                "user": self.user,
+                "strategy": self.strategy,
+                "cards": export_cards(self.cards),
+                "score": self.score,
+                "hand_message": self.hand_message,
+                "shown_hand": self.shown_hand,
+                "hand_version": self.hand_version,
+                "shown_version": self.shown_version,
+                "wants_images": self.wants_images}
+
+    def import_state(self, state):
+        """
+        Takes on the state exported by a player of the previous module.
+        States of older versions lack some keys, which keep their defaults.
+
+        Argument:
+        state(dict)
+        """
+        self.cards = import_cards(state["cards"])
+        self.index_cards()
+        self.score = state["score"]
+        self.hand_message = state.get("hand_message")
+        self.shown_hand = state.get("shown_hand")
+        self.hand_version = state.get("hand_version", 0)
+        self.shown_version = state.get("shown_version", -1)
+        self.wants_images = state.get("wants_images", False)
+
+
+# Attributes of a game passed on as they are to a reloaded module
+GAME_STATE_ATTRIBUTES = ["winner_index", "clockwise", "turn",
+        "is_wild_during_init", "is_playing_wild", "is_playing_wd4",
+        "is_checking_challenge", "is_drawing", "is_legal_wd4",
+        "wd4_player_index", "is_choosing_swap", "draw_penalty", "dealer",
+        "round_score", "announce_to_channel", "use_timers", "spectators",
+        "turn_serial", "version", "last_active", "uno_player", "uno_claims",
+        "uno_serial"]
 
 class Game:
     """
@@ -322,21 +823,149 @@ class Game:
     wd4_player_index     (int)           : Index of the player who is playing a
                                            Wild Draw Four card, or -1 if nobody
                                            is playing a Wild Draw Four card
+    is_choosing_swap     (bool)          : Flag of whether the current player is
+                                           choosing whom to swap hands with
+    draw_penalty         (int)           : Cards stacked for the current player
+                                           to draw
+    penalty_type         (CardType)      : Type of the cards stacked, or None if
+                                           no penalty is pending
+    rule_set             (RuleSet)       : Rules of the game
+    legal_for            (tuple)         : Top card, wild color and penalty
+                                           type the legal keys are for
+    legal                (frozenset of int): Compare keys of the cards that
+                                           can be played on top
+    play_handlers        (dict of CardType: method): Methods playing each type
+                                           of card under the rules of the game
+    draw_for_turn        (method)        : Method drawing for the current
+                                           player under the rules of the game
+    after_wd4_color      (method)        : Method following the color chosen
+                                           for a Wild Draw Four
+    target_score         (int)           : Score to reach to win the match, or 0
+                                           if only a single round is played
+    dealer               (int)           : Index of the player who dealt the
+                                           current round
+    round_score          (int)           : Score the winner of the last round
+                                           has gained
+    channel              (discord.Channel): The main channel to announce the
+                                           game at
+    announce_to_channel  (bool)          : Whether the game is fully announced
+                                           to the main channel
+    turn_timers          (list of Timer) : Reminder and timeout of the current
+                                           turn
+    turn_serial          (int)           : Number of times the turn timers have
+                                           been set, to detect outdated timers
+    use_timers           (bool)          : Whether turns time out and computer
+                                           players act on their own, which is
+                                           off for games driven directly
+    spectators           (dict of str: list): Spectators keyed by user ID, as
+                                           [user, status message or None, last
+                                           status sent]
+    spectate_timer       (Timer)         : Pending update of the spectators, or
+                                           None if nothing has changed
+    spectator_status     (str)           : Latest status to send to the
+                                           spectators
+    spectator_edits      (asyncio.Future): Edits of the spectators' status
+                                           being sent, or None
+    hand_timer           (Timer)         : Pending update of the hand messages,
+                                           or None if nothing has changed
+    is_over              (bool)          : Whether the game has ended
+    version              (int)           : Number of changes to the state of
+                                           the game
+    view_cache           (dict of tuple: tuple): Rendered views keyed by the
+                                           view and player index, as (version,
+                                           content)
+    player_indices       (dict of str: int): Indices of players keyed by their
+                                           user ID
+    queue                (asyncio.Queue) : Pending inputs of the game, as
+                                           (coroutine function, arguments)
+    worker               (asyncio.Task)  : Task applying the inputs one at a
+                                           time, or None if the game is driven
+                                           directly
+    last_active          (float)         : Monotonic time of the last message
+                                           of a player, for the reaper
+    uno_player           (int)           : Index of the player left with one
+                                           card who can still be caught, or -1
+                                           if no UNO window is open
+    uno_claims           (list of tuple) : Claims of the open UNO window, as
+                                           (arrival time, sequence number,
+                                           player index, ".uno!" or ".catch")
+    uno_timer            (Timer)         : Closing of the open UNO window, or
+                                           None
+    uno_serial           (int)           : Number of UNO windows opened, to
+                                           detect outdated resolutions
     """
-    def __init__(self, players):
+    def __init__(self, players, channel, target_score=0, house_rules=()):
         """
         Constructor of Game.
 
-        Argument:
-        players(list of Player)
+        Arguments:
+        players     (list of Player)
+        channel     (discord.Channel): The main channel to announce the game at
+        target_score(int)            : Score to reach to win the match, or 0 if
+                                       only a single round is played
+        house_rules (iterable of str): Names of the house rules in play
+        """
+        self.__setup__(players, channel, target_score, house_rules)
+        self.__init_deck__()
+        self.__deal__()
+
+    def __setup__(self, players, channel, target_score, house_rules):
+        """
+        Sets the attributes that do not depend on the cards, before the deck
+        is filled and dealt, or taken on from a previous module.
+
+        Arguments:
+        players     (list of Player)
+        channel     (discord.Channel)
+        target_score(int)
+        house_rules (iterable of str)
         """
         self.players = players
+        self.channel = channel
+        self.announce_to_channel = False
+        self.turn_timers = []
+        self.turn_serial = 0
+        self.use_timers = True
+        self.spectators = {}
+        self.spectate_timer = None
+        self.spectator_status = None
+        self.spectator_edits = None
+        self.hand_timer = None
+        self.is_over = False
+        self.version = 0
+        self.view_cache = {}
+        self.player_indices = {}
+        self.queue = asyncio.Queue()
+        self.worker = None
+        self.last_active = time.monotonic()
+        self.uno_player = -1
+        self.uno_claims = []
+        self.uno_timer = None
+        self.uno_serial = 0
+        for i in range(len(players)):
+            self.player_indices[players[i].get_user().id] = i
+        self.target_score = target_score
+        # Turns look up the compiled rules instead of checking options
+        self.rule_set = compile_rules(house_rules, len(players))
+        self.play_handlers = {}
+        for type, name in self.rule_set.play_handlers.items():
+            self.play_handlers[type] = getattr(self, name)
+        self.draw_for_turn = getattr(self, self.rule_set.draw_handler)
+        self.after_wd4_color = getattr(self, self.rule_set.wd4_handler)
+        self.legal_for = (None, None, None)
+        self.legal = frozenset()
         self.deck = []
         self.discard = []
+        self.dealer = 0
+        self.round_score = 0
+
+    def __deal__(self):
+        """Resets the state of the round and deals the cards."""
+        self.version += 1
         self.wild_color = CardColor["BLACK"]
         self.winner_index = -1
         self.clockwise = True
-        self.turn = 1
+        self.turn = self.dealer
         self.is_wild_during_init = False
         self.is_playing_wild = False
         self.is_playing_wd4 = False
@@ -344,11 +973,14 @@ class Game:
         self.is_drawing = False
         self.is_legal_wd4 = False
         self.wd4_player_index = -1
-        self.__init_deck__()
+        self.is_choosing_swap = False
+        self.draw_penalty = 0
+        self.penalty_type = None
+        self.__next_turn__()
         # Distribute seven cards to every player
         for player in self.players:
             player.reset_cards()
-            for time in range(7):
+            for _ in range(7):
                 self.__give_topdeck_to_player__(player)
             player.sort_cards()
         # Discard a card from the top of the deck
@@ -374,19 +1006,46 @@ class Game:
         elif self.discard[-1].get_type() == CardType["WILD"]:
             self.is_wild_during_init = True
 
+    def new_round(self):
+        """
+        Starts the next round of the match with the same players.
+
+        Cards are collected back from the hands and the discard pile into the
+        existing deck instead of building a new deck, and the dealer moves to
+        the next player.
+        """
+        self.close_uno_window(self.uno_serial)
+        for player in self.players:
+            self.deck.extend(player.get_cards())
+            player.reset_cards()
+        self.deck.extend(self.discard)
+        del(self.discard[:])
+        self.__shuffle_deck__()
+        self.dealer = (self.dealer + 1) % len(self.players)
+        self.__deal__()
+
+    def is_match_over(self):
+        """
+        Determines if a player has reached the target score of the match.
+
+        Return:
+        bool: True if the match is over or only a single round is played,
+              False otherwise
+        """
+        if self.target_score <= 0:
+            return True
+        for player in self.players:
+            if player.get_score() >= self.target_score:
+                return True
+        return False
+
     def __init_deck__(self):
-        """Fill the deck with a full deck of UNO cards."""
-        # Add the colored cards
-        for color in range(1, 5):
-            self.deck.append(Card(CardColor(color), CardType["ZERO"]))
-            for type in range(1, 13):
-                for time in range(2):
-                    self.deck.append(Card(CardColor(color), CardType(type)))
-        # Add Wild cards and Wild Draw Four cards
-        for time in range(4):
-            self.deck.append(Card(CardColor["BLACK"], CardType["WILD"]))
-            self.deck.append(
-                    Card(CardColor["BLACK"], CardType["WILD_DRAW_FOUR"]))
+        """
+        Fill the deck with full decks of UNO cards, one for every
+        PLAYERS_PER_DECK players.
+        """
+        for i in range(num_decks(len(self.players))):
+            self.deck.extend(full_deck())
         self.__shuffle_deck__()
 
     def __shuffle_deck__(self):
@@ -405,9 +1064,9 @@ class Game:
         """
         # Move discarded cards to the deck if the deck is empty
         if not self.deck:
-            self.deck = self.discard[:-1]
+            self.deck.extend(self.discard[:-1])
+            del(self.discard[:-1])
             self.__shuffle_deck__()
-            self.discard = [self.discard[-1]]
             # Ran out of cards from deck/discard, so player cannot draw
             if not self.deck:
                 return False
@@ -449,16 +1108,32 @@ class Game:
         Return:
         bool: True if the card can be played, False otherwise
         """
-        if (self.wild_color != CardColor["BLACK"]
-                and card.get_color() == self.wild_color):
-            return True
-        if card.equals_color(self.discard[-1]):
-            return True
-        if card.equals_type(self.discard[-1]):
-            return True
-        if card.get_color() == CardColor["BLACK"]:
-            return True
-        return False
+        # The legal cards are looked up again only when the top changes
+        top = self.discard[-1]
+        legal_for = self.legal_for
+        if (legal_for[0] is not top or legal_for[1] is not self.wild_color
+                or legal_for[2] is not self.penalty_type):
+            self.legal_for = (top, self.wild_color, self.penalty_type)
+            self.legal = self.rule_set.legal_keys(
+                    top,
+                    self.wild_color,
+                    self.penalty_type)
+        return card.key in self.legal
+
+    def __player_after__(self, count):
+        """
+        Returns the index of the player the given number of turns after the
+        current player.
+
+        Argument:
+        count(int)
+
+        Return:
+        int
+        """
+        if self.clockwise:
+            return (self.turn + count) % len(self.players)
+        return (self.turn - count) % len(self.players)
 
     async def __play_card__(self, index):
         """
@@ -469,141 +1144,223 @@ class Game:
         """
         card = self.players[self.turn].get_cards()[index]
         self.__discard_player_card__(self.players[self.turn], index)
-        num_cards_in_hand = len(self.players[self.turn].get_cards())
-        msg_str = "**"
-        msg_str += self.players[self.turn].get_user().name
-        msg_str += "** has played `"
-        msg_str += str(card)
-        msg_str += "` and now has **"
-        msg_str += str(num_cards_in_hand)
-        msg_str += " card"
-        if num_cards_in_hand != 1:
-            msg_str += "s"
-        msg_str += "** in hand."
-        await announce([self.players[self.turn]], msg_str)
+        msg_str = ("**"
+                + self.players[self.turn].name
+                + "** has played `"
+                + str(card)
+                + "` and now has **"
+                + count_cards(len(self.players[self.turn].get_cards()))
+                + "** in hand.")
+        await self.announce([self.players[self.turn]], msg_str)
         turn_before = self.turn
-        # Skip card
-        if card.get_type() == CardType["SKIP"]:
-            self.__next_turn__()
-            await announce(
-                    [self.players[self.turn]],
-                    "**"
-                    + self.players[self.turn].get_user().name
-                    + "**'s turn is skipped.")
-            await message_player(
-                    self.players[self.turn],
-                    "Your turn has been skipped.")
-            self.__next_turn__()
-            self.wild_color = CardColor["BLACK"]
-        # Draw Two card
-        elif card.get_type() == CardType["DRAW_TWO"]:
-            self.__next_turn__()
-            count = 0
-            for i in range(2):
-                if self.__give_topdeck_to_player__(self.players[self.turn]):
-                    count += 1
-                else:
-                    break
-            announce_str = ""
-            pm_str = ""
-            if count == 0:
-                announce_str += ("**"
-                        + self.players[self.turn].get_user().name
-                        + "** tried to draw two cards, but the deck ran out of "
-                        + "cards.")
-                pm_str += ("You tried to draw two cards, but the deck ran out "
-                        + "of cards, so you could not draw any.")
-            elif count == 1:
-                announce_str += ("**"
-                        + self.players[self.turn].get_user().name
-                        + "** tried to draw two cards, but only one card was "
-                        + "drawn, since the deck ran out of cards.")
-                pm_str += ("You have drawn `"
-                        + str(self.players[self.turn].get_cards()[-1])
-                        + "`, but you could not draw any more cards because the"
-                        + " deck ran out of cards.")
-            else:
-                announce_str += ("**"
-                        + self.players[self.turn].get_user().name
-                        + "** drew two cards.")
-                pm_str += ("You have drawn `"
-                        + str(self.players[self.turn].get_cards()[-2])
-                        + "` and `"
-                        + str(self.players[self.turn].get_cards()[-1])
-                        + "`.")
-            announce_str += " Their turn is skipped."
-            pm_str += " Your turn is skipped."
-            await announce([self.players[self.turn]], announce_str)
-            await message_player(self.players[self.turn], pm_str)
-            self.players[self.turn].sort_cards()
-            self.__next_turn__()
-            self.wild_color = CardColor["BLACK"]
-        # Reverse card
-        elif card.get_type() == CardType["REVERSE"]:
-            # Acts the same way as Skip card if there are only two players
-            if len(self.players) == 2:
-                self.__next_turn__()
-                await announce(
-                        [self.players[self.turn]],
-                        "**"
-                        + self.players[self.turn].get_user().name
-                        + "**'s turn is skipped.")
-                await message_player(
-                        self.players[self.turn],
-                        "Your turn is skipped.")
-                self.__next_turn__()
-            else:
-                await announce([], "The order has been reversed.")
-                if self.clockwise:
-                    self.clockwise = False
-                else:
-                    self.clockwise = True
-                self.__next_turn__()
-            self.wild_color = CardColor["BLACK"]
-        # Wild card
-        elif card.get_type() == CardType["WILD"]:
-            await announce(
-                    [self.players[self.turn]],
-                    "Waiting for **"
-                    + self.players[self.turn].get_user().name
-                    + "** to choose a color...")
-            await message_player(
-                    self.players[self.turn],
-                    "Choose a color by typing `.r`(red), `.y`(yellow), "
-                    + "`.g`(green), or `.b`(blue).")
-            self.is_playing_wild = True
-        # Wild Draw Four card
-        elif card.get_type() == CardType["WILD_DRAW_FOUR"]:
-            # Determine if Wild Draw Four card is legal
-            self.is_legal_wd4 = True
-            for card_it in self.players[self.turn].get_cards():
-                if card_it.get_color() == CardColor["BLACK"]:
-                    continue
-                elif card_it.get_color() == self.wild_color:
-                    self.is_legal_wd4 = False
-                    break
-                elif card_it.equals_color(self.discard[-2]):
-                    self.is_legal_wd4 = False
-                    break
-            self.wild_color = CardColor["BLACK"]
-            await announce(
-                    [self.players[self.turn]],
-                    "Waiting for **"
-                    + self.players[self.turn].get_user().name
-                    + "** to choose a color...")
-            await message_player(
-                    self.players[self.turn],
-                    "Choose a color by typing `.r`(red), `.y`(yellow), "
-                    + "`.g`(green), or `.b`(blue).")
-            self.is_playing_wd4 = True
-        # A non-action card
-        else:
-            self.__next_turn__()
-            self.wild_color = CardColor["BLACK"]
+        if len(self.players[turn_before].get_cards()) == 1:
+            await self.__open_uno_window__(turn_before)
+        await self.play_handlers[card.get_type()](card)
         # If the player wins the match
         if not self.players[turn_before].get_cards():
             self.winner_index = turn_before
 
+    async def __play_skip__(self, card):
+        """
+        Skips the next player.
+
+        Argument:
+        card(Card): The card played
+        """
+        self.__next_turn__()
+        await self.announce(
+                [self.players[self.turn]],
+                "**"
+                + self.players[self.turn].name
+                + "**'s turn is skipped.")
+        await message_player(
+                self.players[self.turn],
+                "Your turn has been skipped.")
+        self.__next_turn__()
+        self.wild_color = CardColor["BLACK"]
+
+    async def __play_draw_two__(self, card):
+        """
+        Makes the next player draw two cards and skips them.
+
+        Argument:
+        card(Card): The card played
+        """
+        self.__next_turn__()
+        count = 0
+        for i in range(2):
+            if self.__give_topdeck_to_player__(self.players[self.turn]):
+                count += 1
+            else:
+                break
+        announce_str = ""
+        pm_str = ""
+        if count == 0:
+            announce_str += ("**"
+                    + self.players[self.turn].name
+                    + "** tried to draw two cards, but the deck ran out of "
+                    + "cards.")
+            pm_str += ("You tried to draw two cards, but the deck ran out "
+                    + "of cards, so you could not draw any.")
+        elif count == 1:
+            announce_str += ("**"
+                    + self.players[self.turn].name
+                    + "** tried to draw two cards, but only one card was "
+                    + "drawn, since the deck ran out of cards.")
+            pm_str += ("You have drawn `"
+                    + str(self.players[self.turn].get_cards()[-1])
+                    + "`, but you could not draw any more cards because the"
+                    + " deck ran out of cards.")
+        else:
+            announce_str += ("**"
+                    + self.players[self.turn].name
+                    + "** drew two cards.")
+            pm_str += ("You have drawn `"
+                    + str(self.players[self.turn].get_cards()[-2])
+                    + "` and `"
+                    + str(self.players[self.turn].get_cards()[-1])
+                    + "`.")
+        announce_str += " Their turn is skipped."
+        pm_str += " Your turn is skipped."
+        await self.announce([self.players[self.turn]], announce_str)
+        await message_player(self.players[self.turn], pm_str)
+        self.players[self.turn].sort_cards()
+        self.__next_turn__()
+        self.wild_color = CardColor["BLACK"]
+
+    async def __stack_draw_two__(self, card):
+        """
+        Adds two cards to the penalty passed on to the next player.
+
+        Argument:
+        card(Card): The card played
+        """
+        self.draw_penalty += 2
+        self.penalty_type = CardType["DRAW_TWO"]
+        self.__next_turn__()
+        self.wild_color = CardColor["BLACK"]
+
+    async def __play_reverse__(self, card):
+        """
+        Reverses the order of play.
+
+        Argument:
+        card(Card): The card played
+        """
+        await self.announce([], "The order has been reversed.")
+        if self.clockwise:
+            self.clockwise = False
+        else:
+            self.clockwise = True
+        self.__next_turn__()
+        self.wild_color = CardColor["BLACK"]
+
+    async def __play_wild__(self, card):
+        """
+        Waits for the current player to choose a color.
+
+        Argument:
+        card(Card): The card played
+        """
+        await self.announce(
+                [self.players[self.turn]],
+                "Waiting for **"
+                + self.players[self.turn].name
+                + "** to choose a color...")
+        await message_player(
+                self.players[self.turn],
+                "Choose a color by typing `.r`(red), `.y`(yellow), "
+                + "`.g`(green), or `.b`(blue).")
+        self.is_playing_wild = True
+
+    async def __play_wild_draw_four__(self, card):
+        """
+        Determines whether the Wild Draw Four is legal, and waits for the
+        current player to choose a color.
+
+        Argument:
+        card(Card): The card played
+        """
+        self.is_legal_wd4 = True
+        for card_it in self.players[self.turn].get_cards():
+            if card_it.get_color() == CardColor["BLACK"]:
+                continue
+            elif card_it.get_color() == self.wild_color:
+                self.is_legal_wd4 = False
+                break
+            elif card_it.equals_color(self.discard[-2]):
+                self.is_legal_wd4 = False
+                break
+        self.wild_color = CardColor["BLACK"]
+        await self.announce(
+                [self.players[self.turn]],
+                "Waiting for **"
+                + self.players[self.turn].name
+                + "** to choose a color...")
+        await message_player(
+                self.players[self.turn],
+                "Choose a color by typing `.r`(red), `.y`(yellow), "
+                + "`.g`(green), or `.b`(blue).")
+        self.is_playing_wd4 = True
+
+    async def __play_number__(self, card):
+        """
+        Passes the turn to the next player.
+
+        Argument:
+        card(Card): The card played
+        """
+        self.__next_turn__()
+        self.wild_color = CardColor["BLACK"]
+
+    async def __play_seven__(self, card):
+        """
+        Waits for the current player to choose whom to swap hands with.
+
+        Argument:
+        card(Card): The card played
+        """
+        # Playing the last card wins the round instead
+        if not self.players[self.turn].get_cards():
+            await self.__play_number__(card)
+            return
+        self.wild_color = CardColor["BLACK"]
+        await self.announce(
+                [self.players[self.turn]],
+                "Waiting for **"
+                + self.players[self.turn].name
+                + "** to choose whom to swap hands with...")
+        pm_str = "Choose whom to swap hands with by typing `.swap <number>`:"
+        for i in range(1, len(self.players)):
+            player = self.players[self.__player_after__(i)]
+            pm_str += ("\n" + str(i) + ". " + player.name + " ("
+                    + str(len(player.get_cards())) + " cards)")
+        await message_player(self.players[self.turn], pm_str)
+        self.is_choosing_swap = True
+
+    async def __play_zero__(self, card):
+        """
+        Passes every hand on to the next player in the order of play.
+
+        Argument:
+        card(Card): The card played
+        """
+        # Playing the last card wins the round instead
+        if not self.players[self.turn].get_cards():
+            await self.__play_number__(card)
+            return
+        hands = []
+        for player in self.players:
+            hands.append(player.get_cards())
+        for i in range(len(self.players)):
+            if self.clockwise:
+                self.players[(i + 1) % len(self.players)].take_cards(hands[i])
+            else:
+                self.players[(i - 1) % len(self.players)].take_cards(hands[i])
+        await self.announce([], "Every hand is passed on to the next player.")
+        self.__next_turn__()
+        self.wild_color = CardColor["BLACK"]
+
     async def announce_if_first_discard_wild(self):
         """
         If the first discarded card is Wild card, announces so
@@ -612,16 +1369,17 @@ class Game:
         bool: True if the first discarded card is a Wild card, False otherwise
         """
         if self.is_wild_during_init:
-            await announce(
+            await self.announce(
                     [self.players[self.turn]],
                     "The first discarded card is a wild card. **"
-                    + self.players[self.turn].get_user().name
+                    + self.players[self.turn].name
                     + "** will choose a color.")
             await message_player(
                     self.players[self.turn],
                     "The first discarded card is a wild card. Choose a color by"
                     + " typing `.r`(red), `.y`(yellow), `.g`(green), or "
                     + "`.b`(blue).")
+            self.set_turn_timers()
             return True
         return False
     
@@ -634,21 +1392,86 @@ class Game:
         Return:
         bool: False if the game has ended this turn, True otherwise
         """
-        # Process only the command given by the current player
+        # Process only the command given by the current player, or a player
+        # jumping in
         if message.author != self.players[self.turn].get_user():
-            return True
-        content = message.content.lower()
-        command = content.split()[0]
-        # Choosing a color for Wild card (discarded prior to starting the game)
+            index = self.player_indices.get(message.author.id, -1)
+            if index == -1 or not self.__can_jump_in__(index, message.content):
+                return True
+            await self.announce(
+                    [],
+                    "**"
+                    + message.author.name
+                    + "** jumps in!")
+            self.turn = index
+            self.set_turn_timers()
+        return await self.__run_command__(message.content)
+
+    def __can_jump_in__(self, index, content):
+        """
+        Determines if a player may play a card out of turn, which needs the
+        card to be exactly like the last discard.
+
+        Arguments:
+        index  (int): Index of the player
+        content(str): Command given by the player
+
+        Return:
+        bool
+        """
+        if (not self.rule_set.jump_in or self.is_wild_during_init
+                or self.is_playing_wild or self.is_playing_wd4
+                or self.is_checking_challenge or self.is_drawing
+                or self.is_choosing_swap or self.draw_penalty):
+            return False
+        words = content.split(None, 1)
+        if len(words) != 2 or commands.resolve_command(words[0]) != ".p":
+            return False
+        cards = self.players[index].get_cards()
+        card_index = self.players[index].find_card(words[1])
+        if card_index is None or not 0 <= card_index < len(cards):
+            return False
+        return (self.discard[-1].get_color() != CardColor["BLACK"]
+                and cards[card_index].equals(self.discard[-1]))
+
+    async def __run_command__(self, content):
+        """Runs the game with the command of the current player.
+
+        Argument:
+        content(str): Command given by the current player
+
+        Return:
+        bool: False if the game has ended this turn, True otherwise
+        """
+        # Views rendered while the command is half applied are thrown away
+        self.version += 1
+        try:
+            return await self.__apply_command__(content)
+        finally:
+            self.version += 1
+            self.mark_hands_changed()
+
+    async def __apply_command__(self, content):
+        """Applies the command of the current player to the game.
+
+        Argument:
+        content(str): Command given by the current player
+
+        Return:
+        bool: False if the game has ended this turn, True otherwise
+        """
+        content = content.lower()
+        command = commands.resolve_command(content.split()[0])
+        # Choosing a color for Wild card (discarded prior to starting the game)
         if self.is_wild_during_init:
             if command not in [".r", ".y", ".g", ".b"]:
                 await message_player(self.players[self.turn], "Invalid input.")
                 return True
             color_index = [".r", ".y", ".g", ".b"].index(command)
             self.wild_color = CardColor(color_index + 1)
-            await announce([self.players[self.turn]],
+            await self.announce([self.players[self.turn]],
                     "**"
-                    + self.players[self.turn].get_user().name
+                    + self.players[self.turn].name
                     + "** has called `"
                     + self.wild_color.name
                     + "` as the wild color.")
@@ -661,9 +1484,9 @@ class Game:
                 return True
             color_index = [".r", ".y", ".g", ".b"].index(command)
             self.wild_color = CardColor(color_index + 1)
-            await announce([self.players[self.turn]],
+            await self.announce([self.players[self.turn]],
                     "**"
-                    + self.players[self.turn].get_user().name
+                    + self.players[self.turn].name
                     + "** has called "
                     + self.wild_color.name
                     + " as the wild color.")
@@ -680,28 +1503,36 @@ class Game:
                 return True
             color_index = [".r", ".y", ".g", ".b"].index(command)
             self.wild_color = CardColor(color_index + 1)
-            await announce([self.players[self.turn]],
+            await self.announce([self.players[self.turn]],
                     "**"
-                    + self.players[self.turn].get_user().name
+                    + self.players[self.turn].name
                     + "** has called `"
                     + self.wild_color.name
                     + "` as the wild color.")
-            self.wd4_player_index = self.turn
-            self.__next_turn__()
-            await announce([self.players[self.turn]],
-                    "**"
-                    + self.players[self.turn].get_user().name
-                    + "** may challenge this Wild Draw Four. Waiting for their "
-                    + "response...")
-            await message_player(self.players[self.turn],
-                    "You are about to draw four cards and be skipped. The Wild "
-                    + "Draw Four is legal if and only if the player has no "
-                    + "card that can be played. Will you challenge **"
-                    + self.players[self.wd4_player_index].get_user().name
-                    + "**'s Wild Draw Four? Answer by `.y`(yes) or "
-                    + "`.n`(no).")
             self.is_playing_wd4 = False
-            self.is_checking_challenge = True
+            return await self.after_wd4_color()
+        # Choosing whom to swap hands with after playing a 7
+        elif self.is_choosing_swap:
+            words = content.split()
+            if (command != ".swap" or len(words) < 2
+                    or not words[1].isdigit()
+                    or not 1 <= int(words[1]) < len(self.players)):
+                await message_player(self.players[self.turn], "Invalid input.")
+                return True
+            other = self.players[self.__player_after__(int(words[1]))]
+            cards = self.players[self.turn].get_cards()
+            self.players[self.turn].take_cards(other.get_cards())
+            other.take_cards(cards)
+            await self.announce(
+                    [],
+                    "**"
+                    + self.players[self.turn].name
+                    + "** has swapped hands with **"
+                    + other.name
+                    + "**.")
+            self.is_choosing_swap = False
+            self.__next_turn__()
+            await self.announce_turn()
         # Waiting for reply regarding whether to challenge the WD4
         elif self.is_checking_challenge:
             if command not in [".y", ".n"]:
@@ -709,30 +1540,30 @@ class Game:
                 return True
             # If challenged
             if command == ".y":
-                await announce(
+                await self.announce(
                         [self.players[self.turn],
                                 self.players[self.wd4_player_index]],
                         "**"
-                        + self.players[self.turn].get_user().name
+                        + self.players[self.turn].name
                         + "** has challenged **"
-                        + self.players[self.wd4_player_index].get_user().name
+                        + self.players[self.wd4_player_index].name
                         + "**'s Wild Draw Four.")
                 await message_player(self.players[self.wd4_player_index],
                         "Your Wild Draw Four card has been challenged by **"
-                        + self.players[self.turn].get_user().name
+                        + self.players[self.turn].name
                         + "**. They will be shown your hand to prove whether "
                         + "your play was legal or not.")
                 await message_player(self.players[self.turn],
                         "**"
-                        + self.players[self.wd4_player_index].get_user().name
+                        + self.players[self.wd4_player_index].name
                         + "**'s hand is:"
                         + self.players[self.wd4_player_index].get_hand())
                 # If challenge is not successful
                 if self.is_legal_wd4:
-                    await announce([], "The Wild Draw Four was legal.")
-                    await announce([self.players[self.turn]],
+                    await self.announce([], "The Wild Draw Four was legal.")
+                    await self.announce([self.players[self.turn]],
                             "**"
-                            + self.players[self.turn].get_user().name
+                            + self.players[self.turn].name
                             + "** draws six cards.")
                     pm_str = ("You have drawn the following six cards:```\n")
                     for i in range(6):
@@ -746,11 +1577,11 @@ class Game:
                     self.players[self.turn].sort_cards()
                 # If challenge is successful
                 else:
-                    await announce([], "The Wild Draw Four was illegal.")
-                    await announce([self.players[self.wd4_player_index]],
+                    await self.announce([], "The Wild Draw Four was illegal.")
+                    await self.announce([self.players[self.wd4_player_index]],
                             "**"
                             + self.players[
-                                self.wd4_player_index].get_user().name
+                                self.wd4_player_index].name
                             + "** draws four cards.")
                     pm_str = ("You have drawn the following four cards:```\n")
                     for i in range(4):
@@ -768,9 +1599,9 @@ class Game:
                     self.winner_index = -1
             # If not challenged
             else:
-                await announce([self.players[self.turn]],
+                await self.announce([self.players[self.turn]],
                         "**"
-                        + self.players[self.turn].get_user().name
+                        + self.players[self.turn].name
                         + "** draws four cards.")
                 pm_str = ("You have drawn the following four cards:```\n")
                 for i in range(4):
@@ -782,9 +1613,9 @@ class Game:
                 pm_str += "```"
                 await message_player(self.players[self.turn], pm_str)
                 self.players[self.turn].sort_cards()
-            await announce([self.players[self.turn]],
+            await self.announce([self.players[self.turn]],
                     "**"
-                    + self.players[self.turn].get_user().name
+                    + self.players[self.turn].name
                     + "** is skipped.")
             await message_player(
                     self.players[self.turn],
@@ -798,17 +1629,18 @@ class Game:
             await self.announce_turn()
         # The current player chose to draw
         elif self.is_drawing:
-            if command not in [".k", ".keep", ".p", ".play"]:
+            if command not in [".k", ".p"]:
                 await message_player(self.players[self.turn], "Invalid input.")
                 return True
             new_card = self.players[self.turn].get_cards()[-1]
             # Only play the card if the card can be played
-            if command in [".p", ".play"]:
+            if command == ".p":
                 if self.__can_be_played__(new_card):
                     self.is_drawing = False
                     await self.__play_card__(-1)
                     if (not self.is_playing_wild
-                            and not self.is_playing_wd4):
+                            and not self.is_playing_wd4
+                            and not self.is_choosing_swap):
                         if self.winner_index != -1:
                             return False
                         await self.announce_turn()
@@ -818,10 +1650,10 @@ class Game:
                         "This card cannot be played. You have no choice "
                         + "but to keep this card.")
             # Keep the card
-            await announce(
+            await self.announce(
                     [self.players[self.turn]],
                     "**"
-                    + self.players[self.turn].get_user().name
+                    + self.players[self.turn].name
                     + "** is keeping the drawn card.")
             self.players[self.turn].sort_cards()
             self.__next_turn__()
@@ -830,33 +1662,33 @@ class Game:
         # Normal state
         else:
             if ((not content.strip())
-                    or (command not in [".p", ".play", ".d", ".draw"])):
+                    or (command not in [".p", ".d"])):
                 await message_player(self.players[self.turn], "Invalid input.")
                 return True
             # Choosing a card to play
-            elif command in [".p", ".play"]:
-                if len(content.split()) < 2:
-                    await message_player(
-                            self.players[self.turn],
-                            "Invalid input.")
-                    return True
-                try:
-                    index = int(eval(content.split()[1])) - 1
-                except:
+            elif command == ".p":
+                words = content.split(None, 1)
+                index = None
+                if len(words) == 2:
+                    index = self.players[self.turn].find_card(words[1])
+                if index is None:
                     await message_player(
                             self.players[self.turn],
                             "Invalid input.")
                     return True
                 if (index < 0 
                         or index >= len(self.players[self.turn].get_cards())):
-                    await message_player(
-                            self.players[self.turn], 
-                           "Index out of range.")
+                    if words[1].isdigit():
+                        error = "Index out of range."
+                    else:
+                        error = "You do not have this card."
+                    await message_player(self.players[self.turn], error)
                     return True
                 player_card = self.players[self.turn].get_cards()[index]
                 if self.__can_be_played__(player_card):
                     await self.__play_card__(index)
-                    if (not self.is_playing_wild and not self.is_playing_wd4):
+                    if (not self.is_playing_wild and not self.is_playing_wd4
+                            and not self.is_choosing_swap):
                         if self.winner_index != -1:
                             return False
                         await self.announce_turn()
@@ -865,64 +1697,932 @@ class Game:
                             self.players[self.turn],
                             "This card cannot be played.")
             # Case of drawing a card
+            elif self.draw_penalty:
+                await self.__take_penalty__()
+                await self.announce_turn()
             else:
-                if not self.__give_topdeck_to_player__(
-                        self.players[self.turn]):
-                    await announce(
-                            [self.players[self.turn]],
-                            "**"
-                            + self.players[self.turn].get_user().name
-                            + "** has tried to draw a card, but the deck has "
-                            + "run out of cards.")
-                    await message_player(
-                            self.players[self.turn],
-                            "You tried to draw a card, but the deck has run out"
-                            " of cards.")
-                    self.__next_turn__()
-                    await self.announce_turn()
-                    return True
-                new_card = self.players[self.turn].get_cards()[-1]
-                await announce(
-                        [self.players[self.turn]],
-                        "**"
-                        + self.players[self.turn].get_user().name
-                        + "** has drawn a card. Waiting for their next "
-                        + "action...")
-                await message_player(
-                        self.players[self.turn],
-                        "You have drawn `"
-                        + str(new_card)
-                        + "`. Type `.k(eep)` or `.p(lay)`.")
-                self.is_drawing = True
+                await self.draw_for_turn()
+        return True
+
+    async def __offer_challenge__(self):
+        """
+        Lets the next player challenge the Wild Draw Four.
+
+        Return:
+        bool: True, as the game goes on until the challenge is answered
+        """
+        self.wd4_player_index = self.turn
+        self.__next_turn__()
+        await self.announce([self.players[self.turn]],
+                "**"
+                + self.players[self.turn].name
+                + "** may challenge this Wild Draw Four. Waiting for their "
+                + "response...")
+        await message_player(self.players[self.turn],
+                "You are about to draw four cards and be skipped. The Wild "
+                + "Draw Four is legal if and only if the player has no "
+                + "card that can be played. Will you challenge **"
+                + self.players[self.wd4_player_index].name
+                + "**'s Wild Draw Four? Answer by `.y`(yes) or "
+                + "`.n`(no).")
+        self.is_checking_challenge = True
+        self.set_turn_timers()
+        return True
+
+    async def __stack_wild_draw_four__(self):
+        """
+        Adds four cards to the penalty passed on to the next player.
+
+        Return:
+        bool: False if the Wild Draw Four was the last card, True otherwise
+        """
+        if self.winner_index != -1:
+            return False
+        self.draw_penalty += 4
+        self.penalty_type = CardType["WILD_DRAW_FOUR"]
+        self.__next_turn__()
+        await self.announce_turn()
         return True
 
+    async def __take_penalty__(self):
+        """Makes the current player draw the stacked cards and skips them."""
+        player = self.players[self.turn]
+        count = 0
+        for i in range(self.draw_penalty):
+            if not self.__give_topdeck_to_player__(player):
+                break
+            count += 1
+        await self.announce(
+                [player],
+                "**"
+                + player.name
+                + "** draws "
+                + str(count)
+                + " cards and is skipped.")
+        pm_str = "You have drawn the following cards:```\n"
+        for card in player.get_cards()[len(player.get_cards()) - count:]:
+            pm_str += str(card) + "\n"
+        pm_str += "```Your turn is skipped."
+        await message_player(player, pm_str)
+        player.sort_cards()
+        self.draw_penalty = 0
+        self.penalty_type = None
+        self.__next_turn__()
+
+    async def __announce_empty_deck__(self):
+        """Passes the turn of the current player, who cannot draw a card."""
+        await self.announce(
+                [self.players[self.turn]],
+                "**"
+                + self.players[self.turn].name
+                + "** has tried to draw a card, but the deck has "
+                + "run out of cards.")
+        await message_player(
+                self.players[self.turn],
+                "You tried to draw a card, but the deck has run out"
+                " of cards.")
+        self.__next_turn__()
+        await self.announce_turn()
+
+    async def __draw_one__(self):
+        """Draws a card for the current player."""
+        if not self.__give_topdeck_to_player__(self.players[self.turn]):
+            await self.__announce_empty_deck__()
+            return
+        new_card = self.players[self.turn].get_cards()[-1]
+        await self.announce(
+                [self.players[self.turn]],
+                "**"
+                + self.players[self.turn].name
+                + "** has drawn a card. Waiting for their next "
+                + "action...")
+        await message_player(
+                self.players[self.turn],
+                "You have drawn `"
+                + str(new_card)
+                + "`. Type `.k(eep)` or `.p(lay)`.")
+        self.is_drawing = True
+
+    async def __draw_until_playable__(self):
+        """
+        Draws cards for the current player until one can be played or the deck
+        runs out.
+        """
+        player = self.players[self.turn]
+        drawn = []
+        while not drawn or not self.__can_be_played__(drawn[-1]):
+            if not self.__give_topdeck_to_player__(player):
+                break
+            drawn.append(player.get_cards()[-1])
+        if not drawn:
+            await self.__announce_empty_deck__()
+            return
+        pm_str = "You have drawn `" + "`, `".join(map(str, drawn)) + "`."
+        if not self.__can_be_played__(drawn[-1]):
+            await self.announce(
+                    [player],
+                    "**"
+                    + player.name
+                    + "** has drawn "
+                    + str(len(drawn))
+                    + " cards without finding one to play before the deck "
+                    + "ran out.")
+            await message_player(
+                    player,
+                    pm_str + " None of them can be played, and the deck has "
+                    + "run out of cards.")
+            player.sort_cards()
+            self.__next_turn__()
+            await self.announce_turn()
+            return
+        await self.announce(
+                [player],
+                "**"
+                + player.name
+                + "** has drawn "
+                + str(len(drawn))
+                + " card"
+                + ("s" if len(drawn) != 1 else "")
+                + ". Waiting for their next action...")
+        await message_player(
+                player,
+                pm_str + " Type `.k(eep)` or `.p(lay)` for `"
+                + str(drawn[-1])
+                + "`.")
+        self.is_drawing = True
+
     async def announce_turn(self):
         """Announces whose turn it is currently"""
-        announce_str = (
-                "It is now **"
-                + self.players[self.turn].get_user().name
-                + "**'s turn, with last discarded card being `"
-                + str(self.discard[-1])
-                + "`.")
+        wild_str = ""
         if self.wild_color != CardColor["BLACK"]:
-            announce_str += (
-                    " The color for Wild card is **"
+            wild_str = (" The color for Wild card is **"
                     + self.wild_color.name
                     + "**.")
-        await announce([self.players[self.turn]], announce_str)
-        pm_str = (
-                "It is now ***your*** turn. You have the following cards:"
-                + self.players[self.turn].get_hand()
-                + "\nThe last discarded card is `"
+        await self.announce(
+                [self.players[self.turn]],
+                "It is now **"
+                + self.players[self.turn].name
+                + "**'s turn, with last discarded card being `"
+                + str(self.discard[-1])
+                + "`."
+                + wild_str)
+        # The current player sees their hand right away, the others with the
+        # next batch of edits
+        await self.update_hand(self.players[self.turn])
+        self.mark_hands_changed()
+        pm_str = ("It is now ***your*** turn. Your cards are in the pinned "
+                + "message.\nThe last discarded card is `"
                 + str(self.discard[-1])
                 + "`.\n Choose a card to play (`.p <card index>`) or draw a "
-                + "card (`.d`).")
+                + "card (`.d`)."
+                + wild_str)
+        if self.draw_penalty:
+            pm_str += ("\nYou must stack a card of the same type or draw **"
+                    + str(self.draw_penalty)
+                    + "** cards (`.d`).")
+        if self.players[self.turn].wants_images:
+            await self.send_hand_image(self.players[self.turn], pm_str)
+        else:
+            await message_player(self.players[self.turn], pm_str)
+        self.set_turn_timers()
+
+    async def __open_uno_window__(self, index):
+        """
+        Lets the player left with one card call UNO, and the others catch
+        them, until the first claim or the end of the window. Computer
+        players call UNO right away.
+
+        Argument:
+        index(int): Index of the player left with one card
+        """
+        self.close_uno_window(self.uno_serial)
+        player = self.players[index]
+        if player.strategy is not None:
+            metrics.inc("uno_calls_total", 'outcome="called"')
+            await self.announce([], "**" + player.name + "** calls UNO!")
+            return
+        self.uno_serial += 1
+        self.uno_player = index
+        if self.use_timers:
+            self.uno_timer = scheduler.call_later(
+                    UNO_WINDOW,
+                    self.submit,
+                    self.expire_uno_window,
+                    self.uno_serial)
+        await self.announce(
+                [player],
+                "**"
+                + player.name
+                + "** has one card left! Type `.catch` before they call "
+                + "UNO.")
+        await message_player(
+                player,
+                "You have one card left! Type `.uno!` before someone "
+                + "catches you.")
+
+    async def claim_uno(self, index, command, arrived):
+        """
+        Records a call of UNO or a catch. The claims arriving before the
+        first one is resolved are resolved together, in order of arrival.
+
+        Arguments:
+        index  (int)  : Index of the claiming player
+        command(str)  : ".uno!" or ".catch"
+        arrived(float): Monotonic time the claim arrived at
+        """
+        player = self.players[index]
+        if self.uno_player == -1:
+            await message_player(player, "Nobody has to call UNO right now.")
+            return
+        if (command == ".uno!") != (index == self.uno_player):
+            if command == ".uno!":
+                error = "Only the player with one card left can call UNO."
+            else:
+                error = "You cannot catch yourself. Type `.uno!` instead."
+            await message_player(player, error)
+            return
+        self.uno_claims.append((arrived, next(claim_sequence), index, command))
+        # Resolved after the inputs already queued, so that claims arriving
+        # in the same loop tick compete by their arrival time
+        if len(self.uno_claims) == 1:
+            self.submit(self.resolve_uno_claims, self.uno_serial)
+
+    async def resolve_uno_claims(self, serial):
+        """
+        Applies the earliest claim of the UNO window: the player is safe if
+        they called UNO first, or draws cards if they were caught first.
+
+        Argument:
+        serial(int): Serial of the UNO window the claims were made in
+        """
+        if serial != self.uno_serial or not self.uno_claims:
+            return
+        arrived, sequence, index, command = min(self.uno_claims)
+        player = self.players[self.uno_player]
+        self.close_uno_window(serial)
+        # The hand has changed since, e.g. with a draw, so nothing is at stake
+        if len(player.get_cards()) != 1:
+            return
+        if command == ".uno!":
+            metrics.inc("uno_calls_total", 'outcome="called"')
+            await self.announce([], "**" + player.name + "** calls UNO!")
+            return
+        metrics.inc("uno_calls_total", 'outcome="caught"')
+        count = 0
+        for i in range(UNO_PENALTY):
+            if not self.__give_topdeck_to_player__(player):
+                break
+            count += 1
+        self.version += 1
+        await self.announce(
+                [player],
+                "**"
+                + self.players[index].name
+                + "** catches **"
+                + player.name
+                + "**, who draws "
+                + str(count)
+                + " cards for not calling UNO.")
+        pm_str = ("**"
+                + self.players[index].name
+                + "** has caught you before you called UNO. You have drawn "
+                + "the following cards:```\n")
+        for card in player.get_cards()[len(player.get_cards()) - count:]:
+            pm_str += str(card) + "\n"
+        pm_str += "```"
+        await message_player(player, pm_str)
+        player.sort_cards()
+        self.mark_hands_changed()
+
+    async def expire_uno_window(self, serial):
+        """
+        Closes the UNO window at its end, as an input of the queue.
+
+        Argument:
+        serial(int): Serial of the UNO window to close
+        """
+        self.close_uno_window(serial)
+
+    def close_uno_window(self, serial):
+        """
+        Closes the UNO window, after which the player left with one card is
+        safe.
+
+        Argument:
+        serial(int): Serial of the UNO window to close
+        """
+        if serial != self.uno_serial:
+            return
+        if self.uno_player != -1 and not self.uno_claims:
+            metrics.inc("uno_calls_total", 'outcome="unclaimed"')
+        if self.uno_timer is not None:
+            self.uno_timer.cancel()
+            self.uno_timer = None
+        self.uno_player = -1
+        self.uno_claims = []
+
+    def set_turn_timers(self):
+        """
+        Restarts the reminder and the timeout for the current player, or lets
+        the current player act if they are a computer player.
+        """
+        self.cancel_turn_timers()
+        if not self.use_timers:
+            return
+        if self.players[self.turn].strategy is not None:
+            self.turn_timers = [
+                    scheduler.call_later(
+                            BOT_DELAY,
+                            self.submit,
+                            self.play_bot_turn,
+                            self.turn_serial)]
+            return
+        self.turn_timers = [
+                scheduler.call_later(
+                        TURN_REMINDER,
+                        self.submit,
+                        self.remind_turn,
+                        self.turn_serial),
+                scheduler.call_later(
+                        TURN_TIMEOUT,
+                        self.submit,
+                        self.timeout_turn,
+                        self.turn_serial)]
+
+    def cancel_turn_timers(self):
+        """Cancels the reminder and the timeout of the current turn."""
+        for timer in self.turn_timers:
+            timer.cancel()
+        self.turn_timers = []
+        self.turn_serial += 1
+
+    async def remind_turn(self, serial):
+        """
+        Reminds the current player that the game is waiting for them
+
+        Argument:
+        serial(int): Serial of the turn timers when the reminder was set
+        """
+        if serial != self.turn_serial:
+            return
+        await message_player(
+                self.players[self.turn],
+                "The game is still waiting for you. If you do not respond "
+                + "within "
+                + str(TURN_TIMEOUT - TURN_REMINDER)
+                + " seconds, your turn will be passed.")
+
+    async def timeout_turn(self, serial):
+        """
+        Acts for the current player who has not responded in time. A card is
+        drawn and kept, and the turn is passed. Pending choices are made with
+        the default answer.
+
+        Argument:
+        serial(int): Serial of the turn timers when the timeout was set
+        """
+        if serial != self.turn_serial:
+            return
+        self.cancel_turn_timers()
+        player = self.players[self.turn]
+        await self.announce(
+                [player],
+                "**"
+                + player.name
+                + "** did not respond in time.")
+        await message_player(
+                player,
+                "You did not respond in time, so the game has acted for you.")
+        if (self.is_wild_during_init or self.is_playing_wild
+                or self.is_playing_wd4):
+            pending = [self.__default_color_command__(player)]
+        elif self.is_checking_challenge:
+            pending = [".n"]
+        elif self.is_choosing_swap:
+            pending = [self.__default_swap_command__()]
+        elif self.is_drawing:
+            pending = [".k"]
+        else:
+            pending = [".d", ".k"]
+        for command in pending:
+            if not await self.__run_command__(command):
+                await end_round(self)
+                return
+            # Drawing from an empty deck passes the turn right away
+            if not self.is_drawing:
+                break
+
+    async def play_bot_turn(self, serial):
+        """
+        Makes the decisions of the computer player in the current turn.
+
+        Argument:
+        serial(int): Serial of the turn timers when the turn was announced
+        """
+        if serial != self.turn_serial:
+            return
+        self.cancel_turn_timers()
+        serial = self.turn_serial
+        player = self.players[self.turn]
+        # A turn takes at most a play, a color and a choice to keep
+        for _ in range(3):
+            command = await decide(player.strategy, self.get_view())
+            # The game has moved on or stopped while deciding
+            if serial != self.turn_serial:
+                return
+            if not await self.__run_command__(command):
+                await end_round(self)
+                return
+            # The next turn has been announced
+            if serial != self.turn_serial:
+                return
+        # The strategy keeps giving invalid commands
+        await self.timeout_turn(self.turn_serial)
+
+    def get_view(self):
+        """
+        Returns what the current player can see for their pending decision.
+
+        Return:
+        GameView
+        """
+        player = self.players[self.turn]
+        cards = player.get_cards()
+        legal = []
+        if (self.is_wild_during_init or self.is_playing_wild
+                or self.is_playing_wd4):
+            decision = "color"
+        elif self.is_checking_challenge:
+            decision = "challenge"
+        elif self.is_choosing_swap:
+            decision = "swap"
+        elif self.is_drawing:
+            decision = "keep"
+            if self.__can_be_played__(cards[-1]):
+                legal.append(len(cards) - 1)
+        else:
+            decision = "play"
+            for i in range(len(cards)):
+                if self.__can_be_played__(cards[i]):
+                    legal.append(i)
+        hand_sizes = []
+        for i in range(len(self.players)):
+            if self.clockwise:
+                index = (self.turn + i) % len(self.players)
+            else:
+                index = (self.turn - i) % len(self.players)
+            hand_sizes.append(len(self.players[index].get_cards()))
+        return GameView(
+                decision,
+                list(cards),
+                legal,
+                self.discard[-1],
+                self.wild_color,
+                hand_sizes,
+                list(self.discard),
+                BOT_LATENCY_BUDGET / 2)
+
+    def __default_swap_command__(self):
+        """
+        Returns the command swapping hands with the player with the fewest
+        cards.
+
+        Return:
+        str
+        """
+        best = 1
+        for i in range(2, len(self.players)):
+            if (len(self.players[self.__player_after__(i)].get_cards())
+                    < len(self.players[self.__player_after__(best)]
+                            .get_cards())):
+                best = i
+        return ".swap " + str(best)
+
+    def __default_color_command__(self, player):
+        """
+        Returns the command for the color the player has the most cards of.
+
+        Argument:
+        player(Player)
+
+        Return:
+        str
+        """
+        counts = [0, 0, 0, 0]
+        for card in player.get_cards():
+            if card.get_color() != CardColor["BLACK"]:
+                counts[card.get_color().value - 1] += 1
+        return [".r", ".y", ".g", ".b"][counts.index(max(counts))]
+
+    async def announce(self, except_players, content):
+        """
+        Sends a message to the channel and players except for specified players
+
+        Arguments:
+        except_players(list of Player): Players to not send messages to
+        content       (str)           : The content of the message
+        """
+        # Sent at once, so that large tables do not wait on each message in
+        # turn
+        sends = []
+        for player in self.players:
+            if player in except_players or player.strategy is not None:
+                continue
+            sends.append(send_private(player.user, content))
+        if self.announce_to_channel:
+            sends.append(send_split(self.channel, content))
+        await asyncio.gather(*sends)
+        self.mark_changed()
+
+    def submit(self, callback, *args):
+        """
+        Queues 'callback(*args)' to be applied after the pending inputs.
+
+        Arguments:
+        callback(coroutine function)
+        args
+        """
+        self.queue.put_nowait((callback, args))
+        metrics.inc("uno_queue_submitted_total")
+
+    async def run_queue(self):
+        """Applies the queued inputs one at a time until the game ends."""
+        while not self.is_over:
+            callback, args = await self.queue.get()
+            try:
+                if not self.is_over:
+                    await callback(*args)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self.queue.task_done()
+        # Inputs left behind will never be applied, so nobody should wait on
+        # them
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+
+    def export_state(self):
+        """
+        Returns the state of the game, to be passed on to a reloaded module,
+        with its timers and pending inputs. The game must be paused, and is
+        left as it is until retired, so that it can go on if the reload
+        fails.
+
+        Return:
+        dict
+        """
+        state = {
+                "players": [player.export_state() for player in self.players],
+                "channel": self.channel,
+                "target_score": self.target_score,
+                "house_rules": sorted(self.rule_set.options),
+                "deck": export_cards(self.deck),
+                "discard": export_cards(self.discard),
+                "wild_color": self.wild_color.name,
+                "penalty_type": None}
+        if self.penalty_type is not None:
+            state["penalty_type"] = self.penalty_type.name
+        for name in GAME_STATE_ATTRIBUTES:
+            state[name] = getattr(self, name)
+        # Timers and inputs hold methods of this game, so they are passed on
+        # by name
+        now = asyncio.get_event_loop().time()
+        for name in ["spectate_timer", "hand_timer", "uno_timer"]:
+            timer = getattr(self, name)
+            state[name] = None
+            if timer is not None and not timer.cancelled:
+                state[name] = (max(0, timer.when - now),
+                        self.__export_input__(timer.args[0], timer.args[1:]))
+        state["turn_timers"] = []
+        for timer in self.turn_timers:
+            if not timer.cancelled:
+                state["turn_timers"].append((max(0, timer.when - now),
+                        self.__export_input__(timer.args[0], timer.args[1:])))
+        # The inputs are put back in the same order
+        inputs = []
+        while not self.queue.empty():
+            inputs.append(self.queue.get_nowait())
+            self.queue.task_done()
+        state["inputs"] = []
+        for callback, args in inputs:
+            self.queue.put_nowait((callback, args))
+            state["inputs"].append(self.__export_input__(callback, args))
+        return state
+
+    def retire(self):
+        """
+        Stops the game for good once a game of a reloaded module has taken on
+        its state: its timers are cancelled, and its pending inputs dropped.
+        """
+        for name in ["spectate_timer", "hand_timer", "uno_timer"]:
+            if getattr(self, name) is not None:
+                getattr(self, name).cancel()
+        for timer in self.turn_timers:
+            timer.cancel()
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+        self.is_over = True
+
+    def import_state(self, state):
+        """
+        Takes on the state exported by a game of the previous module, and
+        restarts its timers and pending inputs. The players have taken on
+        their states already.
+
+        Argument:
+        state(dict)
+        """
+        self.deck = import_cards(state["deck"])
+        self.discard = import_cards(state["discard"])
+        self.wild_color = CardColor[state["wild_color"]]
+        self.penalty_type = None
+        if state["penalty_type"] is not None:
+            self.penalty_type = CardType[state["penalty_type"]]
+        for name in GAME_STATE_ATTRIBUTES:
+            if name in state:
+                setattr(self, name, state[name])
+        for name in ["spectate_timer", "hand_timer", "uno_timer"]:
+            if state.get(name) is not None:
+                delay, item = state[name]
+                callback, args = self.__import_input__(item)
+                setattr(self, name, scheduler.call_later(
+                        delay, self.submit, callback, *args))
+        for delay, item in state["turn_timers"]:
+            callback, args = self.__import_input__(item)
+            self.turn_timers.append(scheduler.call_later(
+                    delay, self.submit, callback, *args))
+        for item in state["inputs"]:
+            self.queue.put_nowait(self.__import_input__(item))
+
+    def __export_input__(self, callback, args):
+        """
+        Returns an input of the queue without references to this game.
+
+        Arguments:
+        callback(coroutine function)
+        args    (tuple)
+
+        Return:
+        tuple: "method" and the name of a method of the game, "function" and
+               the name of a function of this module taking the game first, or
+               "call" and the callback itself, then the other arguments
+        """
+        if getattr(callback, "__self__", None) is self:
+            return ("method", callback.__name__, args)
+        if args and args[0] is self:
+            return ("function", callback.__name__, args[1:])
+        return ("call", callback, args)
+
+    def __import_input__(self, item):
+        """
+        Returns an input exported by __export_input__ for this game.
+
+        Argument:
+        item(tuple)
+
+        Return:
+        tuple: Callback and arguments
+        """
+        kind, callback, args = item
+        if kind == "method":
+            return getattr(self, callback), args
+        if kind == "function":
+            return globals()[callback], (self,) + tuple(args)
+        return callback, args
+
+    def mark_changed(self):
+        """
+        Schedules an update of the spectators' status, unless one is already
+        pending, so that changes within the interval share a single edit.
+        """
+        if self.spectators and self.spectate_timer is None:
+            self.spectate_timer = scheduler.call_later(
+                    SPECTATE_INTERVAL,
+                    self.submit,
+                    self.update_spectators)
+
+    def get_status(self):
+        """
+        Returns the status of the game shown to the spectators.
+
+        Return:
+        str
+        """
+        if self.is_over:
+            return "The game is over."
+        content = "Last discarded card: `" + str(self.discard[-1]) + "`"
         if self.wild_color != CardColor["BLACK"]:
-            pm_str += (
-                    " The color for Wild card is **"
-                    + self.wild_color.name
-                    + "**.")
-        await message_player(self.players[self.turn], pm_str)
+            content += " (color: **" + self.wild_color.name + "**)"
+        content += "\nTurn: **" + self.players[self.turn].name
+        content += "**\n```\n"
+        if self.clockwise:
+            content += "Left to right\n"
+        else:
+            content += "Right to left\n"
+        if len(self.players) > LISTED_PLAYERS:
+            return content + self.__summarize_players__() + "```"
+        for player in self.players:
+            content += (player.name
+                    + " ("
+                    + str(len(player.get_cards()))
+                    + " cards)\n")
+        content += "```"
+        return content
+
+    def __summarize_players__(self):
+        """
+        Returns the players of a large table in a few lines: the number of
+        players, the next players to play and the players closest to winning.
+
+        Return:
+        str
+        """
+        def describe(index):
+            return (self.players[index].name
+                    + " ("
+                    + str(len(self.players[index].get_cards()))
+                    + ")")
+        upcoming = [describe(self.__player_after__(i))
+                for i in range(1, SUMMARY_PLAYERS + 1)]
+        leaders = heapq.nsmallest(
+                SUMMARY_PLAYERS,
+                range(len(self.players)),
+                key=lambda i: len(self.players[i].get_cards()))
+        return (str(len(self.players))
+                + " players, cards in parentheses\nNow: "
+                + describe(self.turn)
+                + "\nNext: "
+                + ", ".join(upcoming)
+                + "\nFewest cards: "
+                + ", ".join(describe(i) for i in leaders)
+                + "\n")
+
+    def mark_hands_changed(self):
+        """
+        Schedules an update of the hand messages, unless one is already
+        pending, so that the changes of a turn share a single edit.
+        """
+        if self.use_timers and self.hand_timer is None:
+            self.hand_timer = scheduler.call_later(
+                    HAND_EDIT_DELAY,
+                    self.submit,
+                    self.update_hands)
+
+    async def update_hands(self):
+        """Edits the hand message of every player whose hand has changed."""
+        self.hand_timer = None
+        await asyncio.gather(
+                *[self.update_hand(player) for player in self.players])
+
+    async def update_hand(self, player):
+        """
+        Edits the hand message of the player if their hand has changed, or
+        sends and pins it the first time.
+
+        Argument:
+        player(Player)
+        """
+        if (player.strategy is not None
+                or player.shown_version == player.hand_version):
+            return
+        player.shown_version = player.hand_version
+        content = "Your cards are:" + player.get_hand()
+        if content == player.shown_hand:
+            return
+        player.shown_hand = content
+        # A hand too long for one message keeps its start in the pinned
+        # message, and the rest follows in new messages
+        chunks = messages.split(content)
+        if player.hand_message is not None:
+            try:
+                player.hand_message = await client.edit_message(
+                        player.hand_message,
+                        chunks[0])
+                metrics.inc("uno_hand_messages_total", 'action="edited"')
+                for chunk in chunks[1:]:
+                    await send_private(player.user, chunk)
+                return
+            except discord.HTTPException:
+                # The player has deleted the message, so send a new one
+                player.hand_message = None
+        player.hand_message = await send_private(player.user, content)
+        metrics.inc("uno_hand_messages_total", 'action="sent"')
+        try:
+            await client.pin_message(player.hand_message)
+        except discord.HTTPException:
+            pass
+
+    async def update_spectators(self):
+        """
+        Takes the status of the game for the spectators. It is sent outside
+        of the queue of the game, so that the inputs do not wait on the edits.
+        """
+        self.spectate_timer = None
+        self.spectator_status = self.__cached_view__(
+                "status", -1, self.get_status)
+        if self.spectator_edits is None or self.spectator_edits.done():
+            self.spectator_edits = asyncio.ensure_future(
+                    self.__edit_spectators__())
+
+    async def __edit_spectators__(self):
+        """
+        Sends the latest status to every spectator whose status is old, all at
+        once, until no newer status has been taken meanwhile. Failed edits are
+        tried again after the interval.
+        """
+        content = None
+        while content != self.spectator_status:
+            content = self.spectator_status
+            outdated = [spectator for spectator in self.spectators.values()
+                    if spectator[2] != content]
+            results = await asyncio.gather(
+                    *[self.__send_status__(spectator, content)
+                            for spectator in outdated],
+                    return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    traceback.print_exception(
+                            type(result), result, result.__traceback__)
+            if any(result is not True for result in results):
+                self.mark_changed()
+
+    async def __send_status__(self, spectator, content):
+        """
+        Sends the status to a spectator, by editing their status message.
+
+        Arguments:
+        spectator(list): [user, status message or None, last status sent]
+        content  (str)
+
+        Return:
+        bool: Whether the status was sent
+        """
+        try:
+            if spectator[1] is None:
+                spectator[1] = await send_private(spectator[0], content)
+            else:
+                spectator[1] = await client.edit_message(spectator[1], content)
+        except discord.NotFound:
+            # The status message was deleted, so a new one is sent next time
+            spectator[1] = None
+            return False
+        except discord.Forbidden:
+            # The spectator does not accept messages anymore
+            self.spectators.pop(spectator[0].id, None)
+            return True
+        except discord.HTTPException:
+            return False
+        spectator[2] = content
+        return True
+
+    async def add_spectator(self, user):
+        """
+        Sends the status of the game to a new spectator, to be kept updated
+
+        Argument:
+        user(discord.User)
+        """
+        spectator = [user, None, None]
+        self.spectators[user.id] = spectator
+        spectator[2] = self.get_status()
+        spectator[1] = await send_private(user, spectator[2])
+
+    def remove_spectator(self, user):
+        """
+        Stops updating the status for the spectator.
+
+        Argument:
+        user(discord.User)
+
+        Return:
+        bool: False if the user was not spectating, True otherwise
+        """
+        return self.spectators.pop(user.id, None) is not None
+
+    def __cached_view__(self, view, index, render):
+        """
+        Returns the rendered view, rendering it only if the game has changed
+        since it was last rendered.
+
+        Arguments:
+        view  (str)     : Name of the view
+        index (int)     : Index of the player the view is for, or -1 if it is
+                          the same for everybody
+        render(function): Function rendering the view
+
+        Return:
+        str
+        """
+        entry = self.view_cache.get((view, index))
+        if entry is not None and entry[0] == self.version:
+            metrics.inc("uno_view_cache_hits_total", 'view="' + view + '"')
+            return entry[1]
+        metrics.inc("uno_view_cache_misses_total", 'view="' + view + '"')
+        content = render()
+        self.view_cache[(view, index)] = (self.version, content)
+        return content
 
     async def request_hand(self, user):
         """
@@ -931,17 +2631,38 @@ class Game:
         Argument:
         user(discord.User): The user who requested their hand
         """
-        index = -1
-        for i in range(len(self.players)):
-            if self.players[i].get_user() == user:
-                index = i
-                break
+        index = self.player_indices.get(user.id, -1)
         # If the requesting user is not playing this game
         if index == -1:
             return
+        if self.players[index].wants_images:
+            await self.send_hand_image(self.players[index], "Your cards are:")
+            return
         await message_player(
                 self.players[index],
-                "Your cards are:" + self.players[index].get_hand())
+                self.__cached_view__(
+                        "hand",
+                        index,
+                        lambda: "Your cards are:"
+                                + self.players[index].get_hand()))
+
+    async def send_hand_image(self, player, content):
+        """
+        Sends the player an image of their hand and the last discarded card
+
+        Arguments:
+        player (Player)
+        content(str)   : Text of the message with the image
+        """
+        png = await render.render_hand_async(
+                player.get_cards(),
+                self.discard[-1],
+                self.wild_color)
+        await client.send_file(
+                dm_channels.get(player.user.id, player.user),
+                io.BytesIO(png),
+                filename="hand.png",
+                content=content)
 
     async def request_turn(self, user):
         """
@@ -950,19 +2671,34 @@ class Game:
         Argument:
         user(discord.User): The user who requested the turn
         """
-        content = "```\n"
+        await send_private(
+                user,
+                self.__cached_view__("turn", -1, self.__render_turn__))
+
+    def __render_turn__(self):
+        """
+        Returns the order of the players and the number of their cards.
+
+        Return:
+        str
+        """
+        parts = ["```\n"]
         if self.clockwise:
-            content += "Left to right\n"
+            parts.append("Left to right\n")
         else:
-            content += "Right to left\n"
-        for i in range(len(self.players)):
-            if i == self.turn:
-                content += "**" + self.players[i].get_user().name + "**"
-            else:
-                content += self.players[i].get_user().name
-            content += "(" + str(len(self.players[i].get_cards())) + " cards) "
-        content += "```"
-        await client.send_message(user, content)
+            parts.append("Right to left\n")
+        if len(self.players) > LISTED_PLAYERS:
+            parts.append(self.__summarize_players__())
+        else:
+            for i, player in enumerate(self.players):
+                if i == self.turn:
+                    parts.append("**" + player.name + "**")
+                else:
+                    parts.append(player.name)
+                parts.append(
+                        "(" + str(len(player.get_cards())) + " cards) ")
+        parts.append("```")
+        return "".join(parts)
 
     async def request_last_discard(self, user):
         """
@@ -971,6 +2707,17 @@ class Game:
         Argument:
         user(discord.User): The user who requested the last discard
         """
+        await send_private(
+                user,
+                self.__cached_view__("last", -1, self.__render_last_discard__))
+
+    def __render_last_discard__(self):
+        """
+        Returns the last discarded card and the color for Wild card.
+
+        Return:
+        str
+        """
         pm_str = ("The last discarded card is `"
                 + str(self.discard[-1])
                 + "`.")
@@ -978,7 +2725,7 @@ class Game:
             pm_str += (" The color for Wild card is **"
                     + self.wild_color.name
                     + "**.")
-        await client.send_message(user, pm_str)
+        return pm_str
 
     def game_end(self):
         """
@@ -1019,63 +2766,539 @@ class Game:
                         CardType["WILD_DRAW_FOUR"]]:
                     score += 50
         self.players[self.winner_index].add_score(score)
+        self.round_score = score
         return self.winner_index
 
 
-async def announce(except_players, content):
+async def message_player(player, content):
     """
-    Sends a message to the channel and players except for specified players
+    Sends a PM to the specified player
 
     Arguments:
-    except_players(list of Player): Players to not send messages to
-    content       (str)           : The content of the message
+    player (Player): Player to send PM to
+    content(str)   : Content of the message
     """
-    global players, client, channel, announce_to_channel
-    for player in players:
-        if player in except_players:
-            continue
-        await client.send_message(player.user, content)
-    if announce_to_channel:
-        await client.send_message(channel, content)
+    if player.strategy is None:
+        await send_private(player.user, content)
 
 
-async def message_player(player, content):
+async def send_private(user, content):
     """
-    Sends a PM to the specified player
+    Sends a PM to the user, through the cached private channel of players so
+    that the client does not have to resolve it again
 
     Arguments:
-    player (Player): Player to send PM to
-    content(str)   : Content of the message
+    user   (discord.User)
+    content(str)         : Content of the message
+
+    Return:
+    discord.Message: The message sent
+    """
+    channel = dm_channels.get(user.id)
+    if channel is None:
+        metrics.inc("uno_private_sends_total", 'channel="resolved"')
+        return await send_split(user, content)
+    metrics.inc("uno_private_sends_total", 'channel="cached"')
+    return await send_split(channel, content)
+
+
+async def send_split(destination, content):
+    """
+    Sends a message, split into as few messages as Discord allows, one after
+    another so that they arrive in order
+
+    Arguments:
+    destination(discord.Channel, discord.PrivateChannel or discord.User)
+    content    (str)
+
+    Return:
+    discord.Message: The first message sent
+    """
+    chunks = messages.split(content)
+    first = await client.send_message(destination, chunks[0])
+    for chunk in chunks[1:]:
+        await client.send_message(destination, chunk)
+    return first
+
+
+def count_cards(count):
+    """
+    Returns a number of cards with the noun agreeing, e.g. "1 card"
+
+    Argument:
+    count(int)
+
+    Return:
+    str
+    """
+    if count == 1:
+        return "1 card"
+    return str(count) + " cards"
+
+
+async def open_private_channels(users):
+    """
+    Opens the private channels of users at once and caches them
+
+    Argument:
+    users(list of discord.User)
+    """
+    users = [user for user in users
+            if not isinstance(user, BotUser) and user.id not in dm_channels]
+    channels = await asyncio.gather(
+            *[client.start_private_message(user) for user in users],
+            return_exceptions=True)
+    for user, channel in zip(users, channels):
+        # Sends to a user whose channel failed to open resolve it themselves
+        if not isinstance(channel, Exception):
+            dm_channels[user.id] = channel
+
+
+def seed_worker():
+    """
+    Seeds the random generator of a new worker process, which would otherwise
+    inherit the state of the bot and play the same playouts as every other
+    worker.
     """
-    await client.send_message(player.user, content)
+    random.seed()
 
 
-async def start(input_players, input_client, input_channel):
+async def decide(strategy, view):
+    """
+    Lets the strategy of a computer player decide off the event loop, falling
+    back to a quick decision if it takes longer than the latency budget
+
+    Arguments:
+    strategy(Strategy)
+    view    (GameView): What the computer player sees
+
+    Return:
+    str: The command of the computer player
     """
-    Initializes the UNO game
+    global bot_executor
+    loop = asyncio.get_event_loop()
+    if bot_executor is None:
+        bot_executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=BOT_PROCESSES, initializer=seed_worker)
+    try:
+        future = loop.run_in_executor(bot_executor, strategy.decide, view)
+        return await asyncio.wait_for(future, BOT_LATENCY_BUDGET)
+    except asyncio.TimeoutError:
+        return strategy.fallback(view)
+    except concurrent.futures.process.BrokenProcessPool:
+        # A worker has died, so later decisions get new processes
+        traceback.print_exc()
+        bot_executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=BOT_PROCESSES, initializer=seed_worker)
+        return strategy.fallback(view)
+
+
+async def start(input_players, input_client, input_channel, target_score=0,
+        house_rules=()):
+    """
+    Initializes an UNO game
 
     Arguments:
     input_players(list of discord.User): Users who are joining the game
     input_client (discord.Client)      : Bot client
     input_channel(discord.Channel)     : The main channel to announce the
                                          current game at
+    target_score (int)                 : Score to reach to win the match, or 0
+                                         if only a single round is played
+    house_rules  (list of str)         : Names of the house rules in play
     """
-    global client, players, channel, game
-    print(str(channel))
+    global client
     client = input_client
     players = []
     for input_player in input_players:
-        players.append(Player(input_player))
-    channel = input_channel
-    await announce([], "The game is starting up...")
-    await announce([input_players],
-            "The game is played by entering commands to the bot"
-            + " by PM. Please check the PM with the bot for instructions. "
-            + "Enter `.unohelp` for further help.")
-    game = Game(players)
-    if not await game.announce_if_first_discard_wild():
-        await game.announce_turn()
-    
+        if isinstance(input_player, BotUser):
+            players.append(Player(input_player, input_player.strategy))
+        else:
+            players.append(Player(input_player))
+    game = Game(players, input_channel, target_score, house_rules)
+    if preferences is not None:
+        game.announce_to_channel = preferences.get(
+                prefs.CHANNEL, input_channel.id, "announce", False)
+        for player in players:
+            player.wants_images = (player.strategy is None
+                    and render.is_available()
+                    and preferences.get(
+                            prefs.USER, player.user.id, "images", False))
+    games[input_channel.id] = game
+    for input_player in input_players:
+        user_games[input_player.id] = game
+    try:
+        await open_private_channels(input_players)
+        if num_decks(len(players)) > 1:
+            await game.announce([], "The game is starting up with "
+                    + str(num_decks(len(players)))
+                    + " decks shuffled together...")
+        else:
+            await game.announce([], "The game is starting up...")
+        await game.announce(players,
+                "The game is played by entering commands to the bot"
+                + " by PM. Please check the PM with the bot for instructions. "
+                + "Enter `.unohelp` for further help.")
+        # Messages of the players reach this shard, whichever shard gets them
+        for player in players:
+            if player.strategy is None:
+                await session_store.set(
+                        "owner:" + player.get_user().id, shard_id)
+        if not await game.announce_if_first_discard_wild():
+            await game.announce_turn()
+    except BaseException:
+        # Without a worker, nothing could ever end the game, so its players
+        # and channel are freed at once
+        end_game(game)
+        raise
+    game.worker = asyncio.ensure_future(game.run_queue())
+
+
+def end_game(game):
+    """
+    Removes the game, so that its players and channel are free to play again
+
+    Argument:
+    game(Game): The game to remove
+    """
+    game.cancel_turn_timers()
+    game.is_over = True
+    game.version += 1
+    if game.spectate_timer is not None:
+        game.spectate_timer.cancel()
+    game.spectate_timer = scheduler.call_later(0, game.update_spectators)
+    if game.hand_timer is not None:
+        game.hand_timer.cancel()
+        game.hand_timer = None
+    game.close_uno_window(game.uno_serial)
+    # Wake up the worker so that it notices the end
+    game.queue.put_nowait((asyncio.sleep, (0,)))
+    if games.get(game.channel.id) is game:
+        del(games[game.channel.id])
+    for player in game.players:
+        if user_games.get(player.get_user().id) is game:
+            del(user_games[player.get_user().id])
+        dm_channels.pop(player.get_user().id, None)
+    asyncio.ensure_future(release_players(game))
+
+
+async def release_players(game):
+    """
+    Removes the ownership of this shard over the players of the ended game
+
+    Argument:
+    game(Game)
+    """
+    try:
+        for player in game.players:
+            if player.strategy is None:
+                await session_store.delete("owner:" + player.get_user().id)
+    except store.StoreError:
+        traceback.print_exc()
+
+
+def configure_preferences(input_preferences):
+    """
+    Sets the preferences of users and channels applied to new games
+
+    Argument:
+    input_preferences(PreferenceStore)
+    """
+    global preferences
+    preferences = input_preferences
+
+
+def configure_sharding(input_store, input_shard_id):
+    """
+    Sets the store shared by the shards, and the shard of this process
+
+    Arguments:
+    input_store   (MemoryStore or SocketStore)
+    input_shard_id(int)
+    """
+    global session_store, shard_id
+    session_store = input_store
+    shard_id = input_shard_id
+
+
+async def pause_game(game):
+    """
+    Waits until the game is between two inputs, and holds it there.
+
+    Argument:
+    game(Game)
+
+    Return:
+    asyncio.Future: Future to set to let the game go on
+    """
+    loop = asyncio.get_event_loop()
+    paused = loop.create_future()
+    resumed = loop.create_future()
+    game.submit(wait_until_resumed, paused, resumed)
+    # A game ending first never reaches the pause
+    await asyncio.wait(
+            [paused, game.worker],
+            return_when=asyncio.FIRST_COMPLETED)
+    return resumed
+
+
+async def pause_games():
+    """
+    Pauses every game between two inputs, including the games started while
+    waiting for the others.
+
+    Return:
+    list of asyncio.Future: Futures to set to let the games go on
+    """
+    resumes = {}
+    while True:
+        pending = [game for game in games.values() if game not in resumes]
+        if not pending:
+            return list(resumes.values())
+        paused = await asyncio.gather(*[pause_game(game) for game in pending])
+        for game, resumed in zip(pending, paused):
+            resumes[game] = resumed
+
+
+async def wait_until_resumed(paused, resumed):
+    """
+    Holds the worker of a game, as the input queued by pause_game.
+
+    Arguments:
+    paused (asyncio.Future): Set once the worker has stopped here
+    resumed(asyncio.Future): Set to let the worker go on
+    """
+    paused.set_result(None)
+    await resumed
+
+
+def restore_user(user):
+    """
+    Returns the user, or a computer player of this module standing in for a
+    computer player of a previous module.
+
+    Argument:
+    user(discord.User or BotUser)
+
+    Return:
+    discord.User or BotUser
+    """
+    if isinstance(user, BotUser) or getattr(user, "strategy", None) is None:
+        return user
+    return BotUser(user.strategy, user.id, user.name)
+
+
+def export_state():
+    """
+    Returns the state of this module, to be passed on to a reloaded module.
+    Every game must be paused, and goes on until retired.
+
+    Return:
+    dict
+    """
+    return {
+            "version": STATE_VERSION,
+            "client": client,
+            "session_store": session_store,
+            "preferences": preferences,
+            "shard_id": shard_id,
+            "dm_channels": dm_channels,
+            "query_limiter": query_limiter,
+            "bot_executor": bot_executor,
+            "bot_count": BotUser.count,
+            "games": [game.export_state() for game in games.values()]}
+
+
+def import_state(state):
+    """
+    Takes on the state exported by the previous module, and restarts its
+    games. Nothing is taken on unless every game is restored. The processes
+    of the previous module are not, as they run its strategies.
+
+    Argument:
+    state(dict)
+
+    Return:
+    int: Number of games restarted
+    """
+    global client, session_store, shard_id, query_limiter, preferences
+    if state["version"] > STATE_VERSION:
+        raise ValueError("state version " + str(state["version"])
+                + " is newer than " + str(STATE_VERSION))
+    restored = []
+    try:
+        for game_state in state["games"]:
+            restored.append(restore_game(game_state))
+    except Exception:
+        # The games of the previous module go on, so these must not
+        for game in restored:
+            game.retire()
+        raise
+    client = state["client"]
+    session_store = state["session_store"]
+    preferences = state.get("preferences")
+    shard_id = state["shard_id"]
+    dm_channels.update(state["dm_channels"])
+    query_limiter = state["query_limiter"]
+    BotUser.count = max(BotUser.count, state["bot_count"])
+    for game in restored:
+        games[game.channel.id] = game
+        for player in game.players:
+            user_games[player.get_user().id] = game
+        game.worker = asyncio.ensure_future(game.run_queue())
+    return len(restored)
+
+
+def restore_game(state):
+    """
+    Returns a game taking on the state exported by a game of the previous
+    module. The game is not dealt, as its cards come from the state.
+
+    Argument:
+    state(dict)
+
+    Return:
+    Game
+    """
+    players = []
+    for player_state in state["players"]:
+        player = Player(
+                restore_user(player_state["user"]),
+                player_state["strategy"])
+        player.import_state(player_state)
+        players.append(player)
+    game = Game.__new__(Game)
+    game.__setup__(
+            players,
+            state["channel"],
+            state["target_score"],
+            state["house_rules"])
+    game.import_state(state)
+    return game
+
+
+async def forward_to_owner(message):
+    """
+    Forwards the message to the shard playing the game of its author, if it is
+    another shard
+
+    Argument:
+    message(discord.Message)
+
+    Return:
+    bool: True if the message has been forwarded, False otherwise
+    """
+    try:
+        owner = await session_store.get("owner:" + message.author.id)
+        if owner is None or owner == shard_id:
+            return False
+        await session_store.push(
+                "inbox:" + str(owner),
+                {"author": message.author.id, "content": message.content})
+    except store.StoreError:
+        # Without the store, the message is handled as if nobody owned it
+        traceback.print_exc()
+        return False
+    return True
+
+
+class ForwardedMessage:
+    """
+    A message forwarded from another shard, standing in for discord.Message.
+
+    Attributes:
+    author (discord.User)
+    content(str)
+    channel(discord.User): Where to reply, which is the author's PM
+    """
+    def __init__(self, author, content):
+        """
+        Constructor of the message.
+
+        Arguments:
+        author (discord.User)
+        content(str)
+        """
+        self.author = author
+        self.content = content
+        self.channel = author
+
+
+async def run_inbox():
+    """Processes the messages other shards forward to this shard."""
+    while True:
+        try:
+            forwarded = await session_store.pop(
+                    "inbox:" + str(shard_id),
+                    INBOX_POLL)
+        except store.StoreError:
+            traceback.print_exc()
+            await asyncio.sleep(INBOX_RETRY)
+            continue
+        if forwarded is None:
+            continue
+        game = user_games.get(forwarded["author"])
+        if game is None:
+            continue
+        player = game.players[game.player_indices[forwarded["author"]]]
+        await process_message(
+                ForwardedMessage(player.get_user(), forwarded["content"]))
+
+
+def find_game(user):
+    """
+    Returns the game the user is playing
+
+    Argument:
+    user(discord.User)
+
+    Return:
+    Game: The game of the user, or None if the user is not playing
+    """
+    return user_games.get(user.id)
+
+
+async def spectate(user, channel):
+    """
+    Lets the user spectate the game being played at the channel
+
+    Arguments:
+    user   (discord.User)
+    channel(discord.Channel): The channel the game is being played at
+    """
+    game = games[channel.id]
+    if user.id in game.spectators:
+        await send_private(user, "You are already spectating.")
+    else:
+        await game.add_spectator(user)
+
+
+async def unspectate(user, channel):
+    """
+    Stops the user spectating the game being played at the channel
+
+    Arguments:
+    user   (discord.User)
+    channel(discord.Channel): The channel the game is being played at
+    """
+    if games[channel.id].remove_spectator(user):
+        await send_private(user, "You are no longer spectating.")
+    else:
+        await client.send_message(channel, "You are not spectating this game.")
+
+
+def is_hosting(channel):
+    """
+    Determines if a game is being played at the channel
+
+    Argument:
+    channel(discord.Channel)
+
+    Return:
+    bool
+    """
+    return channel.id in games
+
 
 async def send_help(user):
     """
@@ -1084,46 +3307,120 @@ async def send_help(user):
     Argument:
     user(discord.User): User requesting for help
     """
-    global client
-    await client.send_message(
-            user,
-            "```\n.p <card index> - During your turn, plays a card with the "
-            + "given index.\n"
-            + ".d - During your turn, draws a card for you.\n"
-            + ".hand - Shows what cards you currently have.\n"
-            + ".turn - Shows whose turn it currently is and how many cards they"
-            + " have.\n"
-            + ".last - Shows which card was discarded last.\n"
-            + ".send <message> - Sends <message> to everybody and the "
-            + "channel.\n"
-            + ".ustop - Stops the current game.\n"
-            + ".unohelp - You probably already know this.```")
-            
+    await send_private(user, HELP_TEXT)
 
 
 async def process_message(message):
     """
-    Processes a message sent by PM to the bot client
+    Queues a message sent by PM to the bot client for the game of its author
 
     Argument:
     message(discord.Message): The message to process
     """
-    global players, game, announce_to_channel
-    index = -1
-    for i in range(len(players)):
-        if message.author == players[i].get_user():
-            index = i
-            break
-    command = message.content.split()[0]
+    game = find_game(message.author)
+    if game is None:
+        return
+    arrived = time.monotonic()
+    game.last_active = arrived
+    words = message.content.split()
+    if words and words[0].lower() in QUERY_COMMANDS:
+        result = query_limiter.check(message.author.id)
+        if result == ratelimit.NOTIFY:
+            metrics.inc("uno_queries_throttled_total")
+            await send_private(
+                    message.author,
+                    "Slow down! Try again in a few seconds.")
+        if result != ratelimit.ALLOW:
+            return
+    if game.queue.qsize() >= GAME_QUEUE_SIZE:
+        metrics.inc("uno_queue_rejected_total")
+        await send_private(
+                message.author,
+                "The game is busy. Please wait a moment and try again.")
+        return
+    game.submit(handle_message, game, message, arrived)
+
+
+async def expire_game(game, content, stopped=None):
+    """
+    Stops a game closed by the reaper, telling its players why
+
+    Arguments:
+    game   (Game)
+    content(str)           : Reason the game is stopped
+    stopped(asyncio.Future): Set once the game has stopped, or None
+    """
+    try:
+        await game.announce([], content)
+        if not game.announce_to_channel:
+            await send_split(game.channel, content)
+    finally:
+        end_game(game)
+        if stopped is not None and not stopped.done():
+            stopped.set_result(None)
+
+
+def queued_messages():
+    """
+    Returns the number of inputs waiting in the queues of all games.
+
+    Return:
+    int
+    """
+    total = 0
+    for game in games.values():
+        total += game.queue.qsize()
+    return total
+
+
+def longest_queue():
+    """
+    Returns the number of inputs waiting in the longest queue of a game.
+
+    Return:
+    int
+    """
+    longest = 0
+    for game in games.values():
+        longest = max(longest, game.queue.qsize())
+    return longest
+
+
+metrics.register_gauge("uno_queued_inputs", queued_messages)
+metrics.register_gauge("uno_queue_length_max", longest_queue)
+metrics.register_gauge("uno_games", lambda: len(games))
+metrics.register_gauge("uno_players", lambda: len(user_games))
+for view in ["status", "hand", "turn", "last"]:
+    metrics.register_gauge(
+            "uno_view_cache_hit_rate_" + view,
+            lambda view=view: metrics.hit_rate(
+                    "uno_view_cache_hits_total",
+                    "uno_view_cache_misses_total",
+                    'view="' + view + '"'))
+
+
+async def handle_message(game, message, arrived=None):
+    """
+    Applies a message sent by PM to the bot client to the game
+
+    Arguments:
+    game   (Game)           : The game of the author
+    message(discord.Message): The message to process
+    arrived(float)          : Monotonic time the message arrived at, or None
+                              for now
+    """
+    players = game.players
+    index = game.player_indices.get(message.author.id, -1)
+    command = commands.resolve_command(message.content.split()[0])
     if command == ".ustop":
         if index != -1:
-            await announce(
+            await game.announce(
                     [players[index]],
                     "**"
-                    + players[index].get_user().name
+                    + players[index].name
                     + "** has stopped the game.")
             await message_player(players[index], "The game has stopped.")
-            return False
+            end_game(game)
     elif command == ".announce":
         if (len(message.content.split()) < 2 or
                 message.content.split()[1].lower() not in ["on", "off"]):
@@ -1131,16 +3428,25 @@ async def process_message(message):
                     message.channel,
                     "Enter `.announce on` or `.announce off` to toggle on/off "
                     "the announcement in the main channel.")
-        elif announce_to_channel:
-            announce_to_channel = False
-            await client.send_message(
-                    channel,
-                    "The game will no longer be announced to this channel.")
         else:
-            announce_to_channel = True
-            await client.send_message(
-                    channel,
-                    "The game will be fully announced to this channel.")
+            game.announce_to_channel = (
+                    message.content.split()[1].lower() == "on")
+            # Later games in the channel start the same way
+            if preferences is not None:
+                preferences.set(
+                        prefs.CHANNEL,
+                        game.channel.id,
+                        "announce",
+                        game.announce_to_channel)
+            if game.announce_to_channel:
+                await client.send_message(
+                        game.channel,
+                        "The game will be fully announced to this channel.")
+            else:
+                await client.send_message(
+                        game.channel,
+                        "The game will no longer be announced to this "
+                        "channel.")
     elif command == ".hand":
         if index != -1:
             await game.request_hand(message.author)
@@ -1148,30 +3454,130 @@ async def process_message(message):
         await game.request_turn(message.author)
     elif command == ".last":
         await game.request_last_discard(message.author)
-    elif command in [".send", ".s"]:
+    elif command == ".s":
         if index != -1:
-            split_str = ""
-            if command == ".send":
-                split_str = message.content[5:].strip()
-            else:
-                split_str = message.content[2:].strip()
-            await announce(
+            split_str = message.content.split(None, 1)[1:]
+            split_str = split_str[0].strip() if split_str else ""
+            await game.announce(
                     [players[index]],
                     "**["
-                    + players[index].get_user().name
+                    + players[index].name
                     + "]** "
                     + split_str)
     elif command == ".unohelp":
         await send_help(message.author)
+    elif command == ".images":
+        if index == -1:
+            return
+        words = message.content.split()
+        if len(words) < 2 or words[1].lower() not in ["on", "off"]:
+            await send_private(
+                    message.author,
+                    "Enter `.images on` or `.images off` to toggle on/off "
+                    "images of your hand.")
+        elif words[1].lower() == "off":
+            players[index].wants_images = False
+            if preferences is not None:
+                preferences.set(prefs.USER, message.author.id, "images", False)
+            await send_private(message.author, "Your hand is shown as text.")
+        elif not render.is_available():
+            await send_private(
+                    message.author,
+                    "Images cannot be drawn right now.")
+        else:
+            players[index].wants_images = True
+            if preferences is not None:
+                preferences.set(prefs.USER, message.author.id, "images", True)
+            await send_private(
+                    message.author,
+                    "Your hand will be shown as an image with `.hand` and "
+                    "at your turn.")
+    elif command in [".uno!", ".catch"]:
+        if index != -1:
+            if arrived is None:
+                arrived = time.monotonic()
+            await game.claim_uno(index, command, arrived)
     elif index != -1:
         if not await game.run(message):
-            winner_index = game.game_end()
-            await announce(
-                    [],
-                    "The game is over. **"
-                    + players[winner_index].get_user().name
-                    + "** wins with "
-                    + str(players[winner_index].get_score())
-                    + " points!")
-            return False
+            await end_round(game)
+
+
+def update_ratings(game, winner_index):
+    """
+    Updates the ratings of the players after a round, as used to match them
+    in the queue. Rounds with computer players are not rated, so that
+    beating weak strategies cannot raise a rating.
+
+    Arguments:
+    game        (Game)
+    winner_index(int) : Index of the player who won the round
+    """
+    if preferences is None:
+        return
+    if any(player.strategy is not None for player in game.players):
+        return
+    ratings = [preferences.get(
+                    prefs.USER,
+                    player.user.id,
+                    "rating",
+                    matchmaking.DEFAULT_RATING)
+            for player in game.players]
+    changes = matchmaking.rating_changes(ratings, winner_index)
+    # Changes are added to the stored ratings, so that rounds ending on other
+    # shards at the same time are not overwritten
+    for player, change in zip(game.players, changes):
+        preferences.add(
+                prefs.USER,
+                player.user.id,
+                "rating",
+                change,
+                matchmaking.DEFAULT_RATING)
+
+
+async def end_round(game):
+    """
+    Scores the finished round, and deals the next round if the match goes on
+
+    Argument:
+    game(Game): The game whose round has finished
+
+    Return:
+    bool: False if the game is over, True if the next round has started
+    """
+    players = game.players
+    winner_index = game.game_end()
+    winner = players[winner_index]
+    update_ratings(game, winner_index)
+    if game.is_match_over():
+        await game.announce(
+                [],
+                "The game is over. **"
+                + winner.name
+                + "** wins with "
+                + str(winner.get_score())
+                + " points!")
+        end_game(game)
+        return False
+    # Deal the next round before announcing, so that the turn announcement
+    # follows the scores without a pause
+    game.new_round()
+    scores_str = ""
+    for player in sorted(players, key=Player.get_score, reverse=True):
+        scores_str += (player.name
+                + ": "
+                + str(player.get_score())
+                + "\n")
+    await game.announce(
+            [],
+            "The round is over. **"
+            + winner.name
+            + "** scores "
+            + str(game.round_score)
+            + " points. The first player to reach "
+            + str(game.target_score)
+            + " points wins the match.```\n"
+            + scores_str
+            + "```Starting the next round...")
+    if not await game.announce_if_first_discard_wild():
+        await game.announce_turn()
     return True